@@ -0,0 +1,174 @@
+"""Login tokens and the authenticated_user and admin_user dependencies.
+
+POST /user/login checks the password in the hashing pool (see passwords.py) and hands out a signed bearer
+token, <base64 username>.<expiry>.<signature>, where the signature is an HMAC over the username, the expiry and
+the user's stored password hash. Changing the password therefore retires every token issued before it.
+
+Checking a token takes one indexed read for the current hash; Authorization: Basic takes a full scrypt
+verification. Either way the outcome is kept in a verified cache for AUTH_CACHE_TTL seconds, so repeated
+calls with the same token or credentials cost a dict lookup. Basic credentials are only cached under an
+HMAC of them, never in the clear. signals.tokens_revoked (logout) and signals.users_changed (user updated or
+deleted) retire cached entries, in every worker when broadcast.py is running.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import secrets
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import Depends, Header, HTTPException
+
+from . import config
+from .cache import TTLCache
+from .dependencies import get_user_password_from_db, run_db, set_user_password_in_db
+from .passwords import SALT_BYTES, KEY_BYTES, PREFIX, hash_async, needs_rehash, verify_async
+from .signals import on_tokens_revoked, on_users_changed, tokens_revoked, users_changed
+
+_secret = config.AUTH_SECRET.encode("utf-8") or secrets.token_bytes(32)
+
+# token or credential digest -> (username, monotonic time the check started)
+verified_cache = TTLCache(maxsize=config.AUTH_CACHE_SIZE, ttl=config.AUTH_CACHE_TTL)
+# username -> monotonic time of the last forget_user(); cached checks from before then no longer count
+_forgotten = TTLCache(maxsize=config.AUTH_CACHE_SIZE, ttl=config.AUTH_CACHE_TTL)
+# Tokens ended by logout, until they would have expired anyway. Past AUTH_CACHE_SIZE the oldest are
+# forgotten, which only matters for tokens logged out long before their expiry.
+_logged_out = TTLCache(maxsize=config.AUTH_CACHE_SIZE, ttl=config.AUTH_TOKEN_TTL)
+
+# Checked against when the username is unknown, so a miss costs as much as a wrong password.
+_UNKNOWN_USER_HASH = "$".join((
+    PREFIX, str(config.PASSWORD_SCRYPT_N), str(config.PASSWORD_SCRYPT_R), str(config.PASSWORD_SCRYPT_P),
+    base64.b64encode(bytes(SALT_BYTES)).decode("ascii"), base64.b64encode(bytes(KEY_BYTES)).decode("ascii"),
+))
+
+_UNAUTHORIZED = {"WWW-Authenticate": "Bearer"}
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _signature(username, expires, password_hash):
+    message = f"{username}\0{expires}\0{password_hash}".encode("utf-8")
+    return _b64(hmac.new(_secret, message, hashlib.sha256).digest())
+
+
+def issue_token(username, password_hash):
+    """Returns (token, expiry as a UTC datetime)."""
+    expires = int(time.time()) + config.AUTH_TOKEN_TTL
+    token = f"{_b64(username.encode('utf-8'))}.{expires}.{_signature(username, expires, password_hash)}"
+    return token, datetime.fromtimestamp(expires, tz=timezone.utc)
+
+
+async def verify_credentials(username, password) -> Optional[str]:
+    """The user's current password hash if password is right, else None.
+
+    Hashes made with older scrypt settings, and passwords stored before hashing existed, are upgraded here.
+    """
+    stored = await run_db(get_user_password_from_db, username)
+    if not await verify_async(password, stored if stored is not None else _UNKNOWN_USER_HASH) or stored is None:
+        return None
+    if needs_rehash(stored):
+        stored = await hash_async(password)
+        await run_db(set_user_password_in_db, username, stored)
+        users_changed(username)
+    return stored
+
+
+async def login(username, password):
+    password_hash = await verify_credentials(username, password)
+    if password_hash is None:
+        raise HTTPException(status_code=401, detail="Invalid username or password", headers=_UNAUTHORIZED)
+    return issue_token(username, password_hash)
+
+
+@on_tokens_revoked
+def revoke_tokens(*tokens):
+    for token in tokens:
+        _logged_out.set(token, True)
+    verified_cache.invalidate(*tokens)
+
+
+def logout(token):
+    tokens_revoked(token)
+
+
+@on_users_changed
+def forget_user(*usernames):
+    """Stop trusting cached checks for these users; runs on signals.users_changed."""
+    now = time.monotonic()
+    for username in usernames:
+        _forgotten.set(username, now)
+
+
+async def _check_token(token) -> Optional[str]:
+    try:
+        encoded_username, expires, signature = token.split(".")
+        username = _unb64(encoded_username).decode("utf-8")
+        expires = int(expires)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    if expires < time.time() or _logged_out.get(token):
+        return None
+    password_hash = await run_db(get_user_password_from_db, username)
+    if password_hash is None or not hmac.compare_digest(signature, _signature(username, expires, password_hash)):
+        return None
+    return username
+
+
+async def _check_basic(credentials) -> Optional[str]:
+    try:
+        username, _, password = base64.b64decode(credentials, validate=True).decode("utf-8").partition(":")
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    return username if await verify_credentials(username, password) is not None else None
+
+
+def _basic_key(credentials):
+    return "basic:" + _b64(hmac.new(_secret, credentials.encode("utf-8"), hashlib.sha256).digest())
+
+
+def _cached(key) -> Optional[str]:
+    entry = verified_cache.get(key)
+    if entry is None:
+        return None
+    username, checked_at = entry
+    forgotten_at = _forgotten.get(username)
+    if forgotten_at is not None and forgotten_at >= checked_at:
+        return None
+    return username
+
+
+async def authenticated_user(authorization: Optional[str] = Header(None)) -> str:
+    """FastAPI dependency: the username behind an Authorization: Bearer <token> or Basic header."""
+    scheme, _, credentials = (authorization or "").partition(" ")
+    scheme, credentials = scheme.lower(), credentials.strip()
+    if scheme == "bearer":
+        key, check = credentials, _check_token
+    elif scheme == "basic":
+        key, check = _basic_key(credentials), _check_basic
+    else:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers=_UNAUTHORIZED)
+
+    username = _cached(key)
+    if username is not None:
+        return username
+    started = time.monotonic()  # before the read, so a forget_user() racing with this check still wins
+    username = await check(credentials)
+    if username is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired credentials", headers=_UNAUTHORIZED)
+    verified_cache.set(key, (username, started))
+    return username
+
+
+async def admin_user(username: str = Depends(authenticated_user)) -> str:
+    """FastAPI dependency: as authenticated_user, for users listed in PETSTORE_ADMIN_USERS only."""
+    if username not in config.ADMIN_USERS:
+        raise HTTPException(status_code=403, detail="Not an admin")
+    return username
@@ -0,0 +1,62 @@
+"""Throughput of blocking vs offloaded database calls from async handlers.
+
+Each simulated client runs a query in a loop, either calling the blocking driver directly from the
+coroutine (what the routers used to do) or going through dependencies.run_db. Needs a reachable
+database configured through the PETSTORE_DB_* variables.
+
+    python -m app.benchmarks.async_db --clients 50 100 200 --requests 20
+"""
+import argparse
+import asyncio
+import time
+
+from ..dependencies import close_pool, get_db_connection, run_db
+
+
+def _query(sql):
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    cursor.execute(sql)
+    cursor.fetchall()
+    cursor.close()
+    connection.close()
+
+
+async def _client(mode, sql, requests):
+    for _ in range(requests):
+        if mode == "blocking":
+            _query(sql)
+        else:
+            await run_db(_query, sql)
+
+
+async def _run(mode, clients, sql, requests):
+    started = time.perf_counter()
+    await asyncio.gather(*(_client(mode, sql, requests) for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    return clients * requests / elapsed
+
+
+async def _compare(args):
+    print(f"{'clients':>8} {'blocking req/s':>15} {'run_db req/s':>13} {'speedup':>8}")
+    for clients in args.clients:
+        blocking = await _run("blocking", clients, args.sql, args.requests)
+        offloaded = await _run("offloaded", clients, args.sql, args.requests)
+        print(f"{clients:>8} {blocking:>15.1f} {offloaded:>13.1f} {offloaded / blocking:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--requests", type=int, default=20, help="queries per client")
+    parser.add_argument("--sql", default="SELECT SLEEP(0.005)", help="statement each client runs")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(_compare(args))
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
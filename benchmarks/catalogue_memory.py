@@ -0,0 +1,65 @@
+"""Memory held per 100k pets: the catalogue snapshot against a list of Pet models and the raw rows.
+
+Each form is built from the same PET_SELECT rows and measured with tracemalloc (the rows themselves are
+not counted against the catalogue or the models). Build times include tracemalloc's overhead. --seed tops the pets table up to the requested size
+first, so point the app at a scratch database.
+
+    python -m app.benchmarks.catalogue_memory --seed --pets 100000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from ..catalogue import Catalogue
+from ..dependencies import close_pool, fetch_pet_rows
+from ..hydration import hydrate_pet
+from .seed import seed
+
+
+def _measure(build):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    value = build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pets", type=int, default=100_000)
+    parser.add_argument("--seed", action="store_true", help="insert synthetic pets up to --pets first")
+    args = parser.parse_args()
+
+    try:
+        if args.seed:
+            seed(pets=args.pets)
+        rows, rows_size, _ = _measure(fetch_pet_rows)
+        count = len(rows)
+
+        def catalogue():
+            snapshot = Catalogue()
+            snapshot.load_rows(rows)
+            return snapshot
+
+        snapshot, catalogue_size, catalogue_time = _measure(catalogue)
+        models, models_size, models_time = _measure(lambda: [hydrate_pet(row) for row in rows])
+
+        print(f"{count} pets")
+        print(f"{'form':<16} {'MiB':>8} {'MiB/100k':>9} {'build s':>8}")
+        for name, size, elapsed in (("rows", rows_size, None), ("catalogue", catalogue_size, catalogue_time),
+                                    ("Pet models", models_size, models_time)):
+            per_100k = size / count * 100_000 / 2**20 if count else 0
+            build = f"{elapsed:>8.2f}" if elapsed is not None else f"{'-':>8}"
+            print(f"{name:<16} {size / 2**20:>8.1f} {per_100k:>9.1f} {build}")
+        del snapshot, models
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""CPU time per 10k pets to turn PET_SELECT rows into a response body, with and without FAST_RESPONSES.
+
+All three paths start from the same rows, so database time is left out:
+
+    handler    hydrate Pet models, then what FastAPI does for a handler returning them with
+               response_model=List[Pet]: dump, re-validate, serialise, jsonable_encoder, json.dumps
+    cached     hydrate Pet models, then the cached_json encoder (jsonable_encoder + json.dumps)
+    fast       pet_dict rows encoded straight to bytes by encode_json (orjson when installed)
+
+--seed tops the pets table up to --pets first, so point the app at a scratch database.
+
+    python -m app.benchmarks.fast_responses --seed --pets 10000
+"""
+import argparse
+import json
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from ..dependencies import close_pool, fetch_pet_rows
+from ..hydration import encode_json, hydrate_pet, pet_dict
+from ..models import Pet
+from .seed import seed
+
+_response_adapter = TypeAdapter(List[Pet])
+
+
+def handler_path(rows):
+    pets = [hydrate_pet(row) for row in rows]
+    content = [pet.model_dump() for pet in pets]
+    validated = _response_adapter.validate_python(content)
+    data = _response_adapter.dump_python(validated, mode="json")
+    return json.dumps(jsonable_encoder(data), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def cached_path(rows):
+    pets = [hydrate_pet(row) for row in rows]
+    return json.dumps(jsonable_encoder(pets), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(rows):
+    return encode_json([pet_dict(row) for row in rows])
+
+
+def _cpu_time(func, rows, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        func(rows)
+        best = min(best, time.process_time() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pets", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", action="store_true", help="insert synthetic pets up to --pets first")
+    args = parser.parse_args()
+
+    try:
+        if args.seed:
+            seed(pets=args.pets)
+        rows = fetch_pet_rows(limit=args.pets)
+    finally:
+        close_pool()
+    if not rows:
+        raise SystemExit("No pets to encode; run with --seed against a scratch database")
+
+    bodies = {name: func(rows) for name, func in (("handler", handler_path), ("cached", cached_path), ("fast", fast_path))}
+    # The paths must agree on the JSON they produce, whatever the byte-level formatting.
+    assert json.loads(bodies["handler"]) == json.loads(bodies["cached"]) == json.loads(bodies["fast"])
+
+    print(f"{len(rows)} pets, best of {args.repeat}")
+    print(f"{'path':<10} {'CPU ms':>9} {'ms/10k':>9} {'vs handler':>11}")
+    baseline = None
+    for name, func in (("handler", handler_path), ("cached", cached_path), ("fast", fast_path)):
+        seconds = _cpu_time(func, rows, args.repeat)
+        baseline = baseline or seconds
+        print(f"{name:<10} {seconds * 1000:>9.1f} {seconds / len(rows) * 10_000_000:>9.1f} {baseline / seconds:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
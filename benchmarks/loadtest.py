@@ -0,0 +1,230 @@
+"""Load test for every endpoint of the pets, users and store routers.
+
+Seeds synthetic data, then drives each scenario through an in-process ASGI client at the requested
+concurrency and reports throughput, p50/p95/p99 latency, errors and peak memory. Results can be saved as
+JSON and compared with an earlier run; the comparison exits non-zero when a scenario regresses beyond
+--threshold percent. Needs httpx. Runs against whatever backend is configured, so for a local run:
+
+    PETSTORE_DB_BACKEND=sqlite PETSTORE_SQLITE_PATH=/tmp/bench.db \\
+        python -m app.benchmarks.loadtest --pets 10000 --concurrency 50 --output run.json
+    python -m app.benchmarks.loadtest ... --compare run.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import httpx
+
+from .. import config
+from ..dependencies import close_pool
+from ..main import app
+from ..schema import bootstrap_schema
+from .seed import seed
+
+PNG_BYTES = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082"
+)
+
+
+class Workload:
+    """Request factories for each scenario. Write scenarios use fresh ids so every request does real work."""
+
+    def __init__(self, pets, users, orders):
+        self.rng = random.Random(7)
+        self.pets, self.users, self.orders = pets, users, orders
+        self.run_id = f"{int(time.time())}"
+        self.counter = itertools.count()
+        # Deletes consume ids from the top of the seeded ranges; reads stay below them.
+        self.deletable_pets = itertools.count(pets, -1)
+        self.deletable_orders = itertools.count(orders, -1)
+        self.deletable_users = itertools.count(users - 1, -1)
+
+    def pet_id(self):
+        return self.rng.randint(1, max(self.pets // 2, 1))
+
+    def username(self):
+        return f"user-{self.rng.randint(0, max(self.users // 2 - 1, 0))}"
+
+    def pet_body(self, pet_id=0):
+        n = next(self.counter)
+        return {"id": pet_id, "category": {"id": 1, "name": "categories-0"}, "name": f"load-{self.run_id}-{n}",
+                "photoUrls": [f"/img/load-{n}.jpg"], "tags": [{"id": 1, "name": "tags-0"}, {"id": 2, "name": "tags-1"}],
+                "status": self.rng.choice(["available", "pending", "sold"])}
+
+    def user_body(self):
+        n = next(self.counter)
+        return {"id": 0, "username": f"load-{self.run_id}-{n}", "firstName": "Load", "lastName": str(n),
+                "email": f"load-{n}@example.com", "password": "secret", "phone": "555-0100", "userStatus": 1}
+
+    def scenarios(self, batch_size):
+        return {
+            # routers/pets.py
+            "GET /": lambda: ("GET", "/", {}),
+            "GET / (filtered)": lambda: ("GET", "/", {"params": {"status": "available", "tag": "tags-1", "limit": 50}}),
+            "GET / (stream)": lambda: ("GET", "/", {"params": {"stream": "true", "limit": 1000}}),
+            "GET /pets/{pet_id}": lambda: ("GET", f"/pets/{self.pet_id()}", {}),
+            "GET /pet/findByStatus": lambda: ("GET", "/pet/findByStatus", {"params": {"status": "sold"}}),
+            "POST /pet": lambda: ("POST", "/pet", {"json": self.pet_body()}),
+            "POST /pet/batch": lambda: ("POST", "/pet/batch", {"json": [self.pet_body() for _ in range(batch_size)]}),
+            "PUT /pet": lambda: ("PUT", "/pet", {"json": self.pet_body(self.pet_id())}),
+            "PUT /pet/batch": lambda: ("PUT", "/pet/batch", {"json": [self.pet_body(self.pet_id()) for _ in range(batch_size)]}),
+            "PUT /pet/{petId}": lambda: ("PUT", f"/pet/{self.pet_id()}", {"json": self.pet_body()}),
+            "POST /pet/{petId}/uploadImage": lambda: ("POST", f"/pet/{self.pet_id()}/uploadImage",
+                                                      {"files": {"file": ("load.png", PNG_BYTES, "image/png")}}),
+            "DELETE /pet/{petId}": lambda: ("DELETE", f"/pet/{next(self.deletable_pets)}", {}),
+            # routers/users.py
+            "GET /user/{username}": lambda: ("GET", f"/user/{self.username()}", {}),
+            "POST /user": lambda: ("POST", "/user", {"json": self.user_body()}),
+            "POST /user/createWithList": lambda: ("POST", "/user/createWithList", {"json": [self.user_body() for _ in range(batch_size)]}),
+            "PUT /user/{username}": lambda: ("PUT", f"/user/{self.username()}", {"json": self.user_body()}),
+            "DELETE /user/{username}": lambda: ("DELETE", f"/user/user-{next(self.deletable_users)}", {}),
+            # routers/store.py
+            "GET /store/inventory": lambda: ("GET", "/store/inventory", {}),
+            "GET /store/order/{orderId}": lambda: ("GET", f"/store/order/{self.rng.randint(1, max(self.orders // 2, 1))}", {}),
+            "POST /store/order": lambda: ("POST", "/store/order", {"json": {
+                "id": 0, "petId": self.pet_id(), "quantity": 1, "shipDate": "2024-06-01T12:00:00",
+                "status": "placed", "complete": False}}),
+            "DELETE /store/order/{orderId}": lambda: ("DELETE", f"/store/order/{next(self.deletable_orders)}", {}),
+        }
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_scenario(client, make_request, requests, concurrency, trace_memory):
+    latencies = []
+    errors = 0
+    queue = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in queue:
+            method, url, kwargs = make_request()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True  # e.g. an error raised after a streamed response had started
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    peak_traced = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": requests / elapsed,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "peak_traced_bytes": peak_traced,
+        "peak_rss_bytes": _peak_rss(),
+    }
+
+
+def _peak_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+
+
+async def run(args):
+    workload = Workload(args.pets, args.users, args.orders)
+    scenarios = workload.scenarios(args.batch_size)
+    selected = [name for name in scenarios if not args.only or any(part in name for part in args.only)]
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in selected:
+            results[name] = await run_scenario(client, scenarios[name], args.requests, args.concurrency, args.trace_memory)
+            r = results[name]
+            print(f"{name:<32} {r['throughput_rps']:>9.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+                  f"{r['p99_ms']:>8.2f} {r['errors']:>6} {r['peak_rss_bytes'] / 2**20:>8.1f}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print per-scenario changes against a saved run; return the names that regressed."""
+    regressions = []
+    print(f"\n{'scenario':<32} {'rps Δ%':>8} {'p95 Δ%':>8}")
+    for name, current in results.items():
+        previous = baseline["results"].get(name)
+        if not previous:
+            continue
+        rps_change = (current["throughput_rps"] / previous["throughput_rps"] - 1) * 100
+        p95_change = (current["p95_ms"] / previous["p95_ms"] - 1) * 100 if previous["p95_ms"] else 0.0
+        flag = ""
+        if rps_change < -threshold or p95_change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<32} {rps_change:>+8.1f} {p95_change:>+8.1f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pets", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=50, help="items per batch request")
+    parser.add_argument("--only", nargs="*", help="run scenarios whose name contains any of these")
+    parser.add_argument("--trace-memory", action="store_true", help="also report tracemalloc peaks (slow)")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args()
+
+    bootstrap_schema()
+    print(f"seeding {args.pets} pets, {args.users} users, {args.orders} orders on {config.DB_BACKEND}")
+    seed(pets=args.pets, users=args.users, orders=args.orders)
+
+    print(f"{'scenario':<32} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6} {'rss MiB':>8}")
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        close_pool()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "backend": config.DB_BACKEND,
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
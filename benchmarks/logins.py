@@ -0,0 +1,80 @@
+"""Logins/sec per core and event-loop lag while password checks run.
+
+Concurrent simulated logins each verify a password against a scrypt hash made with the configured cost,
+either inline in the coroutine (the event loop stalls for every hash), in the hashing process pool
+(passwords.verify_async, what POST /user/login does), or as a cached token check (what authenticated calls
+cost after the first). A probe task sleeps --probe-ms at a time and records how late it wakes up; that
+lateness is what every other request on the loop would wait. No database is needed.
+
+    python -m app.benchmarks.logins --clients 8 32 --seconds 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from .. import auth, config
+from ..passwords import check_password, compute_hash, shutdown, verify_async
+
+
+async def _probe(interval, lags, stop):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def _client(mode, password_hash, deadline, counter):
+    while time.perf_counter() < deadline:
+        if mode == "inline":
+            check_password("secret", password_hash)
+        elif mode == "pool":
+            await verify_async("secret", password_hash)
+        else:
+            await auth.authenticated_user("Bearer bench-token")
+        counter[0] += 1
+        await asyncio.sleep(0)
+
+
+async def _run(mode, clients, seconds, probe_interval, password_hash):
+    lags, stop, counter = [], asyncio.Event(), [0]
+    probe = asyncio.create_task(_probe(probe_interval, lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(_client(mode, password_hash, started + seconds, counter) for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    return counter[0] / elapsed, statistics.median(lags_ms), lags_ms[int(len(lags_ms) * 0.99)], lags_ms[-1]
+
+
+async def _compare(args, password_hash):
+    # Warm the pool up so process start-up is not charged to the first run.
+    await asyncio.gather(*(verify_async("secret", password_hash) for _ in range(config.PASSWORD_HASH_WORKERS)))
+    auth.verified_cache.set("bench-token", ("bench", time.monotonic()))
+
+    print(f"{'mode':>8} {'clients':>8} {'logins/s':>10} {'per core':>9} {'lag p50 ms':>11} {'p99 ms':>8} {'max ms':>8}")
+    for clients in args.clients:
+        for mode, cores in (("inline", 1), ("pool", config.PASSWORD_HASH_WORKERS), ("cached", 1)):
+            rate, p50, p99, worst = await _run(mode, clients, args.seconds, args.probe_ms / 1000, password_hash)
+            print(f"{mode:>8} {clients:>8} {rate:>10.1f} {rate / cores:>9.1f} {p50:>11.2f} {p99:>8.2f} {worst:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--seconds", type=float, default=5.0, help="per mode and client count")
+    parser.add_argument("--probe-ms", type=float, default=5.0, help="event-loop probe interval")
+    args = parser.parse_args()
+
+    password_hash = compute_hash("secret")
+    print(f"scrypt n={config.PASSWORD_SCRYPT_N} r={config.PASSWORD_SCRYPT_R} p={config.PASSWORD_SCRYPT_P}, "
+          f"{config.PASSWORD_HASH_WORKERS} hashing processes")
+    try:
+        asyncio.run(_compare(args, password_hash))
+    finally:
+        shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Full-catalogue read: the old four-query path against the aggregated hydration query.
+
+Times get_pets_from_db at each catalogue size. --seed tops the pets table up to each size with
+synthetic rows first, so point the app at a scratch database.
+
+    python -m app.benchmarks.pet_hydration --seed --pets 10000 100000 1000000
+"""
+import argparse
+import time
+
+from ..dependencies import close_pool, get_db_connection, get_pets_from_db
+from ..models import Pet
+from .seed import seed
+
+
+def legacy_get_pets():
+    """The pre-hydration implementation, kept here as the baseline."""
+    connection = get_db_connection()
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute("SELECT * FROM categories")
+    categories = {row["id"]: row for row in cursor.fetchall()}
+    cursor.execute("SELECT * FROM tags")
+    tags = {row["id"]: row for row in cursor.fetchall()}
+    cursor.execute("SELECT * FROM pets")
+    pets = cursor.fetchall()
+    cursor.execute("SELECT * FROM pet_tags")
+    pet_tags = cursor.fetchall()
+    cursor.close()
+    connection.close()
+
+    pet_tags_mapping = {}
+    for pet_tag in pet_tags:
+        pet_tags_mapping.setdefault(pet_tag["pet_id"], []).append(tags[pet_tag["tag_id"]])
+
+    return [
+        Pet(
+            id=pet["id"],
+            category=categories[pet["category_id"]],
+            name=pet["name"],
+            photoUrls=eval(pet["photoUrls"]) if pet["photoUrls"] else [],
+            tags=pet_tags_mapping.get(pet["id"], []),
+            status=pet["status"],
+        )
+        for pet in pets
+    ]
+
+
+def _time(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pets", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", action="store_true", help="insert synthetic pets up to each size first")
+    args = parser.parse_args()
+
+    print(f"{'pets':>10} {'legacy s':>10} {'hydration s':>12} {'speedup':>8}")
+    try:
+        for size in sorted(args.pets):
+            if args.seed:
+                seed(pets=size)
+            legacy = _time(legacy_get_pets, args.repeat)
+            hydrated = _time(get_pets_from_db, args.repeat)
+            print(f"{size:>10} {legacy:>10.3f} {hydrated:>12.3f} {legacy / hydrated:>7.1f}x")
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
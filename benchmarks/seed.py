@@ -0,0 +1,84 @@
+"""Synthetic data for the benchmarks. Point the app at a scratch database before using it."""
+import json
+import random
+from datetime import datetime, timedelta
+
+from ..dependencies import get_db_connection
+from ..passwords import compute_hash
+from ..storage import get_backend
+
+PET_STATUSES = ["available", "pending", "sold"]
+ORDER_STATUSES = ["placed", "approved", "delivered"]
+
+
+def _count(cursor, table):
+    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def _ids(cursor, table):
+    cursor.execute(f"SELECT id FROM {table}")
+    return [row[0] for row in cursor.fetchall()]
+
+
+def seed(pets=0, users=0, orders=0, categories=10, tags=50, tags_per_pet=2, chunk=2000):
+    """Top each table up to the given row count. Existing rows are kept, so repeated runs are cheap."""
+    rng = random.Random(42)
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    try:
+        for table, target in (("categories", categories), ("tags", tags)):
+            existing = _count(cursor, table)
+            if existing < target:
+                cursor.executemany(f"INSERT INTO {table} (name) VALUES (%s)",
+                                   [(f"{table}-{i}",) for i in range(existing, target)])
+        category_ids = _ids(cursor, "categories")
+        tag_ids = _ids(cursor, "tags")
+        connection.commit()
+
+        existing = _count(cursor, "pets")
+        while existing < pets:
+            count = min(chunk, pets - existing)
+            values = ", ".join(["(%s, %s, %s, %s)"] * count)
+            params = []
+            for n in range(existing, existing + count):
+                params += [rng.choice(category_ids), f"pet-{n}", json.dumps([f"/img/{n}.jpg"]), rng.choice(PET_STATUSES)]
+            cursor.execute(f"INSERT INTO pets (category_id, name, photoUrls, status) VALUES {values}", params)
+            pet_ids = get_backend().insert_ids(cursor, count)
+            cursor.executemany(
+                "INSERT INTO pet_tags (pet_id, tag_id) VALUES (%s, %s)",
+                [(pet_id, tag_id) for pet_id in pet_ids
+                 for tag_id in rng.sample(tag_ids, min(tags_per_pet, len(tag_ids)))],
+            )
+            connection.commit()
+            existing += count
+
+        existing = _count(cursor, "users")
+        password_hash = compute_hash("secret") if existing < users else None  # one hash shared by every seeded user
+        while existing < users:
+            count = min(chunk, users - existing)
+            cursor.executemany(
+                "INSERT INTO users (username, firstName, lastName, email, password, phone, userStatus) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                [(f"user-{n}", "Seed", str(n), f"user-{n}@example.com", password_hash, "555-0100", 1)
+                 for n in range(existing, existing + count)],
+            )
+            connection.commit()
+            existing += count
+
+        existing = _count(cursor, "orders")
+        if existing < orders:
+            pet_ids = _ids(cursor, "pets")
+            start = datetime(2024, 1, 1)
+            while existing < orders:
+                count = min(chunk, orders - existing)
+                cursor.executemany(
+                    "INSERT INTO orders (pet_id, quantity, ship_date, status, complete) VALUES (%s, %s, %s, %s, %s)",
+                    [(rng.choice(pet_ids), rng.randint(1, 5), start + timedelta(minutes=n),
+                      rng.choice(ORDER_STATUSES), rng.random() < 0.5) for n in range(existing, existing + count)],
+                )
+                connection.commit()
+                existing += count
+    finally:
+        cursor.close()
+        connection.close()
@@ -0,0 +1,78 @@
+"""Rows/sec for /user/createWithList: one INSERT per user against bulk_insert_users at several chunk sizes.
+
+Every path hashes the passwords, as the endpoint does, so the numbers are dominated by scrypt; the "hash
+only" row shows that ceiling (it scales with PETSTORE_PASSWORD_HASH_WORKERS). Inserts synthetic users with a
+per-run username prefix and deletes them afterwards. bulk_insert_users is called directly, so --users may
+exceed PETSTORE_USER_IMPORT_MAX_USERS.
+
+    python -m app.benchmarks.user_import --users 2000 --chunk-sizes 100 1000
+"""
+import argparse
+import time
+import uuid
+
+from ..dependencies import INSERT_USER_QUERY, _user_params, bulk_insert_users, close_pool, get_db_connection
+from ..models import User
+from ..passwords import hash_password, hash_passwords, shutdown
+
+
+def make_users(count, prefix):
+    return [
+        User(id=0, username=f"{prefix}-{i}", firstName="Bench", lastName=str(i), email=f"{prefix}-{i}@example.com",
+             password="secret", phone="555-0100", userStatus=1)
+        for i in range(count)
+    ]
+
+
+def hash_only(users):
+    hash_passwords(user.password for user in users)
+
+
+def per_row_insert(users):
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    for user in users:
+        cursor.execute(INSERT_USER_QUERY, _user_params(user.model_copy(update={"password": hash_password(user.password)})))
+    connection.commit()
+    cursor.close()
+    connection.close()
+
+
+def delete_users(prefix):
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM users WHERE username LIKE %s", (f"{prefix}-%",))
+    connection.commit()
+    cursor.close()
+    connection.close()
+
+
+def _rate(func, users):
+    started = time.perf_counter()
+    func(users)
+    return len(users) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[100, 1000])
+    args = parser.parse_args()
+
+    try:
+        prefix = f"bench-{uuid.uuid4().hex[:8]}"
+        print(f"{'path':>16} {'rows/s':>10}")
+        print(f"{'hash only':>16} {_rate(hash_only, make_users(args.users, prefix)):>10.0f}")
+        print(f"{'per-row':>16} {_rate(per_row_insert, make_users(args.users, prefix)):>10.0f}")
+        delete_users(prefix)
+        for chunk_size in args.chunk_sizes:
+            rate = _rate(lambda users: bulk_insert_users(users, chunk_size), make_users(args.users, prefix))
+            print(f"{f'bulk/{chunk_size}':>16} {rate:>10.0f}")
+            delete_users(prefix)
+    finally:
+        close_pool()
+        shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Cross-process delivery of signals, so per-worker caches stay coherent in a multi-worker deployment.
+
+Each worker binds a Unix datagram socket named after its pid in PETSTORE_BROADCAST_DIR (serve.py makes a
+private directory for the workers it starts). Every signal sent in a worker is forwarded to all other
+sockets in that directory by a background thread; the receiving workers read it on their event loop and run
+the same handlers through signals.deliver(), so a write handled by one worker drops the response cache,
+lookup cache, catalogue and auth cache entries it made stale in all of them.
+
+Messages are JSON datagrams of at most _KEYS_PER_MESSAGE keys each. A socket whose worker has died is
+removed the first time a send to it is refused. Delivery is best effort: a worker that cannot take a
+message within BROADCAST_SEND_TIMEOUT seconds (its receive buffer is full) misses it, which is logged.
+"""
+import asyncio
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+
+from . import config, signals
+
+logger = logging.getLogger(__name__)
+
+_KEYS_PER_MESSAGE = 500
+_RECEIVE_BUFFER = 4 * 1024 * 1024
+_MAX_DATAGRAM = 256 * 1024
+
+
+class Broadcaster:
+    def __init__(self, directory, send_timeout=1.0):
+        self.directory = directory
+        self.send_timeout = send_timeout
+        self.path = os.path.join(directory, f"{os.getpid()}.sock")
+        self._socket = None
+        self._loop = None
+        self._outbox = queue.Queue()
+        self._sender = None
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+
+    def start(self):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _RECEIVE_BUFFER)
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # left by an earlier process that had this pid
+        self._socket.bind(self.path)
+        self._socket.setblocking(False)
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self._socket.fileno(), self._receive)
+        self._sender = threading.Thread(target=self._send_loop, name="broadcast-sender", daemon=True)
+        self._sender.start()
+        signals.forward_to(self.publish)
+
+    def publish(self, signal, keys):
+        """signals forwarder: queue the signal for every other worker. Never blocks the caller."""
+        keys = list(keys)
+        for start in range(0, max(len(keys), 1), _KEYS_PER_MESSAGE):
+            message = {"signal": signal, "keys": keys[start:start + _KEYS_PER_MESSAGE], "pid": os.getpid()}
+            self._outbox.put(json.dumps(message, separators=(",", ":")).encode("utf-8"))
+
+    def _peers(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        own = os.path.basename(self.path)
+        return [os.path.join(self.directory, name) for name in names if name.endswith(".sock") and name != own]
+
+    def _send_loop(self):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            sender.settimeout(self.send_timeout)
+            while True:
+                data = self._outbox.get()
+                if data is None:
+                    return
+                for peer in self._peers():
+                    try:
+                        sender.sendto(data, peer)
+                        self.sent += 1
+                    except (ConnectionRefusedError, FileNotFoundError):
+                        # Nobody is reading: the worker behind it has exited.
+                        try:
+                            os.unlink(peer)
+                        except FileNotFoundError:
+                            pass
+                    except OSError as e:  # timed out on a full buffer, or similar
+                        self.dropped += 1
+                        logger.error("Could not broadcast a cache invalidation to %s: %s", peer, e)
+
+    def _receive(self):
+        while True:
+            try:
+                data = self._socket.recv(_MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                return
+            try:
+                message = json.loads(data)
+                signals.deliver(message["signal"], message["keys"])
+                self.received += 1
+            except Exception:
+                logger.exception("Could not apply a broadcast cache invalidation")
+
+    def close(self):
+        if self._socket is None:
+            return
+        signals.stop_forwarding(self.publish)
+        self._outbox.put(None)  # sent after whatever is still queued
+        self._sender.join(self.send_timeout * 2)
+        self._loop.remove_reader(self._socket.fileno())
+        self._socket.close()
+        self._socket = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        return {"peers": len(self._peers()), "sent": self.sent, "received": self.received, "dropped": self.dropped,
+                "queued": self._outbox.qsize()}
+
+
+_broadcaster = None
+
+
+async def start():
+    """Join the broadcast directory, if one is configured. Called from the app lifespan in every worker.
+
+    Async only so that it runs on, and reads from, the worker's event loop.
+    """
+    global _broadcaster
+    if config.BROADCAST_DIR and _broadcaster is None:
+        _broadcaster = Broadcaster(config.BROADCAST_DIR, config.BROADCAST_SEND_TIMEOUT)
+        _broadcaster.start()
+
+
+def close():
+    """Leave the broadcast directory once the sender has flushed its queue."""
+    global _broadcaster
+    if _broadcaster is not None:
+        _broadcaster.close()
+        _broadcaster = None
+
+
+def stats():
+    return _broadcaster.stats() if _broadcaster is not None else {}
@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries expire ttl seconds after they were stored."""
+
+    def __init__(self, maxsize=128, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def setdefault(self, key, value):
+        """Atomically return the live entry for key, or store value and return it."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            self._store(key, value)
+            return value
+
+    def get_or_load(self, key, loader):
+        """Read-through lookup: on a miss, call loader() and cache its result."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            generation = self._generation
+        value = loader()
+        with self._lock:
+            # Skip the store if an invalidation ran while we were loading; the value may predate the write.
+            if generation == self._generation:
+                self._store(key, value)
+        return value
+
+    def invalidate(self, *keys):
+        """Drop the given keys, or everything when called without arguments."""
+        with self._lock:
+            self._generation += 1
+            if not keys:
+                self._data.clear()
+            for key in keys:
+                self._data.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def _store(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+class ResponseCache:
+    """Bounded LRU of serialised response bodies, each stored with the ETag of its bytes.
+
+    Keys are tuples whose first element is a namespace ("pet", "pets", "user", ...), so writers can drop one
+    entity or a whole family of list pages. put() only stores a body if no invalidation ran since the
+    caller took version(), which keeps a read that raced with a write from re-caching the old data.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (etag, body, headers)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def version(self):
+        with self._lock:
+            return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, etag, body, headers, version):
+        with self._lock:
+            if version != self._generation:
+                return
+            self._data[key] = (etag, body, headers)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, *keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._data.pop(key, None)
+
+    def invalidate_namespace(self, namespace):
+        with self._lock:
+            self._generation += 1
+            for key in [key for key in self._data if key[0] == namespace]:
+                del self._data[key]
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
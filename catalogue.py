@@ -0,0 +1,224 @@
+"""In-process read replica of the pet catalogue, enabled with PETSTORE_PET_CATALOGUE=1.
+
+The whole pets table is read once with the same PET_SELECT query get_pets_from_db uses, and kept as
+__slots__ PetRecords: category and tag names are stored once in id -> name maps, and each pet only holds
+ids. Lookups by id are a dict hit; status, category and tag filters start from precomputed id sets, and
+Pet models are only built for the page that is returned.
+
+Writers already announce the pets they touched through signals.pets_changed; http_cache.invalidate_pets
+passes those ids to mark_stale() here before dropping cached responses, and the catalogue re-reads just them
+(dropping any that were deleted) before its next read. A full reload happens
+every PETSTORE_PET_CATALOGUE_MAX_AGE seconds as a backstop for writes made outside this process.
+"""
+import bisect
+import heapq
+import sys
+import threading
+import time
+from typing import List, Optional
+
+from . import config
+from .dependencies import fetch_pet_rows
+from .hydration import decode_json
+from .instrumentation import timed
+from .models import Category, Pet, Tag
+
+
+# Past this many stale pets a full reload is cheaper than one long IN list.
+_MAX_REFRESH_IDS = 1000
+
+
+class PetRecord:
+    __slots__ = ("id", "category_id", "name", "photo_urls", "status", "tag_ids")
+
+    def __init__(self, id, category_id, name, photo_urls, status, tag_ids):
+        self.id = id
+        self.category_id = category_id
+        self.name = name
+        self.photo_urls = photo_urls
+        self.status = status
+        self.tag_ids = tag_ids
+
+
+class Catalogue:
+    def __init__(self, max_age=300.0):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()  # one loader at a time; readers wait for it rather than all loading
+        self._stale = set()
+        self._loaded_at = None
+        self._reset()
+
+    def _reset(self):
+        self._records = {}
+        self._ids = []  # sorted, for keyset pages without a filter
+        self._by_status = {}
+        self._by_category = {}
+        self._by_tag = {}  # tag name -> pet ids
+        self._categories = {}  # id -> name
+        self._tags = {}  # id -> name
+
+    # Writes
+
+    def mark_stale(self, *pet_ids):
+        with self._lock:
+            self._stale.update(pet_ids)
+
+    def load(self):
+        """Replace the snapshot with a fresh read of every pet."""
+        with self._load_lock:
+            self._load()
+
+    def ensure_fresh(self):
+        if self._expired() or self._stale:
+            with self._load_lock:
+                # Re-checked under the lock: whoever waited on another reader's load has nothing left to do.
+                if self._expired():
+                    self._load()
+                elif self._stale:
+                    self._refresh()
+
+    def _expired(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age
+
+    def load_rows(self, rows):
+        """Replace the snapshot with the given PET_SELECT rows."""
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._add(row)
+            self._loaded_at = time.monotonic()
+
+    def _load(self):
+        with self._lock:
+            # Changes announced from here on may or may not be in the rows we read; keep them stale.
+            self._stale.clear()
+        self.load_rows(fetch_pet_rows())
+
+    def _refresh(self):
+        """Re-read the pets marked stale since the last load or refresh."""
+        with self._lock:
+            pet_ids, self._stale = sorted(self._stale), set()
+        if not pet_ids:
+            return
+        if len(pet_ids) > _MAX_REFRESH_IDS:
+            self._load()
+            return
+        rows = fetch_pet_rows(" WHERE p.id IN (" + ", ".join(["%s"] * len(pet_ids)) + ")", pet_ids)
+        with self._lock:
+            for pet_id in pet_ids:
+                self._remove(pet_id)
+            for row in rows:
+                self._add(row)
+
+    def _add(self, row):
+        tags = decode_json(row["tags"]) if row["tags"] else []
+        for tag in tags:
+            self._tags[tag["id"]] = tag["name"]
+            self._by_tag.setdefault(tag["name"], set()).add(row["id"])
+        self._categories[row["category_id"]] = row["category_name"]
+        status = sys.intern(row["status"])
+        record = PetRecord(
+            row["id"], row["category_id"], row["name"],
+            tuple(decode_json(row["photoUrls"])) if row["photoUrls"] else (),
+            status, tuple(tag["id"] for tag in tags),
+        )
+        self._records[record.id] = record
+        if not self._ids or record.id > self._ids[-1]:
+            self._ids.append(record.id)
+        else:
+            bisect.insort(self._ids, record.id)
+        self._by_status.setdefault(status, set()).add(record.id)
+        self._by_category.setdefault(record.category_id, set()).add(record.id)
+
+    def _remove(self, pet_id):
+        record = self._records.pop(pet_id, None)
+        if record is None:
+            return
+        index = bisect.bisect_left(self._ids, pet_id)
+        del self._ids[index]
+        self._by_status[record.status].discard(pet_id)
+        self._by_category[record.category_id].discard(pet_id)
+        for tag_id in record.tag_ids:
+            self._by_tag.get(self._tags[tag_id], set()).discard(pet_id)
+
+    # Reads
+
+    def _to_pet(self, record) -> Pet:
+        with timed("validation"):
+            return Pet(
+                id=record.id,
+                category=Category(id=record.category_id, name=self._categories[record.category_id]),
+                name=record.name,
+                photoUrls=list(record.photo_urls),
+                tags=[Tag(id=tag_id, name=self._tags[tag_id]) for tag_id in record.tag_ids],
+                status=record.status,
+            )
+
+    def _to_dict(self, record) -> dict:
+        return {
+            "id": record.id,
+            "category": {"id": record.category_id, "name": self._categories[record.category_id]},
+            "name": record.name,
+            "photoUrls": list(record.photo_urls),
+            "tags": [{"id": tag_id, "name": self._tags[tag_id]} for tag_id in record.tag_ids],
+            "status": record.status,
+        }
+
+    def get(self, pet_id: int, as_dict: bool = False) -> Optional[Pet]:
+        self.ensure_fresh()
+        convert = self._to_dict if as_dict else self._to_pet
+        with self._lock:
+            record = self._records.get(pet_id)
+            return convert(record) if record is not None else None
+
+    def query(self, limit: int, after_id: Optional[int] = None, status=None,
+              category_id: Optional[int] = None, tag: Optional[str] = None, as_dict: bool = False) -> List[Pet]:
+        """Same page query_pets_from_db would return; status may be a value or a list of them."""
+        self.ensure_fresh()
+        convert = self._to_dict if as_dict else self._to_pet
+        with self._lock:
+            candidates = []
+            if status is not None:
+                statuses = [status] if isinstance(status, str) else status
+                candidates.append(set().union(*(self._by_status.get(s, ()) for s in statuses)))
+            if category_id is not None:
+                candidates.append(self._by_category.get(category_id, set()))
+            if tag is not None:
+                candidates.append(self._by_tag.get(tag, set()))
+
+            if not candidates:
+                start = bisect.bisect_right(self._ids, after_id) if after_id is not None else 0
+                ids = self._ids[start:start + limit]
+            else:
+                candidates.sort(key=len)
+                matches = candidates[0].intersection(*candidates[1:])
+                if after_id is not None:
+                    matches = (pet_id for pet_id in matches if pet_id > after_id)
+                ids = heapq.nsmallest(limit, matches)
+            return [convert(self._records[pet_id]) for pet_id in ids]
+
+    def stats(self):
+        with self._lock:
+            return {"pets": len(self._records), "stale": len(self._stale),
+                    "age_seconds": time.monotonic() - self._loaded_at if self._loaded_at is not None else None}
+
+
+_catalogue = None
+_catalogue_lock = threading.Lock()
+
+
+def get_catalogue() -> Catalogue:
+    global _catalogue
+    if _catalogue is None:
+        with _catalogue_lock:
+            if _catalogue is None:
+                _catalogue = Catalogue(max_age=config.PET_CATALOGUE_MAX_AGE)
+    return _catalogue
+
+
+def mark_stale(*pet_ids):
+    """Called by http_cache.invalidate_pets on signals.pets_changed, before it drops cached responses: the other
+    way round, a request in between could cache a page built from the old snapshot."""
+    if _catalogue is not None:
+        _catalogue.mark_stale(*pet_ids)
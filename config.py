@@ -0,0 +1,110 @@
+import os
+
+DB_BACKEND = os.getenv("PETSTORE_DB_BACKEND", "mysql")  # "mysql" or "sqlite"
+# Create missing tables at startup; on by default for SQLite so a fresh file is usable straight away.
+DB_BOOTSTRAP = os.getenv("PETSTORE_DB_BOOTSTRAP", "1" if DB_BACKEND == "sqlite" else "0") == "1"
+
+DB_HOST = os.getenv("PETSTORE_DB_HOST", "localhost")
+DB_PORT = int(os.getenv("PETSTORE_DB_PORT", "3306"))
+DB_USER = os.getenv("PETSTORE_DB_USER", "root")
+DB_PASSWORD = os.getenv("PETSTORE_DB_PASSWORD", "root")
+DB_NAME = os.getenv("PETSTORE_DB_NAME", "pet_store_db")
+
+# Embedded SQLite backend
+SQLITE_PATH = os.getenv("PETSTORE_SQLITE_PATH", "pet_store.db")
+SQLITE_BUSY_TIMEOUT = float(os.getenv("PETSTORE_SQLITE_BUSY_TIMEOUT", "5"))  # seconds to wait on a locked database
+SQLITE_STATEMENT_CACHE_SIZE = int(os.getenv("PETSTORE_SQLITE_STATEMENT_CACHE_SIZE", "256"))  # prepared statements kept per connection
+
+# Connection pool
+DB_POOL_SIZE = int(os.getenv("PETSTORE_DB_POOL_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("PETSTORE_DB_POOL_TIMEOUT", "5"))  # seconds to wait for a free connection
+DB_POOL_IDLE_TIMEOUT = float(os.getenv("PETSTORE_DB_POOL_IDLE_TIMEOUT", "300"))  # seconds before an idle connection is dropped
+
+# Worker threads for database work: run_db and the sync route handlers
+DB_THREADS = int(os.getenv("PETSTORE_DB_THREADS", str(DB_POOL_SIZE)))
+
+# Tag/category name lookup cache
+LOOKUP_CACHE_TTL = float(os.getenv("PETSTORE_LOOKUP_CACHE_TTL", "300"))
+LOOKUP_CACHE_SIZE = int(os.getenv("PETSTORE_LOOKUP_CACHE_SIZE", "4096"))
+
+# Bulk user import
+USER_IMPORT_CHUNK_SIZE = int(os.getenv("PETSTORE_USER_IMPORT_CHUNK_SIZE", "1000"))
+USER_IMPORT_MAX_USERS = int(os.getenv("PETSTORE_USER_IMPORT_MAX_USERS", "100"))  # each one costs a password hash
+
+# Batch pet create/update
+PET_BATCH_CHUNK_SIZE = int(os.getenv("PETSTORE_PET_BATCH_CHUNK_SIZE", "500"))
+
+# Order placement: batch chunking and how long Idempotency-Keys are remembered
+ORDER_BATCH_CHUNK_SIZE = int(os.getenv("PETSTORE_ORDER_BATCH_CHUNK_SIZE", "500"))
+IDEMPOTENCY_KEY_TTL = float(os.getenv("PETSTORE_IDEMPOTENCY_KEY_TTL", str(24 * 3600)))  # seconds
+
+# Bulk DELETE /pet and DELETE /store/order: rows per transaction
+PURGE_CHUNK_SIZE = int(os.getenv("PETSTORE_PURGE_CHUNK_SIZE", "1000"))
+
+# /store/inventory snapshot
+INVENTORY_CACHE_TTL = float(os.getenv("PETSTORE_INVENTORY_CACHE_TTL", "2"))
+
+# Image uploads
+MAX_UPLOAD_BYTES = int(os.getenv("PETSTORE_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("PETSTORE_UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+
+# Thumbnails generated by GET /uploaded_images/{filename}?w=
+THUMBNAIL_CACHE_BYTES = int(os.getenv("PETSTORE_THUMBNAIL_CACHE_BYTES", str(256 * 1024 * 1024)))
+
+# ETag response cache for GET /, /pets/{pet_id} and /user/{username}
+RESPONSE_CACHE_SIZE = int(os.getenv("PETSTORE_RESPONSE_CACHE_SIZE", "1024"))
+
+# Slow-query log and N+1 detector, read through GET /admin/queries
+QUERY_LOG_MODE = os.getenv("PETSTORE_QUERY_LOG", "production")  # "off", "production" or "development"
+QUERY_LOG_SIZE = int(os.getenv("PETSTORE_QUERY_LOG_SIZE", "500"))  # entries kept in the ring buffer
+SLOW_QUERY_MS = float(os.getenv("PETSTORE_SLOW_QUERY_MS", "100"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("PETSTORE_N_PLUS_ONE_THRESHOLD", "10"))  # same statement more often than this per request
+# Usernames allowed on the /admin endpoints (comma-separated); nobody when empty
+ADMIN_USERS = {name.strip() for name in os.getenv("PETSTORE_ADMIN_USERS", "").split(",") if name.strip()}
+
+# In-process catalogue snapshot serving GET /, /pets/{pet_id} and /pet/findByStatus
+PET_CATALOGUE = os.getenv("PETSTORE_PET_CATALOGUE", "0") == "1"
+PET_CATALOGUE_MAX_AGE = float(os.getenv("PETSTORE_PET_CATALOGUE_MAX_AGE", "300"))  # seconds between full reloads
+
+# Read endpoints map rows straight to JSON bytes (orjson when installed) instead of validating Pet models
+FAST_RESPONSES = os.getenv("PETSTORE_FAST_RESPONSES", "0") == "1"
+
+# Write-behind queue for PUT /pet/{petId}: "off", "async" (202 before the write) or "durable" (wait for the flush)
+PET_WRITE_BEHIND = os.getenv("PETSTORE_PET_WRITE_BEHIND", "off")
+PET_WRITE_BEHIND_INTERVAL = float(os.getenv("PETSTORE_PET_WRITE_BEHIND_INTERVAL", "0.1"))  # seconds between flushes
+PET_WRITE_BEHIND_BATCH_SIZE = int(os.getenv("PETSTORE_PET_WRITE_BEHIND_BATCH_SIZE", "500"))  # flush early at this many pets
+PET_WRITE_BEHIND_MAX_PENDING = int(os.getenv("PETSTORE_PET_WRITE_BEHIND_MAX_PENDING", "10000"))  # queue bound
+PET_WRITE_BEHIND_ENQUEUE_TIMEOUT = float(os.getenv("PETSTORE_PET_WRITE_BEHIND_ENQUEUE_TIMEOUT", "5"))  # seconds before a 503 when full
+PET_WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("PETSTORE_PET_WRITE_BEHIND_MAX_ATTEMPTS", "3"))  # failed flushes before an async update is dropped
+
+# Passwords: scrypt cost (n a power of two; each hash uses about 128 * n * r bytes) and hashing processes.
+# The process count defaults to the core count; serve.py divides that between its workers.
+PASSWORD_SCRYPT_N = int(os.getenv("PETSTORE_PASSWORD_SCRYPT_N", str(2 ** 14)))
+PASSWORD_SCRYPT_R = int(os.getenv("PETSTORE_PASSWORD_SCRYPT_R", "8"))
+PASSWORD_SCRYPT_P = int(os.getenv("PETSTORE_PASSWORD_SCRYPT_P", "1"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PETSTORE_PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+# Login tokens. Without a secret a random one is made per process, so tokens die with it and are not
+# shared between separately started servers.
+AUTH_SECRET = os.getenv("PETSTORE_AUTH_SECRET", "")
+AUTH_TOKEN_TTL = int(os.getenv("PETSTORE_AUTH_TOKEN_TTL", "3600"))  # seconds a login token is valid
+AUTH_CACHE_TTL = float(os.getenv("PETSTORE_AUTH_CACHE_TTL", "60"))  # seconds a verified token or credential is trusted
+AUTH_CACHE_SIZE = int(os.getenv("PETSTORE_AUTH_CACHE_SIZE", "10000"))
+
+# Multi-worker serving (python -m app.serve). Workers broadcast cache invalidations to each other over
+# Unix sockets in BROADCAST_DIR; serve.py creates one when it is not set, and it is off when empty.
+WORKERS = int(os.getenv("PETSTORE_WORKERS", str(os.cpu_count() or 1)))
+BROADCAST_DIR = os.getenv("PETSTORE_BROADCAST_DIR", "")
+BROADCAST_SEND_TIMEOUT = float(os.getenv("PETSTORE_BROADCAST_SEND_TIMEOUT", "1"))  # seconds before a message to a busy worker is dropped
+
+# Change feed behind GET /changes and its server-sent events stream
+CHANGE_FEED_PAGE_SIZE = int(os.getenv("PETSTORE_CHANGE_FEED_PAGE_SIZE", "500"))
+CHANGE_FEED_MAX_PAGE_SIZE = int(os.getenv("PETSTORE_CHANGE_FEED_MAX_PAGE_SIZE", "5000"))
+CHANGE_FEED_POLL_INTERVAL = float(os.getenv("PETSTORE_CHANGE_FEED_POLL_INTERVAL", "1"))  # seconds between stream polls without a wake-up
+CHANGE_FEED_KEEPALIVE = float(os.getenv("PETSTORE_CHANGE_FEED_KEEPALIVE", "15"))  # seconds of silence before a keep-alive comment
+# MySQL can commit changes out of sequence order; only serve changes at least this many seconds old there.
+CHANGE_FEED_SETTLE = float(os.getenv("PETSTORE_CHANGE_FEED_SETTLE", "1" if DB_BACKEND == "mysql" else "0"))
+
+# Pet listing
+PETS_PAGE_SIZE = int(os.getenv("PETSTORE_PETS_PAGE_SIZE", "100"))
+PETS_MAX_PAGE_SIZE = int(os.getenv("PETSTORE_PETS_MAX_PAGE_SIZE", "1000"))
@@ -1,183 +1,907 @@
+from datetime import datetime, timedelta, timezone
+from functools import partial
 from pathlib import Path
 import json
-from typing import List
+import threading
+from typing import Dict, List, Optional
 from fastapi import HTTPException
-from mysql.connector import Error
-import mysql.connector
-from .models import Tag, Pet, Order, User
+import anyio
+from .models import Tag, Pet, Order, User, UserConflict, UserPublic, Inventory, petStatus, orderStatus
+from .hydration import PET_SELECT, pet_filter_sql, hydrate_pet, pet_dict
+from .pool import ConnectionPool, PoolTimeout
+from .storage import Error, IntegrityError, get_backend
+from .cache import TTLCache
+from .passwords import hash_passwords
+from .signals import lookups_changed, on_lookups_changed
+from .instrumentation import timed
+from . import config
 
 UPLOAD_DIRECTORY = Path("./uploaded_images")
 UPLOAD_DIRECTORY.mkdir(parents=True, exist_ok=True)
 
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    get_backend().connect,
+                    size=config.DB_POOL_SIZE,
+                    timeout=config.DB_POOL_TIMEOUT,
+                    idle_timeout=config.DB_POOL_IDLE_TIMEOUT,
+                )
+    return _pool
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+def get_pool_stats():
+    return get_pool().stats()
+
+def limit_db_threads():
+    """Size anyio's default thread limiter to DB_THREADS. Call from inside the running event loop.
+
+    Sync route handlers run on that limiter (Starlette's threadpool), and so does run_db, so both kinds of
+    database work share one bound.
+    """
+    anyio.to_thread.current_default_thread_limiter().total_tokens = config.DB_THREADS
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking data-access function on a worker thread so the event loop keeps serving other requests.
+
+    Offloading is bounded by DB_THREADS (see limit_db_threads); by default that matches the pool size, so
+    threads do not pile up waiting for connections.
+    """
+    return await anyio.to_thread.run_sync(partial(func, *args, **kwargs))
+
 def get_db_connection():
+    """Borrow a connection from the pool. Calling close() on it returns it to the pool."""
     try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="root",
-            database="pet_store_db"
-        )
-        if connection.is_connected():
-            return connection
+        with timed("pool"):
+            return get_pool().acquire()
+    except PoolTimeout as e:
+        print(f"Error: {e}")
+        raise HTTPException(status_code=503, detail="Database connection pool exhausted")
     except Error as e:
         print(f"Error: {e}")
         raise HTTPException(status_code=500, detail="Database connection error")
 
 
-def get_categories_from_db():
+# Tags and categories are only ever added through the API, so resolving a tag name to its id or a category
+# id to its name is cached in process under "tag:<name>" and "category:<id>". Entries are stored from
+# committed rows only; writers that add tags call tags_committed() once their transaction has committed.
+lookup_cache = TTLCache(maxsize=config.LOOKUP_CACHE_SIZE, ttl=config.LOOKUP_CACHE_TTL)
+on_lookups_changed(lookup_cache.invalidate)
+
+def invalidate_lookup_cache(*keys):
+    lookups_changed(*keys)
+
+def _tag_key(name):
+    return f"tag:{name}"
+
+def tags_committed(tag_ids: Dict[str, int], created=()):
+    """Cache name -> id for tags that are now committed; created names are dropped in every worker first."""
+    if created:
+        invalidate_lookup_cache(*[_tag_key(name) for name in created])
+    for name, tag_id in tag_ids.items():
+        lookup_cache.set(_tag_key(name), tag_id)
+
+def get_category_name(cursor, category_id: int) -> Optional[str]:
+    """Name of a committed category, or None if it does not exist."""
+    key = f"category:{category_id}"
+    name = lookup_cache.get(key)
+    if name is None:
+        cursor.execute("SELECT name FROM categories WHERE id = %s", (category_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        name = row["name"]
+        lookup_cache.set(key, name)
+    return name
+
+def _user_from_row(user):
+    # The password hash stays in the database; auth.py reads it through get_user_password_from_db.
+    with timed("validation"):
+        return UserPublic(
+            id = user['id'],
+            username = user['username'],
+            firstName = user['firstName'],
+            lastName = user['lastName'],
+            email = user['email'],
+            phone = user['phone'],
+            userStatus = user['userStatus'],
+        )
+
+def _order_from_row(order):
+    with timed("validation"):
+        # Map the raw dictionary fields to the Pydantic model fields
+        return Order(
+            id=order["id"],
+            petId=order["pet_id"],  # Map 'pet_id' from DB to 'petId' in the model
+            quantity=order["quantity"],
+            shipDate=order["ship_date"],  # Map 'ship_date' from DB to 'shipDate' in the model
+            status=order["status"],
+            complete=bool(order["complete"])  # Ensure complete is a boolean
+        )
+
+def get_users_from_db():
     connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM categories")
-    categories = cursor.fetchall()
+    cursor.execute("SELECT * FROM users")
+    users = cursor.fetchall()
     cursor.close()
     connection.close()
-    return {category["id"]: category for category in categories}
 
-def get_tags_from_db():
+    return [_user_from_row(user) for user in users]
+
+
+def get_orders_from_db():
     connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM tags")
-    tags = cursor.fetchall()
+    cursor.execute("SELECT * FROM orders")
+    orders = cursor.fetchall()
     cursor.close()
     connection.close()
-    return {tag["id"]: tag for tag in tags}
 
-def get_pets_from_db():
+    return [_order_from_row(order) for order in orders]
+
+def fetch_pet_rows(where: str = "", params=(), order_by: str = "p.id", limit: Optional[int] = None):
+    """Raw PET_SELECT rows matching a WHERE clause, in one round trip."""
+    query = PET_SELECT + where + " ORDER BY " + order_by
+    params = list(params)
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+
     connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
-    
-    cursor.execute("SELECT * FROM pets")
-    pets = cursor.fetchall()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    cursor.close()
+    connection.close()
+    return rows
+
+def fetch_pets(where: str = "", params=(), order_by: str = "p.id", limit: Optional[int] = None, as_dict: bool = False):
+    """Fetch pets matching a WHERE clause over PET_SELECT in one round trip.
+
+    Returns an iterator that builds Pet models on demand, so only the rows a caller consumes are validated.
+    as_dict=True yields plain pet_dict() dicts instead, for the fast response path.
+    """
+    return map(pet_dict if as_dict else hydrate_pet, fetch_pet_rows(where, params, order_by, limit))
+
+def get_pets_from_db():
+    return list(fetch_pets())
+
+def get_pet_by_id_from_db(pet_id: int, as_dict: bool = False) -> Optional[Pet]:
+    return next(fetch_pets(" WHERE p.id = %s", (pet_id,), as_dict=as_dict), None)
+
+def find_pets_by_status_from_db(statuses: List[str], limit: int, after_id: Optional[int] = None,
+                                as_dict: bool = False) -> List[Pet]:
+    """One keyset page of the pets whose status is any of statuses, ordered by id."""
+    where, params = pet_filter_sql(after_id, statuses)
+    return list(fetch_pets(where, params, limit=limit, as_dict=as_dict))
 
-    categories = get_categories_from_db()
-    tags = get_tags_from_db()
+def query_pets_from_db(limit: int, after_id: Optional[int] = None, status: Optional[str] = None,
+                       category_id: Optional[int] = None, tag: Optional[str] = None, as_dict: bool = False) -> List[Pet]:
+    """One keyset page of pets ordered by id. Pass the last id of a page as after_id to get the next one."""
+    where, params = pet_filter_sql(after_id, status, category_id, tag)
+    return list(fetch_pets(where, params, limit=limit, as_dict=as_dict))
 
-    cursor.execute("SELECT * FROM pet_tags")
-    pet_tags = cursor.fetchall()
+def stream_pets_from_db(limit: Optional[int] = None, after_id: Optional[int] = None, status: Optional[str] = None,
+                        category_id: Optional[int] = None, tag: Optional[str] = None, batch_size: int = 500,
+                        as_dict: bool = False):
+    """Iterator over pets read from an unbuffered cursor, so memory stays flat however many rows match.
 
+    The connection is borrowed and the query started before this returns, so pool and SQL errors surface
+    here rather than halfway through a streamed response.
+    """
+    where, params = pet_filter_sql(after_id, status, category_id, tag)
+    query = PET_SELECT + where + " ORDER BY p.id"
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+
+    connection = get_db_connection()
+    cursor = connection.cursor(dictionary=True, buffered=False)
+    try:
+        cursor.execute(query, params)
+    except Error:
+        cursor.close()
+        connection.close()
+        raise
+    return _iter_pet_rows(connection, cursor, batch_size, pet_dict if as_dict else hydrate_pet)
+
+def _iter_pet_rows(connection, cursor, batch_size, convert):
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield convert(row)
+    finally:
+        # If the consumer stopped early the connection still has unread rows; the pool discards it on return.
+        try:
+            cursor.close()
+        except Error:
+            pass
+        connection.close()
+
+def pet_exists_in_db(pet_id: int) -> bool:
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT 1 FROM pets WHERE id = %s", (pet_id,))
+    row = cursor.fetchone()
     cursor.close()
     connection.close()
+    return row is not None
 
-    pet_tags_mapping = {}
-    for pet_tag in pet_tags:
-        pet_id = pet_tag['pet_id']
-        tag_id = pet_tag['tag_id']
-        if pet_id not in pet_tags_mapping:
-            pet_tags_mapping[pet_id] = []
-        pet_tags_mapping[pet_id].append(tags[tag_id])
-
-    pets_db = []
-    for pet in pets:
-        photo_urls = pet["photoUrls"]
-        if photo_urls:
-            photo_urls = eval(photo_urls)
-
-        pet_obj = Pet(
-            id=pet["id"],
-            category=categories[pet["category_id"]],
-            name=pet["name"],
-            photoUrls=photo_urls if photo_urls else [],
-            tags=pet_tags_mapping.get(pet["id"], []),
-            status=pet["status"]
-        )
-        pets_db.append(pet_obj)
+def image_url_in_use(image_url: str) -> bool:
+    """Whether any pet's photoUrls lists image_url."""
+    # Match the quoted JSON string, with LIKE's wildcards in it escaped so "_" and "%" match only themselves.
+    pattern = json.dumps(image_url).replace("!", "!!").replace("%", "!%").replace("_", "!_")
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT 1 FROM pets WHERE photoUrls LIKE %s ESCAPE '!' LIMIT 1", (f"%{pattern}%",))
+    row = cursor.fetchone()
+    cursor.close()
+    connection.close()
+    return row is not None
 
-    return pets_db
+def get_user_by_username_from_db(username: str) -> Optional[UserPublic]:
+    connection = get_db_connection()
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
+    user = cursor.fetchone()
+    cursor.close()
+    connection.close()
+    return _user_from_row(user) if user else None
 
-def get_users_from_db():
+def get_user_password_from_db(username: str) -> Optional[str]:
+    """The stored password hash, or None for an unknown user."""
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT password FROM users WHERE username = %s", (username,))
+    row = cursor.fetchone()
+    cursor.close()
+    connection.close()
+    return row[0] if row else None
+
+def set_user_password_in_db(username: str, password_hash: str):
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    try:
+        cursor.execute("UPDATE users SET password = %s WHERE username = %s", (password_hash, username))
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+
+def get_order_by_id_from_db(order_id: int) -> Optional[Order]:
     connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM users")
-    users = cursor.fetchall()
+    cursor.execute("SELECT * FROM orders WHERE id = %s", (order_id,))
+    order = cursor.fetchone()
     cursor.close()
     connection.close()
+    return _order_from_row(order) if order else None
 
-    mapped_users = []
-    for user in users:
-        mapped_user = User(
-            id = user['id'],
-            username = user['username'],
-            firstName = user['firstName'],
-            lastName = user['lastName'],
-            email = user['email'],
-            password = user['password'],
-            phone = user['phone'],
-            userStatus = user['userStatus'],
-        )
-        mapped_users.append(mapped_user)
-    
-    return mapped_users
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
+# Change feed. Writers append to it with the cursor of their own transaction, right before committing, so a
+# change becomes visible exactly when the write does and a rolled-back write leaves nothing behind.
+CHANGE_COLUMNS = "entity, entity_id, op, changed_at"
+_CHANGE_CHUNK_SIZE = 1000
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def record_changes(cursor, entity: str, op: str, ids):
+    """Append one change per id, a multi-row INSERT per _CHANGE_CHUNK_SIZE ids."""
+    changed_at = _now()
+    for chunk in _chunks(list(ids), _CHANGE_CHUNK_SIZE):
+        values = ", ".join(["(%s, %s, %s, %s)"] * len(chunk))
+        cursor.execute(f"INSERT INTO changes ({CHANGE_COLUMNS}) VALUES {values}",
+                       [value for entity_id in chunk for value in (entity, entity_id, op, changed_at)])
+
+def record_changes_where(cursor, entity: str, op: str, table: str, condition: str, params):
+    """Append one change per row of table matching condition, in one INSERT ... SELECT; called in the same
+    transaction, just before a DELETE with the same condition."""
+    cursor.execute(f"INSERT INTO changes ({CHANGE_COLUMNS}) SELECT %s, id, %s, %s FROM {table} WHERE {condition}",
+                   [entity, op, _now()] + list(params))
+
+def get_changes_from_db(since: int, limit: int, entity: Optional[str] = None, with_data: bool = False) -> List[dict]:
+    """Up to limit changes after sequence number since, oldest first.
+
+    With with_data, upserts carry the entity as it is now (None if it has been deleted since), so a
+    consumer does not need a request per change.
+    """
+    query = "SELECT id, entity, entity_id, op, changed_at FROM changes WHERE id > %s"
+    params = [since]
+    if entity is not None:
+        query += " AND entity = %s"
+        params.append(entity)
+    if config.CHANGE_FEED_SETTLE:
+        # A change is only served once it is older than any transaction that could still commit a lower id.
+        query += " AND changed_at <= %s"
+        params.append(_now() - timedelta(seconds=config.CHANGE_FEED_SETTLE))
+    query += " ORDER BY id LIMIT %s"
+    params.append(limit)
 
-def get_orders_from_db():
     connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM orders")
-    orders = cursor.fetchall()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
     cursor.close()
     connection.close()
-    
-    # Map the raw dictionary fields to the Pydantic model fields
-    mapped_orders = []
-    for order in orders:
-        mapped_order = Order(
-            id=order["id"],
-            petId=order["pet_id"],  # Map 'pet_id' from DB to 'petId' in the model
-            quantity=order["quantity"],
-            shipDate=order["ship_date"],  # Map 'ship_date' from DB to 'shipDate' in the model
-            status=order["status"],
-            complete=bool(order["complete"])  # Ensure complete is a boolean
-        )
-        mapped_orders.append(mapped_order)
-    
-    return mapped_orders
 
-def update_pet_image_in_db(pet_id: int, image_url: str):
-    try:
-        # Get the existing pet data
+    changes = [{"seq": row["id"], "entity": row["entity"], "id": row["entity_id"], "op": row["op"],
+                # SQLite hands TIMESTAMP columns back as text
+                "changedAt": datetime.fromisoformat(row["changed_at"]) if isinstance(row["changed_at"], str) else row["changed_at"]}
+               for row in rows]
+    if with_data:
+        current = _current_entities(changes)
+        for change in changes:
+            if change["op"] == "upsert":
+                change["data"] = current.get((change["entity"], change["id"]))
+    return changes
+
+def _current_entities(changes):
+    wanted = {}
+    for change in changes:
+        if change["op"] == "upsert":
+            wanted.setdefault(change["entity"], set()).add(change["id"])
+    current = {}
+    if wanted.get("pet"):
+        pet_ids = sorted(wanted["pet"])
+        for chunk in _chunks(pet_ids, _CHANGE_CHUNK_SIZE):
+            placeholders = ", ".join(["%s"] * len(chunk))
+            for pet in fetch_pets(f" WHERE p.id IN ({placeholders})", chunk, as_dict=True):
+                current["pet", pet["id"]] = pet
+    if wanted.get("order"):
+        order_ids = sorted(wanted["order"])
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
-        
-        # Fetch the current photoUrls for the pet
-        cursor.execute("SELECT photoUrls FROM pets WHERE id = %s", (pet_id,))
-        result = cursor.fetchone()
-        
-        if result is None:
-            raise HTTPException(status_code=404, detail="Pet not found")
-        
-        current_photo_urls = result['photoUrls']
+        for chunk in _chunks(order_ids, _CHANGE_CHUNK_SIZE):
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"SELECT * FROM orders WHERE id IN ({placeholders})", chunk)
+            for row in cursor.fetchall():
+                current["order", row["id"]] = _order_from_row(row)
+        cursor.close()
+        connection.close()
+    return current
+
+USER_COLUMNS = "username, firstName, lastName, email, password, phone, userStatus"
+INSERT_USER_QUERY = f"INSERT INTO users ({USER_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s, %s)"
+
+def _user_params(user: User):
+    return (user.username, user.firstName, user.lastName, user.email, user.password, user.phone, user.userStatus)
+
+def _select_users_by_username(cursor, usernames, chunk_size):
+    found = []
+    for chunk in _chunks(usernames, chunk_size):
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(f"SELECT * FROM users WHERE username IN ({placeholders})", chunk)
+        found.extend(cursor.fetchall())
+    return found
 
-        if current_photo_urls:
-            current_urls_list = json.loads(current_photo_urls)  # Load the existing JSON array
+def bulk_insert_users(users: List[User], chunk_size: int = config.USER_IMPORT_CHUNK_SIZE):
+    """Insert many users in one transaction, chunk_size rows per statement, with their passwords hashed.
+
+    Rows that cannot be inserted (repeated or already taken usernames, other constraint violations) are
+    reported as conflicts instead of failing the whole batch. Returns (created users, conflicts).
+    """
+    conflicts = []
+    pending = {}
+    for user in users:
+        if user.username in pending:
+            conflicts.append(UserConflict(username=user.username, reason="Duplicate username in request"))
         else:
-            current_urls_list = []  # Initialize as an empty list if it's empty or NULL
+            pending[user.username] = user
+    # Hashed up front, across all the hashing processes, rather than while holding a connection.
+    hashes = hash_passwords(user.password for user in pending.values())
+    pending = {username: user.model_copy(update={"password": password_hash})
+               for (username, user), password_hash in zip(pending.items(), hashes)}
 
-        current_urls_list.append(image_url)
-        updated_photo_urls = json.dumps(current_urls_list)
-        cursor.execute(
-            "UPDATE pets SET photoUrls = %s WHERE id = %s",
-            (updated_photo_urls, pet_id)
-        )
+    connection = get_db_connection()
+    cursor = connection.cursor(dictionary=True)
+    try:
+        for row in _select_users_by_username(cursor, list(pending), chunk_size):
+            del pending[row["username"]]
+            conflicts.append(UserConflict(username=row["username"], reason="Username already exists"))
+
+        inserted = []
+        for chunk in _chunks(list(pending.values()), chunk_size):
+            cursor.execute("SAVEPOINT user_chunk")
+            try:
+                cursor.executemany(INSERT_USER_QUERY, [_user_params(user) for user in chunk])
+                inserted.extend(user.username for user in chunk)
+            except IntegrityError:
+                # Something in this chunk collided (e.g. a concurrent insert or a unique email);
+                # redo it row by row so only the offending rows are dropped.
+                cursor.execute("ROLLBACK TO SAVEPOINT user_chunk")
+                for user in chunk:
+                    cursor.execute("SAVEPOINT user_row")
+                    try:
+                        cursor.execute(INSERT_USER_QUERY, _user_params(user))
+                        inserted.append(user.username)
+                    except IntegrityError as e:
+                        cursor.execute("ROLLBACK TO SAVEPOINT user_row")
+                        conflicts.append(UserConflict(username=user.username, reason=str(e)))
+            cursor.execute("RELEASE SAVEPOINT user_chunk")
+
+        created = _select_users_by_username(cursor, inserted, chunk_size)
         connection.commit()
+    finally:
         cursor.close()
         connection.close()
+
+    return [_user_from_row(user) for user in created], conflicts
+
+def get_inventory_from_db() -> Inventory:
+    """Counts per pet status and per order status, plus ordered quantity per order status, via GROUP BY."""
+    connection = get_db_connection()
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute("SELECT status, COUNT(*) AS count FROM pets GROUP BY status")
+    pet_rows = cursor.fetchall()
+    cursor.execute("SELECT status, COUNT(*) AS count, COALESCE(SUM(quantity), 0) AS quantity FROM orders GROUP BY status")
+    order_rows = cursor.fetchall()
+    cursor.close()
+    connection.close()
+
+    pets = {status.value: 0 for status in petStatus}
+    pets.update({row["status"]: row["count"] for row in pet_rows})
+    orders = {status.value: 0 for status in orderStatus}
+    orders.update({row["status"]: row["count"] for row in order_rows})
+    quantities = {status.value: 0 for status in orderStatus}
+    quantities.update({row["status"]: int(row["quantity"]) for row in order_rows})
+    return Inventory(pets=pets, orders=orders, quantities=quantities)
+
+# Dashboards poll the inventory; a short-lived snapshot keeps them from rescanning pets and orders every time.
+inventory_cache = TTLCache(maxsize=1, ttl=config.INVENTORY_CACHE_TTL)
+
+def get_inventory_snapshot() -> Inventory:
+    return inventory_cache.get_or_load("inventory", get_inventory_from_db)
+
+def update_pet_image_in_db(pet_id: int, image_url: str):
+    """Append image_url to the pet's photoUrls in a single statement, so concurrent uploads cannot lose each other's URLs."""
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "UPDATE pets SET photoUrls = "
+            + get_backend().json_array_append("COALESCE(NULLIF(photoUrls, ''), JSON_ARRAY())", "%s")
+            + " WHERE id = %s",
+            (image_url, pet_id)
+        )
+        if cursor.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Pet not found")
+        record_changes(cursor, "pet", "upsert", [pet_id])
+        connection.commit()
     except Error as e:
         print(f"Error: {e}")
         raise HTTPException(status_code=500, detail="Database update failed")
+    finally:
+        cursor.close()
+        connection.close()
 
-def add_tags_to_db(tags: List[Tag], pet_id: int, cursor):
-    tag_ids = []
+def add_tags_to_db(tags: List[Tag], pet_id: int, cursor, created=None):
+    tag_ids = resolve_tag_ids(cursor, [tag.name for tag in tags], created)
     for tag in tags:
-        cursor.execute("SELECT id FROM tags WHERE name = %s", (tag.name,))
-        result = cursor.fetchone()
-        if result:
-            tag_ids.append(result['id'])
-        else:
-            cursor.execute("INSERT INTO tags (name) VALUES (%s)", (tag.name,))
-            cursor.execute("SELECT id FROM tags WHERE name = %s", (tag.name,))
-            new_tag = cursor.fetchone()
-            tag_ids.append(new_tag['id'])
-        
-        cursor.execute("INSERT INTO pet_tags (pet_id, tag_id) VALUES (%s, %s)", (pet_id, tag_ids[-1]))
-    
-    return tag_ids
\ No newline at end of file
+        cursor.execute("INSERT INTO pet_tags (pet_id, tag_id) VALUES (%s, %s)", (pet_id, tag_ids[tag.name]))
+    return tag_ids
+
+def resolve_tag_ids(cursor, names, created=None) -> Dict[str, int]:
+    """Map tag names to ids with one SELECT, creating the missing tags with a single multi-row INSERT.
+
+    Names found in lookup_cache are not queried. The names of tags created here are appended to created, if
+    given; pass the result and created to tags_committed() after the commit.
+    """
+    names = list(dict.fromkeys(names))
+    tag_ids = {}
+    for name in names:
+        tag_id = lookup_cache.get(_tag_key(name))
+        if tag_id is not None:
+            tag_ids[name] = tag_id
+    names = [name for name in names if name not in tag_ids]
+    if not names:
+        return tag_ids
+
+    def select_ids(wanted):
+        placeholders = ", ".join(["%s"] * len(wanted))
+        cursor.execute(f"SELECT id, name FROM tags WHERE name IN ({placeholders})", wanted)
+        return {row["name"]: row["id"] for row in cursor.fetchall()}
+
+    tag_ids.update(select_ids(names))
+    missing = [name for name in names if name not in tag_ids]
+    if missing:
+        cursor.executemany("INSERT INTO tags (name) VALUES (%s)", [(name,) for name in missing])
+        tag_ids.update(select_ids(missing))
+        if created is not None:
+            created.extend(missing)
+    return tag_ids
+
+def _insert_pet_tags(cursor, pet_ids, pets, tag_ids):
+    pairs = [(pet_id, tag_ids[name])
+             for pet_id, pet in zip(pet_ids, pets)
+             for name in dict.fromkeys(tag.name for tag in pet.tags)]
+    if pairs:
+        cursor.executemany("INSERT INTO pet_tags (pet_id, tag_id) VALUES (%s, %s)", pairs)
+
+def _get_pets_by_ids(pet_ids: List[int], chunk_size: int) -> List[Pet]:
+    pets = []
+    for chunk in _chunks(pet_ids, chunk_size):
+        placeholders = ", ".join(["%s"] * len(chunk))
+        pets.extend(fetch_pets(f" WHERE p.id IN ({placeholders})", chunk))
+    return pets
+
+def bulk_create_pets(pets: List[Pet], chunk_size: int = config.PET_BATCH_CHUNK_SIZE) -> List[Pet]:
+    """Insert many pets and their tags in one transaction, one multi-row INSERT per chunk."""
+    connection = get_db_connection()
+    cursor = connection.cursor(dictionary=True)
+    try:
+        created = []
+        tag_ids = resolve_tag_ids(cursor, [tag.name for pet in pets for tag in pet.tags], created)
+
+        pet_ids = []
+        for chunk in _chunks(pets, chunk_size):
+            values = ", ".join(["(%s, %s, %s, %s)"] * len(chunk))
+            params = [value for pet in chunk
+                      for value in (pet.category.id, pet.name, json.dumps(pet.photoUrls), pet.status.value)]
+            cursor.execute(f"INSERT INTO pets (category_id, name, photoUrls, status) VALUES {values}", params)
+            chunk_ids = get_backend().insert_ids(cursor, len(chunk))
+            _insert_pet_tags(cursor, chunk_ids, chunk, tag_ids)
+            pet_ids.extend(chunk_ids)
+
+        record_changes(cursor, "pet", "upsert", pet_ids)
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+
+    tags_committed(tag_ids, created)
+    return _get_pets_by_ids(pet_ids, chunk_size)
+
+def bulk_update_pets(pets: List[Pet], chunk_size: int = config.PET_BATCH_CHUNK_SIZE) -> List[Pet]:
+    """Update many pets and replace their tags in one transaction.
+
+    Every id must exist; otherwise nothing is written and a 404 lists the missing ids. As with PUT /pet,
+    an empty photoUrls list leaves the stored URLs untouched.
+    """
+    pets = list({pet.id: pet for pet in pets}.values())  # last entry wins for repeated ids
+    pet_ids = [pet.id for pet in pets]
+
+    connection = get_db_connection()
+    cursor = connection.cursor(dictionary=True)
+    try:
+        existing = set()
+        for chunk in _chunks(pet_ids, chunk_size):
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"SELECT id FROM pets WHERE id IN ({placeholders})", chunk)
+            existing.update(row["id"] for row in cursor.fetchall())
+        missing = [pet_id for pet_id in pet_ids if pet_id not in existing]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Pets not found: {missing}")
+
+        created = []
+        tag_ids = resolve_tag_ids(cursor, [tag.name for pet in pets for tag in pet.tags], created)
+
+        for chunk in _chunks(pets, chunk_size):
+            cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+            with_urls = [pet for pet in chunk if pet.photoUrls]
+            url_cases = " ".join(["WHEN %s THEN %s"] * len(with_urls))
+            placeholders = ", ".join(["%s"] * len(chunk))
+            chunk_ids = [pet.id for pet in chunk]
+            cursor.execute(
+                f"""UPDATE pets SET
+                    category_id = CASE id {cases} END,
+                    name = CASE id {cases} END,
+                    status = CASE id {cases} END,
+                    photoUrls = {f"CASE id {url_cases} ELSE photoUrls END" if with_urls else "photoUrls"}
+                WHERE id IN ({placeholders})""",
+                [v for pet in chunk for v in (pet.id, pet.category.id)]
+                + [v for pet in chunk for v in (pet.id, pet.name)]
+                + [v for pet in chunk for v in (pet.id, pet.status.value)]
+                + [v for pet in with_urls for v in (pet.id, json.dumps(pet.photoUrls))]
+                + chunk_ids,
+            )
+            cursor.execute(f"DELETE FROM pet_tags WHERE pet_id IN ({placeholders})", chunk_ids)
+            _insert_pet_tags(cursor, chunk_ids, chunk, tag_ids)
+
+        record_changes(cursor, "pet", "upsert", pet_ids)
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+
+    tags_committed(tag_ids, created)
+    return _get_pets_by_ids(pet_ids, chunk_size)
+
+def update_pet_names_and_statuses(updates: Dict[int, tuple], chunk_size: int = config.PET_BATCH_CHUNK_SIZE) -> set:
+    """Set name and status for many pets in one transaction; updates maps pet id -> (name, status).
+
+    Returns the ids that exist. Ids that do not are skipped. The existence check is a separate SELECT
+    because MySQL reports 0 affected rows for an UPDATE that changes nothing.
+    """
+    pet_ids = sorted(updates)
+    connection = get_db_connection()
+    cursor = connection.cursor(dictionary=True)
+    try:
+        found = set()
+        for chunk in _chunks(pet_ids, chunk_size):
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"SELECT id FROM pets WHERE id IN ({placeholders})", chunk)
+            chunk = [row["id"] for row in cursor.fetchall()]
+            if not chunk:
+                continue
+            found.update(chunk)
+            cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(
+                f"""UPDATE pets SET
+                    name = CASE id {cases} END,
+                    status = CASE id {cases} END
+                WHERE id IN ({placeholders})""",
+                [v for pet_id in chunk for v in (pet_id, updates[pet_id][0])]
+                + [v for pet_id in chunk for v in (pet_id, updates[pet_id][1])]
+                + chunk,
+            )
+        record_changes(cursor, "pet", "upsert", sorted(found))
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+    return found
+
+ORDER_COLUMNS = "pet_id, quantity, ship_date, status, complete"
+
+def _order_params(order: Order):
+    return (order.petId, order.quantity, order.shipDate, order.status.value, order.complete)
+
+def insert_order(cursor, order: Order) -> Order:
+    """Insert an order only if its pet exists and is not sold, in a single conditional INSERT.
+
+    The check and the write are one statement, so a pet deleted or sold concurrently cannot slip through.
+    404 if the pet does not exist, 409 if it is sold. The caller commits.
+    """
+    cursor.execute(f"""
+        INSERT INTO orders ({ORDER_COLUMNS})
+        SELECT id, %s, %s, %s, %s FROM pets WHERE id = %s AND status <> 'sold'
+    """, _order_params(order)[1:] + (order.petId,))
+    if cursor.rowcount == 0:
+        # Only the failure path pays for a second query, to tell the two cases apart.
+        cursor.execute("SELECT status FROM pets WHERE id = %s", (order.petId,))
+        pet = cursor.fetchone()
+        if pet is None:
+            raise HTTPException(status_code=404, detail="Pet not found")
+        raise HTTPException(status_code=409, detail=f"Pet {order.petId} is already sold")
+    order_id = cursor.lastrowid
+    record_changes(cursor, "order", "upsert", [order_id])
+    return order.model_copy(update={"id": order_id})
+
+def insert_orders(cursor, orders: List[Order], chunk_size: int = config.ORDER_BATCH_CHUNK_SIZE) -> List[Order]:
+    """Insert many orders; the caller commits, so either all of them are written or none are.
+
+    The pets are locked (SELECT ... FOR UPDATE) before anything is inserted. A 404 lists pets that do not
+    exist and a 409 lists pets that are sold.
+    """
+    if not orders:
+        return []
+    pet_ids = sorted({order.petId for order in orders})
+
+    statuses = {}
+    for chunk in _chunks(pet_ids, chunk_size):
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(f"SELECT id, status FROM pets WHERE id IN ({placeholders}) FOR UPDATE", chunk)
+        statuses.update((row["id"], row["status"]) for row in cursor.fetchall())
+    missing = [pet_id for pet_id in pet_ids if pet_id not in statuses]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Pets not found: {missing}")
+    sold = [pet_id for pet_id in pet_ids if statuses[pet_id] == "sold"]
+    if sold:
+        raise HTTPException(status_code=409, detail=f"Pets already sold: {sold}")
+
+    order_ids = []
+    for chunk in _chunks(orders, chunk_size):
+        values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(chunk))
+        params = [value for order in chunk for value in _order_params(order)]
+        cursor.execute(f"INSERT INTO orders ({ORDER_COLUMNS}) VALUES {values}", params)
+        order_ids.extend(get_backend().insert_ids(cursor, len(chunk)))
+    record_changes(cursor, "order", "upsert", order_ids)
+    return [order.model_copy(update={"id": order_id}) for order, order_id in zip(orders, order_ids)]
+
+# Idempotency keys (see idempotency.py). A key's row is inserted in the same transaction as the write it
+# guards and gets the response body before that transaction commits, so the primary key decides which
+# request runs even when retries reach different workers, and a failed write leaves no key behind.
+def write_idempotent(write, encode, claim=None):
+    """Run write(cursor) in one transaction and return (result, body) with body = encode(result).
+
+    claim is (scope, key, fingerprint, ttl). The key is inserted first and body stored on it before the
+    commit. If the key is already taken, nothing is written and (None, stored body) is returned; 422 if it
+    was taken by a request with a different fingerprint. A retry that arrives while the first request is
+    still running waits on the key's row lock and then gets the stored body.
+    """
+    connection = get_db_connection()
+    cursor = connection.cursor(dictionary=True)
+    try:
+        if claim is not None:
+            stored = _claim_idempotency_key(connection, cursor, *claim)
+            if stored is not None:
+                return None, stored
+        result = write(cursor)
+        body = encode(result)
+        if claim is not None:
+            cursor.execute("UPDATE idempotency_keys SET body = %s WHERE scope = %s AND idem_key = %s",
+                           (body, claim[0], claim[1]))
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+    return result, body
+
+def _claim_idempotency_key(connection, cursor, scope: str, key: str, fingerprint: str, ttl: float) -> Optional[bytes]:
+    """Insert the key's row in the open transaction: None if this call got it, else the stored body."""
+    while True:
+        try:
+            cursor.execute("INSERT INTO idempotency_keys (scope, idem_key, fingerprint, created_at) VALUES (%s, %s, %s, %s)",
+                           (scope, key, fingerprint, _now()))
+            return None
+        except IntegrityError:
+            connection.rollback()
+        expired_before = _now() - timedelta(seconds=ttl)
+        cursor.execute("SELECT fingerprint, body, created_at < %s AS expired FROM idempotency_keys "
+                       "WHERE scope = %s AND idem_key = %s", (expired_before, scope, key))
+        row = cursor.fetchone()
+        if row is not None and not row["expired"]:
+            connection.rollback()
+            if row["fingerprint"] != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+            return bytes(row["body"])
+        if row is not None:
+            # Expired: replaced within this transaction by the INSERT on the next pass.
+            cursor.execute("DELETE FROM idempotency_keys WHERE scope = %s AND idem_key = %s AND created_at < %s",
+                           (scope, key, expired_before))
+
+def purge_idempotency_keys(ttl: float):
+    """Drop keys older than ttl seconds."""
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    try:
+        cursor.execute("DELETE FROM idempotency_keys WHERE created_at < %s", (_now() - timedelta(seconds=ttl),))
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+
+def _delete_pets(cursor, pet_ids, status: Optional[str] = None) -> int:
+    """Delete the given pets (only those with status, if given) and their tags and orders; returns the count."""
+    condition = "id IN (" + ", ".join(["%s"] * len(pet_ids)) + ")"
+    params = list(pet_ids)
+    if status is not None:
+        condition += " AND status = %s"
+        params.append(status)
+    # Orders go with their pets through ON DELETE CASCADE; they are deletions in the change feed too.
+    record_changes_where(cursor, "order", "delete", "orders",
+                         f"pet_id IN (SELECT id FROM pets WHERE {condition})", params)
+    record_changes_where(cursor, "pet", "delete", "pets", condition, params)
+    cursor.execute(f"DELETE FROM pets WHERE {condition}", params)
+    return cursor.rowcount
+
+def delete_pet_from_db(pet_id: int) -> bool:
+    """Delete a pet with its tags and orders. False if there was no such pet."""
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    try:
+        deleted = _delete_pets(cursor, [pet_id])
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+    return deleted > 0
+
+def _delete_where(table: str, condition: str, params, entity: Optional[str] = None) -> int:
+    """Delete matching rows in one transaction, recording them in the change feed as entity if given."""
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    try:
+        if entity is not None:
+            record_changes_where(cursor, entity, "delete", table, condition, params)
+        cursor.execute(f"DELETE FROM {table} WHERE {condition}", params)
+        deleted = cursor.rowcount
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+    return deleted
+
+def delete_user_from_db(username: str) -> bool:
+    return _delete_where("users", "username = %s", (username,)) > 0
+
+def delete_order_from_db(order_id: int) -> bool:
+    return _delete_where("orders", "id = %s", (order_id,), entity="order") > 0
+
+def _keyset_id_chunks(table: str, condition: str, params, chunk_size: int):
+    """Ids of matching rows, chunk_size at a time in id order, each chunk read on a freshly borrowed connection."""
+    after_id = 0
+    while True:
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute(f"SELECT id FROM {table} WHERE {condition} AND id > %s ORDER BY id LIMIT %s",
+                           list(params) + [after_id, chunk_size])
+            ids = [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+            connection.close()
+        if not ids:
+            return
+        yield ids
+        after_id = ids[-1]
+
+def purge_pets(status: Optional[str] = None, pet_ids: Optional[List[int]] = None,
+               chunk_size: int = config.PURGE_CHUNK_SIZE):
+    """Delete pets by status and/or id, one short transaction per chunk so locks are never held for long.
+
+    Yields (progress, ids) after each chunk is committed; ids are the pets the chunk covered.
+    """
+    if pet_ids is not None:
+        chunks = _chunks(sorted(set(pet_ids)), chunk_size)
+    else:
+        chunks = _keyset_id_chunks("pets", "status = %s", [status], chunk_size)
+    total = 0
+    for chunk in chunks:
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        try:
+            # Re-checks the status, in case a pet changed since its id was read.
+            deleted = _delete_pets(cursor, chunk, status)
+            connection.commit()
+        finally:
+            cursor.close()
+            connection.close()
+        total += deleted
+        yield {"deleted": deleted, "deleted_total": total, "last_id": chunk[-1]}, chunk
+
+def purge_orders(before: datetime, chunk_size: int = config.PURGE_CHUNK_SIZE):
+    """Delete orders shipping before a date, one short transaction per chunk; yields (progress, ids) like purge_pets."""
+    total = 0
+    for chunk in _keyset_id_chunks("orders", "ship_date < %s", [before], chunk_size):
+        placeholders = ", ".join(["%s"] * len(chunk))
+        deleted = _delete_where("orders", f"id IN ({placeholders}) AND ship_date < %s", chunk + [before], entity="order")
+        total += deleted
+        yield {"deleted": deleted, "deleted_total": total, "last_id": chunk[-1]}, chunk
+
+def purge_changes(before: datetime, chunk_size: int = config.PURGE_CHUNK_SIZE):
+    """Drop change feed entries recorded before a date; yields (progress, ids) like purge_pets."""
+    total = 0
+    for chunk in _keyset_id_chunks("changes", "changed_at < %s", [before], chunk_size):
+        deleted = _delete_where("changes", "id <= %s AND changed_at < %s", [chunk[-1], before])
+        total += deleted
+        yield {"deleted": deleted, "deleted_total": total, "last_id": chunk[-1]}, chunk
+
+def progress_ndjson(progress, on_chunk=None):
+    """NDJSON lines for a purge_* generator, ending with a done (or error) line.
+
+    The response has already started by the time a chunk fails, so failures are reported in the stream.
+    """
+    total = 0
+    try:
+        for report, ids in progress:
+            total = report["deleted_total"]
+            if on_chunk is not None:
+                on_chunk(*ids)
+            yield json.dumps(report) + "\n"
+    except (HTTPException, *Error) as e:
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        yield json.dumps({"error": detail, "deleted_total": total}) + "\n"
+        return
+    yield json.dumps({"done": True, "deleted_total": total}) + "\n"
@@ -0,0 +1,71 @@
+"""Conditional-GET responses for the hot read endpoints.
+
+cached_json() serves a body from the in-process ResponseCache (or builds and stores it), tags it with an
+ETag derived from its bytes and answers If-None-Match with 304. Write endpoints call the invalidate_*
+helpers after they commit; pet and user writes reach them through signals.pets_changed and users_changed.
+"""
+import hashlib
+import json
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from . import catalogue, config
+from .cache import ResponseCache
+from .dependencies import run_db
+from .hydration import encode_json
+from .instrumentation import timed
+from .signals import on_pets_changed, on_users_changed
+
+response_cache = ResponseCache(maxsize=config.RESPONSE_CACHE_SIZE)
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+
+async def cached_json(request: Request, key, load, headers=None):
+    """Response for key, loading it with load() (run via run_db) on a miss.
+
+    Returns None when load() does, so the caller can raise its own 404. headers(value) may add
+    response headers; they are cached along with the body.
+    """
+    entry = response_cache.get(key)
+    if entry is None:
+        version = response_cache.version()
+        value = await run_db(load)
+        if value is None:
+            return None
+        with timed("serialisation"):
+            if config.FAST_RESPONSES:
+                body = encode_json(value)
+            else:
+                body = json.dumps(jsonable_encoder(value), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        entry = (_etag(body), body, headers(value) if headers else {})
+        response_cache.put(key, *entry, version)
+
+    etag, body, extra_headers = entry
+    response_headers = {"ETag": etag, "Cache-Control": "no-cache", **extra_headers}
+    if _matches(request, etag):
+        return Response(status_code=304, headers=response_headers)
+    return Response(body, media_type="application/json", headers=response_headers)
+
+
+@on_pets_changed
+def invalidate_pets(*pet_ids):
+    """Drop the given pets and every cached pet list page, after marking them stale in the catalogue."""
+    catalogue.mark_stale(*pet_ids)
+    response_cache.invalidate(*[("pet", pet_id) for pet_id in pet_ids])
+    response_cache.invalidate_namespace("pets")
+
+
+@on_users_changed
+def invalidate_users(*usernames):
+    response_cache.invalidate(*[("user", username) for username in usernames])
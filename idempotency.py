@@ -0,0 +1,48 @@
+"""Idempotency-Key handling for POST endpoints.
+
+The first request with a key runs and its response body is remembered; a retry with the same key and the
+same payload gets that body back (with Idempotent-Replayed: true) instead of running again. A key reused
+with a different payload is a 422. A retry that arrives while the first request is still running waits for
+it to finish and is then replayed.
+
+Keys are kept in the idempotency_keys table, so a retry is recognised whichever worker or server it reaches.
+The key, the write and the remembered body are committed in one transaction (see
+dependencies.write_idempotent): a request that fails, or a process that dies half way, leaves no key behind.
+Each key is remembered for IDEMPOTENCY_KEY_TTL seconds; expired keys are swept out at most once a minute per
+process.
+"""
+import hashlib
+import time
+
+from fastapi import Response
+
+from . import config
+from .dependencies import purge_idempotency_keys, write_idempotent
+from .hydration import encode_json
+
+_SWEEP_INTERVAL = 60.0  # seconds
+_next_sweep = 0.0
+
+
+def _sweep():
+    global _next_sweep
+    now = time.monotonic()
+    if now >= _next_sweep:
+        _next_sweep = now + _SWEEP_INTERVAL
+        purge_idempotency_keys(config.IDEMPOTENCY_KEY_TTL)
+
+
+def idempotent(scope, key, payload, write, on_commit):
+    """Response for write(cursor), run at most once per (scope, key). Without a key it always runs.
+
+    on_commit(result) runs after the transaction has committed, and only when write ran.
+    """
+    claim = None
+    if key is not None:
+        _sweep()
+        claim = (scope, key, hashlib.sha256(encode_json(payload)).hexdigest(), config.IDEMPOTENCY_KEY_TTL)
+    result, body = write_idempotent(write, encode_json, claim)
+    if result is None:
+        return Response(body, media_type="application/json", headers={"Idempotent-Replayed": "true"})
+    on_commit(result)
+    return Response(body, media_type="application/json")
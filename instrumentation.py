@@ -0,0 +1,291 @@
+"""Per-request timing and the Prometheus metrics behind GET /metrics.
+
+RequestTimingMiddleware starts a RequestStats for every HTTP request and keeps it in a context variable, which
+anyio copies into the worker threads used by run_db and by sync handlers. Code further down adds to it:
+InstrumentedCursor (handed out by every pooled connection) counts statements and times execute and fetch
+calls, and timed() wraps model validation and JSON rendering. When the response starts, the totals go out
+as a Server-Timing header and into the per-route histograms.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi.responses import JSONResponse
+
+from . import query_log
+
+PHASES = ("db", "pool", "validation", "serialisation")
+
+# Prometheus' default latency buckets, in seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "seconds", "_statements", "_lock")
+
+    def __init__(self, scope=None):
+        self.scope = scope or {}
+        self.queries = 0
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self._statements = {}  # normalised SQL -> times run, filled in by query_log
+        # Handlers may run several run_db calls at once; they all add to the same totals.
+        self._lock = threading.Lock()
+
+    @property
+    def method(self):
+        return self.scope.get("method")
+
+    @property
+    def route(self):
+        return route_label(self.scope)
+
+    def add(self, phase, seconds, queries=0):
+        with self._lock:
+            self.seconds[phase] += seconds
+            self.queries += queries
+
+    def count_statement(self, statement):
+        with self._lock:
+            self._statements[statement] = self._statements.get(statement, 0) + 1
+
+    def statement_counts(self):
+        with self._lock:
+            return dict(self._statements)
+
+
+_current_stats: ContextVar = ContextVar("request_stats", default=None)
+
+
+def current_stats():
+    return _current_stats.get()
+
+
+def record(phase, seconds, queries=0):
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.add(phase, seconds, queries)
+
+
+@contextmanager
+def timed(phase):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - started)
+
+
+def _statement_done(query, params, started, many=False):
+    seconds = time.perf_counter() - started
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.add("db", seconds, queries=1)
+    query_log.observe(query, params, seconds, stats, many)
+
+
+class InstrumentedCursor:
+    """Cursor proxy that charges statement count and time spent in the driver to the current request."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(query, params)
+        finally:
+            _statement_done(query, params, started)
+
+    def executemany(self, query, seq_params):
+        seq_params = list(seq_params)  # may be a generator; the query log looks at it too
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, seq_params)
+        finally:
+            _statement_done(query, seq_params, started, many=True)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try:
+            return self._cursor.fetchone()
+        finally:
+            record("db", time.perf_counter() - started)
+
+    def fetchmany(self, size=1):
+        started = time.perf_counter()
+        try:
+            return self._cursor.fetchmany(size)
+        finally:
+            record("db", time.perf_counter() - started)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return self._cursor.fetchall()
+        finally:
+            record("db", time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TimedJSONResponse(JSONResponse):
+    """Default response class: charges rendering the JSON body to the serialisation phase."""
+
+    def render(self, content) -> bytes:
+        with timed("serialisation"):
+            return super().render(content)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+_INF = 'le="+Inf"'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        for label_values, values in series:
+            for bound, count in zip(self.buckets, values):
+                labels = _labels(self.label_names, label_values, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, label_values, _INF)} {values[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, label_values)} {_number(values[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, label_values)} {values[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for label_values, value in series:
+            lines.append(f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}")
+        return lines
+
+
+def gauges(name, help_text, label_name, values):
+    """Exposition lines for a gauge family with one label, from a {label value: number} mapping."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for label_value, value in values.items():
+        lines.append(f"{name}{_labels((label_name,), (label_value,))} {_number(value)}")
+    return lines
+
+
+_ROUTE_LABELS = ("method", "route")
+
+REQUEST_SECONDS = Histogram("petstore_request_duration_seconds", "Time from request start to response start.",
+                            _ROUTE_LABELS + ("status",))
+REQUEST_QUERIES = Histogram("petstore_request_db_queries", "SQL statements executed per request.",
+                            _ROUTE_LABELS, buckets=QUERY_BUCKETS)
+PHASE_SECONDS = Counter("petstore_request_phase_seconds_total",
+                        "Time spent per request phase (db, pool, validation, serialisation).", _ROUTE_LABELS + ("phase",))
+
+
+def route_label(scope):
+    """Route template such as /pet/{petId}, so metrics do not get a series per id."""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path or "unmatched"
+
+
+def server_timing(stats, total):
+    parts = [f'db;dur={stats.seconds["db"] * 1000:.2f};desc="{stats.queries} queries"']
+    parts += [f"{phase};dur={stats.seconds[phase] * 1000:.2f}" for phase in PHASES[1:] if stats.seconds[phase]]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def observe_request(method, route, status, stats, total):
+    REQUEST_SECONDS.observe((method, route, str(status)), total)
+    REQUEST_QUERIES.observe((method, route), stats.queries)
+    for phase, seconds in stats.seconds.items():
+        if seconds:
+            PHASE_SECONDS.inc((method, route, phase), seconds)
+
+
+class RequestTimingMiddleware:
+    """Pure ASGI middleware, so the header can be added without buffering the response body."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - started
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(stats, total).encode("latin-1")))
+                message = {**message, "headers": headers}
+                observe_request(scope["method"], route_label(scope), message["status"], stats, total)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(token)
+            query_log.finish_request(stats)
+
+
+def render_metrics(extra=()):
+    lines = []
+    for metric in (REQUEST_SECONDS, REQUEST_QUERIES, PHASE_SECONDS):
+        lines += metric.render()
+    for family in extra:
+        lines += family
+    return "\n".join(lines) + "\n"
@@ -1,12 +1,39 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from .routers import pets, users, store
+from .routers import pets, users, store, images, metrics, admin, changes
+from . import broadcast, config, passwords
+from .dependencies import close_pool, limit_db_threads
+from .instrumentation import RequestTimingMiddleware, TimedJSONResponse
+from .schema import prepare_schema
+from .uploads import UploadSizeLimitMiddleware
+from .write_behind import pet_status_writer
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    prepare_schema()
+    limit_db_threads()
+    if config.PET_WRITE_BEHIND != "off":
+        await pet_status_writer.start()
+    await broadcast.start()
+    yield
+    await pet_status_writer.close()  # drain queued pet updates while the pool is still open
+    broadcast.close()  # after the drain, so the invalidations it sends still reach the other workers
+    close_pool()
+    passwords.shutdown()
+
+app = FastAPI(lifespan=lifespan, default_response_class=TimedJSONResponse)
+app.add_middleware(UploadSizeLimitMiddleware)
+app.add_middleware(RequestTimingMiddleware)
 
 app.include_router(pets.router)
 app.include_router(users.router)
 app.include_router(store.router)
+app.include_router(images.router)
+app.include_router(metrics.router)
+app.include_router(admin.router)
+app.include_router(changes.router)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    # Development only; python -m app.serve runs the multi-worker production server.
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
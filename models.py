@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from enum import Enum
-from typing import List
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class petStatus(str, Enum):
@@ -8,6 +8,10 @@ class petStatus(str, Enum):
     pending = "pending"
     sold = "sold"
 
+class changeOp(str, Enum):
+    upsert = "upsert"
+    delete = "delete"
+
 class orderStatus(str, Enum):
     placed = "placed"
     approved = "approved"
@@ -36,6 +40,42 @@ class User(BaseModel):
     phone: str
     userStatus: int
 
+class UserPublic(BaseModel):
+    id: int
+    username: str
+    firstName: str
+    lastName: str
+    email: str
+    phone: str
+    userStatus: int
+
+class UserUpdate(BaseModel):
+    id: int
+    username: str
+    firstName: str
+    lastName: str
+    email: str
+    password: Optional[str] = None
+    phone: str
+    userStatus: int
+
+class Credentials(BaseModel):
+    username: str
+    password: str
+
+class LoginToken(BaseModel):
+    token: str
+    tokenType: str = "bearer"
+    expiresAt: datetime
+
+class UserConflict(BaseModel):
+    username: str
+    reason: str
+
+class BulkUserResponse(BaseModel):
+    created: List[UserPublic]
+    conflicts: List[UserConflict] = []
+
 class Pet(BaseModel):
     id: int
     category: Category
@@ -44,10 +84,28 @@ class Pet(BaseModel):
     tags: List[Tag] = []
     status: petStatus
 
+class Inventory(BaseModel):
+    pets: Dict[petStatus, int]
+    orders: Dict[orderStatus, int]
+    quantities: Dict[orderStatus, int]
+
 class Order(BaseModel):
     id: int
     petId: int
     quantity: int
     shipDate: datetime
     status: orderStatus
-    complete: bool
\ No newline at end of file
+    complete: bool
+
+class Change(BaseModel):
+    seq: int
+    entity: str
+    id: int
+    op: changeOp
+    changedAt: datetime
+    data: Optional[dict] = None
+
+class ChangeBatch(BaseModel):
+    changes: List[Change]
+    next: int
+    more: bool
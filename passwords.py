@@ -0,0 +1,108 @@
+"""Password hashing for users.
+
+Passwords are stored as scrypt$<n>$<r>$<p>$<salt>$<hash> (salt and hash base64). scrypt is memory-hard:
+each hash touches about 128 * n * r bytes, 16 MiB with the default PETSTORE_PASSWORD_SCRYPT_N/_R. The
+parameters are kept with every hash, so they can be raised later; needs_rehash() tells login to upgrade
+hashes made with older settings, and rows still holding a plaintext password from before hashing existed.
+
+Hashing is slow on purpose, so it runs in a pool of PETSTORE_PASSWORD_HASH_WORKERS processes. Async code
+awaits hash_async()/verify_async() and the event loop keeps serving; sync handlers call hash_password()
+or hash_passwords(), which block only the calling worker thread while another process does the work.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from . import config
+
+PREFIX = "scrypt"
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode("ascii")
+
+
+def _scrypt(password, salt, n, r, p):
+    # hashlib refuses to use more than maxmem bytes; give it what these parameters need plus some slack.
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, dklen=KEY_BYTES,
+                          maxmem=128 * r * (n + p + 2) + 1024 * 1024)
+
+
+def compute_hash(password, n=None, r=None, p=None):
+    """Hash a password with the configured (or given) cost. CPU-bound; runs in the pool."""
+    n = n or config.PASSWORD_SCRYPT_N
+    r = r or config.PASSWORD_SCRYPT_R
+    p = p or config.PASSWORD_SCRYPT_P
+    salt = os.urandom(SALT_BYTES)
+    return f"{PREFIX}${n}${r}${p}${_b64(salt)}${_b64(_scrypt(password, salt, n, r, p))}"
+
+
+def check_password(password, stored):
+    """Whether password matches the stored value. CPU-bound for hashes; runs in the pool."""
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+    _, n, r, p, salt, expected = stored.split("$")
+    key = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    return hmac.compare_digest(key, base64.b64decode(expected))
+
+
+def is_hashed(stored):
+    return stored.startswith(PREFIX + "$") and stored.count("$") == 5
+
+
+def needs_rehash(stored):
+    if not is_hashed(stored):
+        return True
+    _, n, r, p, _, _ = stored.split("$")
+    return (int(n), int(r), int(p)) != (config.PASSWORD_SCRYPT_N, config.PASSWORD_SCRYPT_R, config.PASSWORD_SCRYPT_P)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn rather than fork: the server process has DB and worker threads that must not be copied.
+                _executor = ProcessPoolExecutor(max_workers=config.PASSWORD_HASH_WORKERS,
+                                                mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def hash_password(password) -> str:
+    return get_executor().submit(compute_hash, password).result()
+
+
+def hash_passwords(passwords) -> list:
+    """Hash many passwords across every pool process; results are in input order."""
+    passwords = list(passwords)
+    if not passwords:
+        return []
+    chunksize = max(1, len(passwords) // (config.PASSWORD_HASH_WORKERS * 4))
+    return list(get_executor().map(compute_hash, passwords, chunksize=chunksize))
+
+
+async def hash_async(password) -> str:
+    return await asyncio.wrap_future(get_executor().submit(compute_hash, password))
+
+
+async def verify_async(password, stored) -> bool:
+    return await asyncio.wrap_future(get_executor().submit(check_password, password, stored))
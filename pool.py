@@ -0,0 +1,187 @@
+import threading
+import time
+from collections import deque
+
+from .instrumentation import InstrumentedCursor
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    """Proxy around a driver connection. close() hands it back to the pool instead of closing the socket."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw)
+
+    def cursor(self, *args, **kwargs):
+        # Every statement run through a pooled connection is counted and timed for the current request.
+        return InstrumentedCursor(self.__getattr__("cursor")(*args, **kwargs))
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise AttributeError(f"Connection already returned to the pool ({name})")
+        return getattr(self._raw, name)
+
+    def __del__(self):
+        # Safety net for handlers that bail out without closing: the connection goes back to the pool
+        # instead of leaking a slot.
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    def __init__(self, factory, size=10, timeout=5.0, idle_timeout=300.0, check=None):
+        self._factory = factory
+        self._check = check or (lambda conn: conn.is_connected())
+        self.size = size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+
+        self._idle = deque()  # (connection, returned_at)
+        self._cond = threading.Condition()
+        self._created = 0
+        self._in_use = 0
+        self._waiters = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+
+    def acquire(self):
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        raw = None
+        stale = []
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                stale.extend(self._pop_stale())
+                if self._idle:
+                    raw, _ = self._idle.pop()
+                    break
+                if self._created < self.size:
+                    self._created += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No database connection available within {self.timeout}s")
+                self._waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+            self._in_use += 1
+
+        # Network work (closing stale connections, ping, connect) happens outside the lock.
+        self._close_quietly(stale)
+        if raw is not None and not self._is_healthy(raw):
+            self._close_quietly([raw])
+            raw = None
+            with self._cond:
+                self._discarded += 1
+        if raw is None:
+            try:
+                raw = self._factory()
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+
+        elapsed = time.perf_counter() - started
+        with self._cond:
+            self._checkouts += 1
+            self._checkout_time_total += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+        return PooledConnection(self, raw)
+
+    def release(self, raw):
+        healthy = True
+        try:
+            # Never hand an open transaction to the next borrower.
+            raw.rollback()
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy and not self._closed:
+                self._idle.append((raw, time.monotonic()))
+                raw = None
+            else:
+                self._created -= 1
+                self._discarded += 1
+            self._cond.notify()
+        if raw is not None:
+            self._close_quietly([raw])
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._created -= len(idle)
+            self._cond.notify_all()
+        self._close_quietly(idle)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiters": self._waiters,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "checkout_seconds_total": self._checkout_time_total,
+                "checkout_seconds_max": self._checkout_time_max,
+                "checkout_seconds_avg": self._checkout_time_total / self._checkouts if self._checkouts else 0.0,
+            }
+
+    def _pop_stale(self):
+        # Called with the lock held. Oldest connections sit at the left end of the deque.
+        stale = []
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._idle and self._idle[0][1] < cutoff:
+            stale.append(self._idle.popleft()[0])
+        self._created -= len(stale)
+        self._discarded += len(stale)
+        return stale
+
+    def _is_healthy(self, raw):
+        try:
+            return self._check(raw)
+        except Exception:
+            return False
+
+    def _close_quietly(self, connections):
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
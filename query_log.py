@@ -0,0 +1,127 @@
+"""Slow-query log and N+1 detector.
+
+Every statement run through an InstrumentedCursor passes through observe(). Statements are reduced to a
+normalised form (literals and placeholders become ?, IN lists and multi-row VALUES collapse to one item)
+so the same query with different arguments is recognised as one. What is kept depends on
+PETSTORE_QUERY_LOG:
+
+    off          nothing
+    production   statements slower than PETSTORE_SLOW_QUERY_MS, and requests that ran one normalised
+                 statement more than PETSTORE_N_PLUS_ONE_THRESHOLD times; parameters are not kept
+    development  as production, with parameters, plus every statement issued; parameters of statements on
+                 the users and idempotency_keys tables (password hashes, emails, stored responses) are
+                 replaced by "[redacted]"
+
+Entries go to a bounded ring buffer read by GET /admin/queries; slow statements and N+1 requests are also
+logged as warnings.
+"""
+import logging
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "production", "development")
+if config.QUERY_LOG_MODE not in MODES:
+    raise RuntimeError(f"Unknown PETSTORE_QUERY_LOG {config.QUERY_LOG_MODE!r}; expected one of {list(MODES)}")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS = re.compile(r"(\(\?(?:, \?)*\))(?:\s*,\s*\1)+")
+_SPACE = re.compile(r"\s+")
+_PARAMS_LIMIT = 200
+_SENSITIVE = re.compile(r"\b(users|idempotency_keys)\b", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(query):
+    """SELECT * FROM pets WHERE id IN (%s, %s, %s) -> SELECT * FROM pets WHERE id IN (?, ...)"""
+    text = _SPACE.sub(" ", query).strip()
+    text = _STRING.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _ROWS.sub(r"\1, ...", text)
+    return _LIST.sub("(?, ...)", text)
+
+
+def _describe_params(params, many):
+    if many:
+        params = list(params)
+        return f"{len(params)} rows, first {params[0]!r}"[:_PARAMS_LIMIT] if params else "0 rows"
+    text = repr(tuple(params or ()))
+    return text if len(text) <= _PARAMS_LIMIT else text[:_PARAMS_LIMIT] + "..."
+
+
+class QueryLog:
+    """Thread-safe ring buffer of the most recent entries."""
+
+    def __init__(self, maxsize=500):
+        self._entries = deque(maxlen=maxsize)
+        self._lock = threading.Lock()
+
+    def append(self, entry):
+        entry["at"] = time.time()
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self, kind=None, limit=None):
+        """Newest first."""
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        if kind is not None:
+            entries = [entry for entry in entries if entry["kind"] == kind]
+        return entries[:limit] if limit is not None else entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+query_log = QueryLog(maxsize=config.QUERY_LOG_SIZE)
+
+
+def observe(query, params, seconds, stats=None, many=False):
+    """Called by InstrumentedCursor after each statement; stats is the current request's, if any."""
+    mode = config.QUERY_LOG_MODE
+    if mode == "off":
+        return
+    statement = normalize_sql(query)
+    if stats is not None:
+        stats.count_statement(statement)
+    duration_ms = seconds * 1000
+    development = mode == "development"
+    slow = duration_ms >= config.SLOW_QUERY_MS
+    if not (slow or development):
+        return
+
+    entry = {
+        "kind": "slow" if slow else "statement",
+        "statement": statement,
+        "duration_ms": round(duration_ms, 3),
+        "method": stats.method if stats is not None else None,
+        "route": stats.route if stats is not None else None,
+    }
+    if development:
+        entry["params"] = "[redacted]" if _SENSITIVE.search(statement) else _describe_params(params, many)
+    query_log.append(entry)
+    if slow:
+        logger.warning("Slow query (%.1f ms) on %s %s: %s", duration_ms, entry["method"], entry["route"], statement)
+
+
+def finish_request(stats):
+    """Flag each statement the request ran more than N_PLUS_ONE_THRESHOLD times."""
+    if config.QUERY_LOG_MODE == "off":
+        return
+    for statement, count in stats.statement_counts().items():
+        if count > config.N_PLUS_ONE_THRESHOLD:
+            query_log.append({"kind": "n_plus_one", "statement": statement, "count": count,
+                              "method": stats.method, "route": stats.route})
+            logger.warning("Possible N+1: %s %s ran %d times: %s", stats.method, stats.route, count, statement)
@@ -0,0 +1,28 @@
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from .. import config
+from ..auth import admin_user
+from ..query_log import query_log
+
+# The log shows statements (and in development mode parameters) from every user's requests.
+router = APIRouter(dependencies=[Depends(admin_user)])
+
+
+@router.get("/admin/queries")
+def get_query_log(kind: Optional[Literal["slow", "n_plus_one", "statement"]] = None,
+                  limit: int = Query(100, ge=1, le=10000)):
+    """Newest entries of the slow-query log and N+1 detector (see query_log.py)."""
+    return {
+        "mode": config.QUERY_LOG_MODE,
+        "slow_query_ms": config.SLOW_QUERY_MS,
+        "n_plus_one_threshold": config.N_PLUS_ONE_THRESHOLD,
+        "entries": query_log.entries(kind, limit),
+    }
+
+
+@router.delete("/admin/queries")
+def clear_query_log():
+    query_log.clear()
+    return {"message": "Query log cleared"}
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Header, Query, Response
+from fastapi.responses import StreamingResponse
+
+from .. import config
+from ..dependencies import get_changes_from_db, progress_ndjson, purge_changes, run_db
+from ..hydration import encode_json
+from ..models import ChangeBatch
+from ..signals import on_orders_changed, on_pets_changed
+
+router = APIRouter()
+
+Entity = Optional[Literal["pet", "order"]]
+
+
+class _Waiters:
+    """Wakes change streams when pets or orders change, in this worker or (through broadcast.py) another.
+
+    Signals may be sent from worker threads, so streams are woken through their own event loop. A wake-up
+    that arrives between a stream's read and its wait is only noticed at the next poll.
+    """
+
+    def __init__(self):
+        self._waiting = set()  # (loop, event)
+        self._lock = threading.Lock()
+
+    def notify(self, *ids):
+        with self._lock:
+            waiting = list(self._waiting)
+        for loop, event in waiting:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:  # the loop has closed
+                pass
+
+    async def wait(self, timeout):
+        entry = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiting.add(entry)
+        try:
+            await asyncio.wait_for(entry[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiting.discard(entry)
+
+
+_waiters = _Waiters()
+on_pets_changed(_waiters.notify)
+on_orders_changed(_waiters.notify)
+
+
+@router.get("/changes", response_model=ChangeBatch)
+async def get_changes(
+    since: int = Query(0, ge=0, description="Last sequence number already seen; 0 for the beginning"),
+    limit: int = Query(config.CHANGE_FEED_PAGE_SIZE, ge=1, le=config.CHANGE_FEED_MAX_PAGE_SIZE),
+    entity: Entity = None,
+    data: bool = Query(False, description="Include the current pet or order with each upsert"),
+):
+    """Pet and order changes after `since`, oldest first. Pass the returned `next` as `since` to continue;
+    `more` says whether another page is already waiting."""
+    changes = await run_db(get_changes_from_db, since, limit, entity, data)
+    batch = {"changes": changes, "next": changes[-1]["seq"] if changes else since, "more": len(changes) == limit}
+    return Response(encode_json(batch), media_type="application/json")
+
+
+def _event(change):
+    return f"id: {change['seq']}\nevent: {change['entity']}\ndata: ".encode("utf-8") + encode_json(change) + b"\n\n"
+
+
+@router.get("/changes/stream")
+async def stream_changes(
+    since: int = Query(0, ge=0),
+    entity: Entity = None,
+    data: bool = False,
+    last_event_id: Optional[str] = Header(None),
+):
+    """The change feed as server-sent events: one event per change, named after its entity, with the sequence
+    number as the event id so a reconnecting EventSource resumes through Last-Event-ID."""
+    if last_event_id and last_event_id.isdigit():
+        since = max(since, int(last_event_id))
+
+    async def events():
+        after = since
+        yield f"retry: {int(config.CHANGE_FEED_POLL_INTERVAL * 1000)}\n\n".encode("utf-8")
+        quiet_since = asyncio.get_running_loop().time()
+        while True:
+            changes = await run_db(get_changes_from_db, after, config.CHANGE_FEED_PAGE_SIZE, entity, data)
+            for change in changes:
+                yield _event(change)
+            if changes:
+                after = changes[-1]["seq"]
+                quiet_since = asyncio.get_running_loop().time()
+                if len(changes) == config.CHANGE_FEED_PAGE_SIZE:
+                    continue  # more are waiting; read them straight away
+            elif asyncio.get_running_loop().time() - quiet_since >= config.CHANGE_FEED_KEEPALIVE:
+                yield b": keep-alive\n\n"
+                quiet_since = asyncio.get_running_loop().time()
+            # On MySQL, fresh changes only show once they are CHANGE_FEED_SETTLE seconds old (see config.py).
+            await _waiters.wait(max(config.CHANGE_FEED_POLL_INTERVAL, config.CHANGE_FEED_SETTLE))
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.delete("/changes")
+def delete_changes(before: datetime, chunk_size: int = Query(config.PURGE_CHUNK_SIZE, ge=1, le=10000)):
+    """Drop change feed entries recorded before `before` (UTC), streaming NDJSON progress. Consumers whose
+    position is older than what is kept should re-read the full data set."""
+    return StreamingResponse(progress_ndjson(purge_changes(before, chunk_size)), media_type="application/x-ndjson")
@@ -0,0 +1,167 @@
+import mimetypes
+import os
+import re
+import time
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+import anyio
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+
+from .. import config
+from ..dependencies import UPLOAD_DIRECTORY
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it only the original images are served
+    Image = None
+
+router = APIRouter()
+
+THUMBNAIL_DIRECTORY = UPLOAD_DIRECTORY / ".thumbnails"
+_CONTENT_HASHED = re.compile(r"^[0-9a-f]{64}(\.[a-z0-9]+)?$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_CHUNK_SIZE = 64 * 1024
+
+
+def _etag(stat, width=None):
+    # Thumbnails are validated by their source and width: a re-rendered thumbnail has the same bytes.
+    suffix = f"-w{width:x}" if width is not None else ""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{suffix}"'
+
+
+def _not_modified(request: Request, etag: str, stat) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stat.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _parse_range(header: str, size: int):
+    """(start, end) inclusive for a single byte range, None to serve the whole file, or raise 416."""
+    match = _RANGE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None  # multi-range or malformed: ignore it and send the full body
+    first, last = match.groups()
+    if first == "":
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+async def _read_range(path, start, end):
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _media_type(path):
+    return mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+
+def _make_thumbnail(source, target, width):
+    try:
+        stat = target.stat()
+    except FileNotFoundError:
+        stat = None
+    if stat is not None and stat.st_mtime_ns >= source.stat().st_mtime_ns:
+        # Mark as recently used for the LRU. Only the access time moves: mtime stays the render time.
+        os.utime(target, ns=(time.time_ns(), stat.st_mtime_ns))
+        return
+    THUMBNAIL_DIRECTORY.mkdir(exist_ok=True)
+    # Unique per render: concurrent requests for the same thumbnail must not write to one temp file.
+    temp = target.with_name(f".{target.name}.{uuid.uuid4().hex}.part")
+    try:
+        with Image.open(source) as image:
+            image_format = image.format
+            image.thumbnail((width, image.height))  # keeps the aspect ratio and never upscales
+            image.save(temp, format=image_format)
+        os.replace(temp, target)
+    finally:
+        if temp.exists():
+            temp.unlink()
+    _evict_thumbnails()
+
+
+def _evict_thumbnails():
+    """Drop least recently used thumbnails until the directory is back under THUMBNAIL_CACHE_BYTES."""
+    entries = []
+    for entry in os.scandir(THUMBNAIL_DIRECTORY):
+        if entry.is_file() and not entry.name.startswith("."):
+            stat = entry.stat()
+            entries.append((stat.st_atime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= config.THUMBNAIL_CACHE_BYTES:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+@router.get("/uploaded_images/{filename}")
+async def get_uploaded_image(request: Request, filename: str, w: Optional[int] = Query(None, ge=16, le=2048)):
+    if "/" in filename or "\\" in filename or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="Image not found")
+    path = UPLOAD_DIRECTORY / filename
+    if not await anyio.to_thread.run_sync(path.is_file):
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    source_stat = await anyio.to_thread.run_sync(os.stat, path)
+    if w is not None:
+        if Image is None:
+            raise HTTPException(status_code=501, detail="Thumbnails need Pillow installed")
+        thumbnail = THUMBNAIL_DIRECTORY / f"{path.stem}_w{w}{path.suffix}"
+        try:
+            await anyio.to_thread.run_sync(_make_thumbnail, path, thumbnail, w)
+        except OSError:
+            raise HTTPException(status_code=415, detail="Image cannot be resized")
+        path = thumbnail
+
+    stat = await anyio.to_thread.run_sync(os.stat, path) if w is not None else source_stat
+    etag = _etag(source_stat, w)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(source_stat.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+        # Content-addressed names never change their bytes.
+        "Cache-Control": "public, max-age=31536000, immutable" if _CONTENT_HASHED.match(filename) else "public, max-age=0",
+    }
+
+    if _not_modified(request, etag, source_stat):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, stat.st_size)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(_read_range(path, start, end), status_code=206, headers=headers,
+                                     media_type=_media_type(path))
+
+    # FileResponse uses the server's zero-copy extension where it has one.
+    return FileResponse(path, headers=headers, stat_result=stat, media_type=_media_type(path))
+
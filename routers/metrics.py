@@ -0,0 +1,34 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from .. import broadcast
+from ..auth import verified_cache
+from ..dependencies import get_pool_stats, lookup_cache, inventory_cache
+from ..http_cache import response_cache
+from ..instrumentation import gauges, render_metrics
+from ..write_behind import pet_status_writer
+
+router = APIRouter()
+
+
+def _cache_gauges():
+    caches = {"lookup": lookup_cache, "inventory": inventory_cache, "response": response_cache,
+              "auth": verified_cache}
+    lines = []
+    for field in ("size", "hits", "misses"):
+        lines += gauges(f"petstore_cache_{field}", f"In-process cache {field}.", "cache",
+                        {name: cache.stats()[field] for name, cache in caches.items()})
+    return lines
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    """Prometheus text exposition: per-route latency and query histograms, pool and cache state."""
+    pool = get_pool_stats()
+    write_behind = gauges("petstore_pet_write_behind", "Pet update write-behind queue.", "stat", pet_status_writer.stats())
+    bus = gauges("petstore_broadcast", "Cross-worker cache invalidation messages.", "stat", broadcast.stats())
+    return PlainTextResponse(
+        render_metrics([gauges("petstore_db_pool", "Connection pool counters and gauges.", "stat", pool), _cache_gauges(),
+                        write_behind, bus]),
+        media_type="text/plain; version=0.0.4",
+    )
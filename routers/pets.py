@@ -1,61 +1,139 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from typing import List
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from functools import partial
+from typing import List, Optional
 import json
+from .. import config
 from ..models import Pet, petStatus, Category, Tag
-from ..dependencies import get_pets_from_db, get_db_connection, add_tags_to_db, UPLOAD_DIRECTORY, update_pet_image_in_db
-from mysql.connector import Error
+from ..hydration import decode_json, encode_json
+from ..uploads import discard_upload, save_upload
+from ..http_cache import cached_json
+from ..signals import pets_changed
+from ..catalogue import get_catalogue
+from ..write_behind import pet_status_writer
+from ..dependencies import run_db, get_pet_by_id_from_db, find_pets_by_status_from_db, query_pets_from_db, stream_pets_from_db, get_db_connection, add_tags_to_db, tags_committed, get_category_name, bulk_create_pets, bulk_update_pets, update_pet_names_and_statuses, delete_pet_from_db, purge_pets, progress_ndjson, update_pet_image_in_db, pet_exists_in_db, image_url_in_use, record_changes
+from ..storage import Error
 
 router = APIRouter()
 
+def _pet_id(pet):
+    # Read endpoints hand back plain dicts instead of Pet models when FAST_RESPONSES is on.
+    return pet["id"] if isinstance(pet, dict) else pet.id
+
 @router.get("/", response_model=List[Pet])
-async def index():
-    return get_pets_from_db()
+async def index(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=config.PETS_MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    status: Optional[petStatus] = None,
+    category_id: Optional[int] = None,
+    tag: Optional[str] = None,
+    stream: bool = False,
+):
+    status = status.value if status else None
+    if stream:
+        # NDJSON export: no page limit unless one is asked for. The sync generator is
+        # iterated in the threadpool, so reading rows never blocks the event loop.
+        pets = await run_db(stream_pets_from_db, limit, after_id, status, category_id, tag,
+                            as_dict=config.FAST_RESPONSES)
+        if config.FAST_RESPONSES:
+            lines = (encode_json(pet) + b"\n" for pet in pets)
+        else:
+            lines = (json.dumps(jsonable_encoder(pet)) + "\n" for pet in pets)
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    limit = limit or config.PETS_PAGE_SIZE
+
+    def next_page_header(pets):
+        return {"X-Next-After-Id": str(_pet_id(pets[-1]))} if len(pets) == limit else {}
+
+    return await cached_json(
+        request, ("pets", request.url.query),
+        partial(get_catalogue().query if config.PET_CATALOGUE else query_pets_from_db,
+                limit, after_id, status, category_id, tag, as_dict=config.FAST_RESPONSES),
+        headers=next_page_header,
+    )
 
 @router.get("/pets/{pet_id}", response_model=Pet)
-async def get_pets(pet_id: int):
-    my_pet = None
-    for pet in get_pets_from_db():
-        if pet.id == pet_id:
-            my_pet = pet
-            break
+async def get_pets(request: Request, pet_id: int):
+    load = get_catalogue().get if config.PET_CATALOGUE else get_pet_by_id_from_db
+    my_pet = await cached_json(request, ("pet", pet_id), partial(load, pet_id, as_dict=config.FAST_RESPONSES))
     if my_pet == None:
         raise HTTPException(status_code=404, detail="Pet not found") 
     return my_pet
 
-@router.get('/pet/findByStatus', response_model=Pet)
-async def find_pet_by_status(status: petStatus):
-    my_pet = None
-    for pet in get_pets_from_db():
-        if pet.status == status:
-            my_pet = pet
-    if my_pet == None:
-        raise HTTPException(status_code=404, detail="Pet not found with this status") 
-    return my_pet
+@router.get('/pet/findByStatus', response_model=List[Pet])
+async def find_pet_by_status(
+    request: Request,
+    status: List[petStatus] = Query(...),
+    limit: Optional[int] = Query(None, ge=1, le=config.PETS_MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated Pet fields to return, e.g. id,name,status"),
+):
+    """Every pet with any of the given statuses (repeat status= for several), a keyset page at a time."""
+    include = None
+    if fields:
+        include = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = include - set(Pet.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    limit = limit or config.PETS_PAGE_SIZE
+    statuses = sorted({s.value for s in status})
+    page = {}
+
+    def load():
+        if config.PET_CATALOGUE:
+            pets = get_catalogue().query(limit, after_id, statuses, as_dict=config.FAST_RESPONSES)
+        else:
+            pets = find_pets_by_status_from_db(statuses, limit, after_id, as_dict=config.FAST_RESPONSES)
+        # Taken before projecting, which may leave out id.
+        page["next_after_id"] = _pet_id(pets[-1]) if len(pets) == limit else None
+        if include is None:
+            return pets
+        if config.FAST_RESPONSES:
+            return [{field: value for field, value in pet.items() if field in include} for pet in pets]
+        return [jsonable_encoder(pet, include=include) for pet in pets]
+
+    def next_page_header(_):
+        return {"X-Next-After-Id": str(page["next_after_id"])} if page["next_after_id"] is not None else {}
+
+    return await cached_json(request, ("pets", "findByStatus", request.url.query), load, headers=next_page_header)
 
 @router.post("/pet/{petId}/uploadImage")
 async def upload_pet_image(petId: int, file: UploadFile = File(...)):
-    try:
-        if not file.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="The uploaded file is not an image.")
+    if not file.content_type or not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="The uploaded file is not an image.")
 
-        file_location = UPLOAD_DIRECTORY / f"{petId}_{file.filename}"
-
-        with open(file_location, "wb") as f:
-            f.write(await file.read())
-
-        image_url = f"/uploaded_images/{petId}_{file.filename}"
-        update_pet_image_in_db(petId, image_url)
+    try:
+        # Checked before storing the file so a bad id does not leave an orphaned upload behind.
+        if not await run_db(pet_exists_in_db, petId):
+            raise HTTPException(status_code=404, detail="Pet not found")
+        filename = await save_upload(file)
+
+        image_url = f"/uploaded_images/{filename}"
+        try:
+            await run_db(update_pet_image_in_db, petId, image_url)
+        except Exception:
+            # The pet may have been deleted meanwhile; keep the file only if another pet already uses it.
+            if not await run_db(image_url_in_use, image_url):
+                await discard_upload(filename)
+            raise
+        pets_changed(petId)
 
         return {"message": f"Image for pet {petId} uploaded successfully!", "image_url": image_url}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/pet", response_model=Pet)
-async def add_pet(pet: Pet):
+def add_pet(pet: Pet):
+    connection = get_db_connection()
+    cursor = connection.cursor(dictionary=True)
+
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
 
         insert_pet_query = """
         INSERT INTO pets (category_id, name, photoUrls, status)
@@ -71,17 +149,20 @@ async def add_pet(pet: Pet):
             pet.status,  # pet status
         ))
         
-        connection.commit()
-        
         pet_id = cursor.lastrowid
         
-        add_tags_to_db(pet.tags, pet_id, cursor)
+        created = []
+        tag_ids = add_tags_to_db(pet.tags, pet_id, cursor, created)
+        # One transaction for the pet, its tags and its change feed entry.
+        record_changes(cursor, "pet", "upsert", [pet_id])
+        connection.commit()
+        tags_committed(tag_ids, created)
+        pets_changed(pet_id)
 
         cursor.execute("SELECT * FROM pets WHERE id = %s", (pet_id,))
         new_pet = cursor.fetchone()
 
-        cursor.execute("SELECT name FROM categories WHERE id = %s", (new_pet['category_id'],))
-        category = cursor.fetchone()
+        category_name = get_category_name(cursor, new_pet['category_id'])
 
         cursor.execute("""
             SELECT t.id, t.name FROM tags t
@@ -97,7 +178,7 @@ async def add_pet(pet: Pet):
 
         return Pet(
             id=pet_id,
-            category=Category(id=new_pet['category_id'], name=category['name']),
+            category=Category(id=new_pet['category_id'], name=category_name),
             name=new_pet['name'],
             photoUrls=pet.photoUrls,
             tags=tag_objects,
@@ -106,10 +187,32 @@ async def add_pet(pet: Pet):
 
     except Error as e:
         print(f"Error: {e}")
+        cursor.close()
+        connection.close()
         raise HTTPException(status_code=500, detail="Error adding pet to the store")    
     
+# Registered before the /pet/{petId} routes so "batch" is not taken for a pet id.
+@router.post("/pet/batch", response_model=List[Pet])
+def add_pets(pets: List[Pet]):
+    try:
+        created = bulk_create_pets(pets)
+    except Error as e:
+        print(f"Error: {e}")
+        raise HTTPException(status_code=500, detail="Error adding pets to the store")
+    pets_changed(*[pet.id for pet in created])
+    return created
+
+@router.put("/pet/batch", response_model=List[Pet])
+def update_pets(pets: List[Pet]):
+    try:
+        updated = bulk_update_pets(pets)
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    pets_changed(*[pet.id for pet in updated])
+    return updated
+
 @router.put("/pet", response_model=Pet)
-async def update_pet(pet: Pet):
+def update_pet(pet: Pet):
     connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)  # Use dictionary cursor to access columns by name
 
@@ -124,6 +227,8 @@ async def update_pet(pet: Pet):
         ))
 
         if cursor.rowcount == 0:
+            cursor.close()
+            connection.close()
             raise HTTPException(status_code=404, detail="Pet not found")
 
         if pet.photoUrls:
@@ -149,13 +254,14 @@ async def update_pet(pet: Pet):
             for tag in pet.tags:
                 cursor.execute(insert_tag_query, (pet.id, tag.id))
 
+        record_changes(cursor, "pet", "upsert", [pet.id])
         connection.commit()
+        pets_changed(pet.id)
 
         cursor.execute("SELECT * FROM pets WHERE id = %s", (pet.id,))
         updated_pet_data = cursor.fetchone()
 
-        cursor.execute("SELECT * FROM categories WHERE id = %s", (updated_pet_data['category_id'],))
-        category = cursor.fetchone()
+        category_name = get_category_name(cursor, updated_pet_data['category_id'])
 
         cursor.execute("SELECT t.id, t.name FROM tags t "
                        "JOIN pet_tags pt ON t.id = pt.tag_id "
@@ -164,9 +270,9 @@ async def update_pet(pet: Pet):
 
         updated_pet = Pet(
             id=updated_pet_data['id'],
-            category=Category(id=category['id'], name=category['name']),
+            category=Category(id=updated_pet_data['category_id'], name=category_name),
             name=updated_pet_data['name'],
-            photoUrls=eval(updated_pet_data['photoUrls']) if updated_pet_data['photoUrls'] else [],
+            photoUrls=decode_json(updated_pet_data['photoUrls']) if updated_pet_data['photoUrls'] else [],
             tags=[Tag(id=tag['id'], name=tag['name']) for tag in tags],
             status=updated_pet_data['status']
         )
@@ -183,61 +289,47 @@ async def update_pet(pet: Pet):
     
 @router.put("/pet/{petId}")
 async def update_pet(petId: int, pet: Pet):
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM pets WHERE id = %s", (petId,))
-    existing_pet = cursor.fetchone()
-    
-    if not existing_pet:
-        cursor.close()
-        connection.close()
-        raise HTTPException(status_code=404, detail="Pet not found")
-    
-    try:
-        cursor.execute("""
-            UPDATE pets
-            SET name = %s, status = %s
-            WHERE id = %s
-        """, (pet.name, pet.status, petId))
-        connection.commit()
-        
-        cursor.close()
-        connection.close()
-        
-        return {"message": "Pet updated successfully", "petId": petId}
-    
-    except Error as e:
-        cursor.close()
-        connection.close()
-        raise HTTPException(status_code=500, detail=f"Database update error: {str(e)}")
-    
-@router.delete("/pet/{petId}")
-async def delete_pet(petId: int):
-    connection = get_db_connection()
-    cursor = connection.cursor()
-
-    cursor.execute("SELECT * FROM pets WHERE id = %s", (petId,))
-    pet = cursor.fetchone()
-    
-    if not pet:
-        cursor.close()
-        connection.close()
+    """Set a pet's name and status. See write_behind.py for the queued modes (PETSTORE_PET_WRITE_BEHIND)."""
+    if config.PET_WRITE_BEHIND == "async":
+        await pet_status_writer.submit(petId, pet.name, pet.status.value)
+        return JSONResponse(status_code=202, content={"message": "Pet update queued", "petId": petId})
+
+    if config.PET_WRITE_BEHIND == "durable":
+        found = await pet_status_writer.submit(petId, pet.name, pet.status.value, wait=True)
+    else:
+        try:
+            found = petId in await run_db(update_pet_names_and_statuses, {petId: (pet.name, pet.status.value)})
+        except Error as e:
+            raise HTTPException(status_code=500, detail=f"Database update error: {str(e)}")
+        if found:
+            pets_changed(petId)
+    if not found:
         raise HTTPException(status_code=404, detail="Pet not found")
+    return {"message": "Pet updated successfully", "petId": petId}
+
+@router.delete("/pet")
+def delete_pets(
+    status: Optional[petStatus] = None,
+    ids: Optional[List[int]] = Query(None),
+    chunk_size: int = Query(config.PURGE_CHUNK_SIZE, ge=1, le=10000),
+):
+    """Delete every pet matching status and/or ids, with their tags and orders, streaming NDJSON progress.
+
+    Each chunk of chunk_size pets is its own transaction, so a large purge never holds locks for long; a
+    purge that fails partway keeps the chunks already reported.
+    """
+    if status is None and not ids:
+        raise HTTPException(status_code=400, detail="Pass status and/or ids to choose the pets to delete")
+    progress = purge_pets(status.value if status else None, ids or None, chunk_size)
+    return StreamingResponse(progress_ndjson(progress, on_chunk=pets_changed), media_type="application/x-ndjson")
 
+@router.delete("/pet/{petId}")
+def delete_pet(petId: int):
     try:
-        cursor.execute("DELETE FROM orders WHERE pet_id = %s", (petId,))
-
-        cursor.execute("DELETE FROM pet_tags WHERE pet_id = %s", (petId,))
-
-        cursor.execute("DELETE FROM pets WHERE id = %s", (petId,))
-        connection.commit()
-
-        cursor.close()
-        connection.close()
-
-        return {"message": f"Pet with ID {petId} and its associated orders have been deleted successfully."}
-    
-    except Exception as e:
-        cursor.close()
-        connection.close()
+        deleted = delete_pet_from_db(petId)
+    except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Pet not found")
+    pets_changed(petId)
+    return {"message": f"Pet with ID {petId} and its associated orders have been deleted successfully."}
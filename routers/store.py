@@ -1,94 +1,68 @@
-from fastapi import APIRouter, HTTPException
-from ..models import Order, orderStatus
-from ..dependencies import get_db_connection, get_orders_from_db
-from mysql.connector import Error
+from datetime import datetime
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from functools import partial
+from typing import List, Optional
+from .. import config
+from ..models import Order, Inventory
+from ..dependencies import run_db, get_order_by_id_from_db, get_inventory_from_db, get_inventory_snapshot, insert_order, insert_orders, delete_order_from_db, purge_orders, progress_ndjson
+from ..idempotency import idempotent
+from ..signals import orders_changed
+from ..storage import Error
 
 router = APIRouter()
 
-@router.get('/store/inventory', response_model=Order)
-async def get_inventory(status: orderStatus):
-    my_order = None
-    for order in get_orders_from_db():
-        if order.status == status:
-            my_order = order
-    if my_order == None:
-        raise HTTPException(status_code=404, detail="No order wit this status found") 
-    return my_order
+def _order_placed(order: Order):
+    orders_changed(order.id)
+
+def _orders_placed(orders: List[Order]):
+    orders_changed(*[order.id for order in orders])
+
+@router.get('/store/inventory', response_model=Inventory)
+async def get_inventory(cached: bool = False):
+    """Pet and order counts by status. cached=true may serve a snapshot up to PETSTORE_INVENTORY_CACHE_TTL seconds old."""
+    if cached:
+        return await run_db(get_inventory_snapshot)
+    return await run_db(get_inventory_from_db)
 
 @router.get("/store/order/{orderId}", response_model=Order)
 async def get_pets(orderId: int):
-    my_order= None
-    for order in get_orders_from_db():
-        if order.id == orderId:
-            my_order = order
-            break
+    my_order = await run_db(get_order_by_id_from_db, orderId)
     if my_order == None:
         raise HTTPException(status_code=404, detail="Pet not found by orderID") 
     return my_order
 
 @router.post("/store/order", response_model=Order)
-async def place_order(order: Order):
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM pets WHERE id = %s", (order.petId,))
-    pet = cursor.fetchone()
-
-    if not pet:
-        cursor.close()
-        connection.close()
-        raise HTTPException(status_code=404, detail="Pet not found")
-
+def place_order(order: Order, idempotency_key: Optional[str] = Header(None, max_length=255)):
+    """Place an order for a pet that exists and is not sold. Retries with the same Idempotency-Key are replayed."""
     try:
-        cursor.execute("""
-            INSERT INTO orders (pet_id, quantity, ship_date, status, complete)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (order.petId, order.quantity, order.shipDate, order.status, order.complete))
-        connection.commit()
-
-        order_id = cursor.lastrowid
-        
-        cursor.execute("SELECT * FROM orders WHERE id = %s", (order_id,))
-        new_order = cursor.fetchone()
-        cursor.close()
-        connection.close()
-
-        return Order(
-            id=new_order["id"],
-            petId=new_order["pet_id"],
-            quantity=new_order["quantity"],
-            shipDate=new_order["ship_date"],
-            status=new_order["status"],
-            complete=new_order["complete"]
-        )
-
+        return idempotent("order", idempotency_key, order, partial(insert_order, order=order), _order_placed)
     except Error as e:
-        cursor.close()
-        connection.close()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    
-@router.delete("/store/order/{orderId}")
-async def delete_order(orderId: int):
-    connection = get_db_connection()
-    cursor = connection.cursor()
-
-    cursor.execute("SELECT * FROM orders WHERE id = %s", (orderId,))
-    order = cursor.fetchone()
-
-    if not order:
-        cursor.close()
-        connection.close()
-        raise HTTPException(status_code=404, detail="Order not found")
 
+@router.post("/store/order/batch", response_model=List[Order])
+def place_orders(orders: List[Order], idempotency_key: Optional[str] = Header(None, max_length=255)):
+    """Place several orders in one transaction; if any pet is missing or sold, none are placed."""
     try:
-        cursor.execute("DELETE FROM orders WHERE id = %s", (orderId,))
-        connection.commit()
-
-        cursor.close()
-        connection.close()
+        return idempotent("order_batch", idempotency_key, orders, partial(insert_orders, orders=orders), _orders_placed)
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-        return {"message": f"Order with ID {orderId} has been deleted successfully."}
+@router.delete("/store/order")
+def delete_orders(
+    before: datetime,
+    chunk_size: int = Query(config.PURGE_CHUNK_SIZE, ge=1, le=10000),
+):
+    """Delete every order with a ship date before `before`, one chunk per transaction, streaming NDJSON progress."""
+    return StreamingResponse(progress_ndjson(purge_orders(before, chunk_size), on_chunk=orders_changed), media_type="application/x-ndjson")
 
-    except Exception as e:
-        cursor.close()
-        connection.close()
-        raise HTTPException(status_code=500, detail=f"Database error: {e}")
\ No newline at end of file
+@router.delete("/store/order/{orderId}")
+def delete_order(orderId: int):
+    try:
+        deleted = delete_order_from_db(orderId)
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {e}")
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Order not found")
+    orders_changed(orderId)
+    return {"message": f"Order with ID {orderId} has been deleted successfully."}
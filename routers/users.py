@@ -1,56 +1,56 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from ..models import User
-from ..dependencies import get_db_connection, get_users_from_db
-from mysql.connector import Error
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from functools import partial
+from typing import List, Optional
+from .. import auth, config
+from ..models import User, UserPublic, UserUpdate, BulkUserResponse, Credentials, LoginToken
+from ..http_cache import cached_json
+from ..dependencies import get_db_connection, get_user_by_username_from_db, bulk_insert_users, delete_user_from_db
+from ..passwords import hash_password
+from ..signals import users_changed
+from ..storage import Error
 
 router = APIRouter()
 
-@router.get("/user/{username}", response_model=User)
-async def get_pets(username: str):
-    my_user= None
-    for user in get_users_from_db():
-        if user.username == username:
-            my_user = user
-            break
+@router.post("/user/login", response_model=LoginToken)
+async def login_user(response: Response, credentials: Credentials):
+    """Check the password and return a bearer token for the Authorization header.
+
+    Credentials come in the request body, never the query string, so they stay out of access logs.
+    """
+    token, expires_at = await auth.login(credentials.username, credentials.password)
+    response.headers["X-Expires-After"] = expires_at.isoformat()
+    return LoginToken(token=token, expiresAt=expires_at)
+
+@router.get("/user/logout")
+async def logout_user(username: str = Depends(auth.authenticated_user), authorization: Optional[str] = Header(None)):
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer":
+        auth.logout(token.strip())
+    return {"message": f"User {username} has been logged out."}
+
+@router.get("/user/{username}", response_model=UserPublic)
+async def get_pets(request: Request, username: str):
+    my_user = await cached_json(request, ("user", username), partial(get_user_by_username_from_db, username))
     if my_user == None:
         raise HTTPException(status_code=404, detail="User not found by this username") 
     return my_user
 
-@router.post("/user/createWithList", response_model=List[User])
-async def create_users_with_list(users: List[User]):
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-
-    insert_query = """
-        INSERT INTO users (username, firstName, lastName, email, password, phone, userStatus)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-    """
-
+@router.post("/user/createWithList", response_model=BulkUserResponse)
+def create_users_with_list(users: List[User], chunk_size: int = Query(config.USER_IMPORT_CHUNK_SIZE, ge=1, le=10000)):
+    # Every user costs a full password hash within this request, so the list size is capped.
+    if len(users) > config.USER_IMPORT_MAX_USERS:
+        raise HTTPException(status_code=413, detail=f"At most {config.USER_IMPORT_MAX_USERS} users per request.")
     try:
-        for user in users:
-            cursor.execute(insert_query, (
-                user.username, user.firstName, user.lastName,
-                user.email, user.password, user.phone, user.userStatus
-            ))
-
-        connection.commit()
-
-        cursor.execute("SELECT * FROM users WHERE username IN (%s)" % ",".join([f"'{user.username}'" for user in users]))
-        new_users = cursor.fetchall()
-
-        cursor.close()
-        connection.close()
-
-        return [User(**user) for user in new_users]
-
+        created, conflicts = bulk_insert_users(users, chunk_size)
     except Error as e:
-        cursor.close()
-        connection.close()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    users_changed(*[user.username for user in created])
+    return BulkUserResponse(created=created, conflicts=conflicts)
     
-@router.post("/user", response_model=User)
-async def create_user(user: User):
+@router.post("/user", response_model=UserPublic)
+def create_user(user: User):
+    # Hashed before a pooled connection is taken, so the connection is not held for the whole scrypt run.
+    password_hash = hash_password(user.password)
     connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
 
@@ -62,10 +62,11 @@ async def create_user(user: User):
     try:
         cursor.execute(insert_query, (
             user.username, user.firstName, user.lastName,
-            user.email, user.password, user.phone, user.userStatus
+            user.email, password_hash, user.phone, user.userStatus
         ))
 
         connection.commit()
+        users_changed(user.username)
 
         new_user_id = cursor.lastrowid
 
@@ -75,15 +76,18 @@ async def create_user(user: User):
         cursor.close()
         connection.close()
 
-        return User(**new_user)
+        return UserPublic(**new_user)
 
     except Error as e:
         cursor.close()
         connection.close()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     
-@router.put("/user/{username}", response_model=User)
-async def update_user(username: str, updated_user: User):
+@router.put("/user/{username}", response_model=UserPublic)
+def update_user(username: str, updated_user: UserUpdate):
+    # Hashed before a pooled connection is taken, as in create_user.
+    password_hash = None if updated_user.password is None else hash_password(updated_user.password)
+
     connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
 
@@ -95,6 +99,9 @@ async def update_user(username: str, updated_user: User):
         connection.close()
         raise HTTPException(status_code=404, detail="User not found")
 
+    # Users are read back without their password, so leaving it out keeps the current one.
+    password = existing_user['password'] if password_hash is None else password_hash
+
     try:
         cursor.execute("""
             UPDATE users 
@@ -104,29 +111,21 @@ async def update_user(username: str, updated_user: User):
             updated_user.firstName,
             updated_user.lastName,
             updated_user.email,
-            updated_user.password,
+            password,
             updated_user.phone,
             updated_user.userStatus,
             username
         ))
 
         connection.commit()
+        users_changed(username)
 
         cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
         updated_user_from_db = cursor.fetchone()
         cursor.close()
         connection.close()
 
-        return User(
-            id=updated_user_from_db['id'],
-            username=updated_user_from_db['username'],
-            firstName=updated_user_from_db['firstName'],
-            lastName=updated_user_from_db['lastName'],
-            email=updated_user_from_db['email'],
-            password=updated_user_from_db['password'],
-            phone=updated_user_from_db['phone'],
-            userStatus=updated_user_from_db['userStatus']
-        )
+        return UserPublic(**updated_user_from_db)
     
     except Exception as e:
         cursor.close()
@@ -134,28 +133,12 @@ async def update_user(username: str, updated_user: User):
         raise HTTPException(status_code=500, detail=f"Database update failed: {e}")
     
 @router.delete("/user/{username}")
-async def delete_user(username: str):
-    connection = get_db_connection()
-    cursor = connection.cursor()
-
-    cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
-    user = cursor.fetchone()
-
-    if not user:
-        cursor.close()
-        connection.close()
-        raise HTTPException(status_code=404, detail="User not found")
-
+def delete_user(username: str):
     try:
-        cursor.execute("DELETE FROM users WHERE username = %s", (username,))
-        connection.commit()
-
-        cursor.close()
-        connection.close()
-
-        return {"message": f"User with username {username} has been deleted successfully."}
-
-    except Exception as e:
-        cursor.close()
-        connection.close()
-        raise HTTPException(status_code=500, detail=f"Database error: {e}")
\ No newline at end of file
+        deleted = delete_user_from_db(username)
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {e}")
+    if not deleted:
+        raise HTTPException(status_code=404, detail="User not found")
+    users_changed(username)
+    return {"message": f"User with username {username} has been deleted successfully."}
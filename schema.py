@@ -0,0 +1,211 @@
+"""Table and index definitions.
+
+    python -m app.schema          # create any missing tables and indexes on the configured backend
+
+Indexes are applied on every run, so an existing database picks up ones added later. At startup the app
+either runs the same bootstrap (PETSTORE_DB_BOOTSTRAP) or checks that every table exists, so a database
+that is missing a newer table fails at once instead of on the first write that needs it.
+"""
+import re
+
+from . import config
+from .storage import Error, get_backend
+
+MYSQL_TABLES = [
+    """CREATE TABLE IF NOT EXISTS categories (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS tags (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS pets (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        category_id INT NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        photoUrls TEXT,
+        status VARCHAR(16) NOT NULL,
+        FOREIGN KEY (category_id) REFERENCES categories (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS pet_tags (
+        pet_id INT NOT NULL,
+        tag_id INT NOT NULL,
+        FOREIGN KEY (pet_id) REFERENCES pets (id) ON DELETE CASCADE,
+        FOREIGN KEY (tag_id) REFERENCES tags (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS users (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(255) NOT NULL UNIQUE,
+        firstName VARCHAR(255) NOT NULL,
+        lastName VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL,
+        password VARCHAR(255) NOT NULL,
+        phone VARCHAR(64) NOT NULL,
+        userStatus INT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS orders (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        pet_id INT NOT NULL,
+        quantity INT NOT NULL,
+        ship_date DATETIME NOT NULL,
+        status VARCHAR(16) NOT NULL,
+        complete BOOLEAN NOT NULL DEFAULT FALSE,
+        FOREIGN KEY (pet_id) REFERENCES pets (id) ON DELETE CASCADE
+    )""",
+    """CREATE TABLE IF NOT EXISTS changes (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        entity VARCHAR(16) NOT NULL,
+        entity_id INT NOT NULL,
+        op VARCHAR(16) NOT NULL,
+        changed_at DATETIME(6) NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS idempotency_keys (
+        scope VARCHAR(32) NOT NULL,
+        idem_key VARCHAR(255) NOT NULL,
+        fingerprint CHAR(64) NOT NULL,
+        body LONGBLOB,
+        created_at DATETIME(6) NOT NULL,
+        PRIMARY KEY (scope, idem_key)
+    )""",
+]
+
+SQLITE_TABLES = [
+    """CREATE TABLE IF NOT EXISTS categories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS tags (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS pets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        category_id INTEGER NOT NULL REFERENCES categories (id),
+        name TEXT NOT NULL,
+        photoUrls TEXT,
+        status TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS pet_tags (
+        pet_id INTEGER NOT NULL REFERENCES pets (id) ON DELETE CASCADE,
+        tag_id INTEGER NOT NULL REFERENCES tags (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL UNIQUE,
+        firstName TEXT NOT NULL,
+        lastName TEXT NOT NULL,
+        email TEXT NOT NULL,
+        password TEXT NOT NULL,
+        phone TEXT NOT NULL,
+        userStatus INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        pet_id INTEGER NOT NULL REFERENCES pets (id) ON DELETE CASCADE,
+        quantity INTEGER NOT NULL,
+        ship_date TIMESTAMP NOT NULL,
+        status TEXT NOT NULL,
+        complete BOOLEAN NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS changes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        entity TEXT NOT NULL,
+        entity_id INTEGER NOT NULL,
+        op TEXT NOT NULL,
+        changed_at TIMESTAMP NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS idempotency_keys (
+        scope TEXT NOT NULL,
+        idem_key TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        body BLOB,
+        created_at TIMESTAMP NOT NULL,
+        PRIMARY KEY (scope, idem_key)
+    )""",
+]
+
+# (name, table, columns). (status, id) serves status filters with keyset pagination; the pet_tags pair
+# covers the tags subquery in PET_SELECT one way and the tag filter the other.
+INDEXES = [
+    ("idx_pets_status", "pets", "status, id"),
+    ("idx_pets_category", "pets", "category_id, id"),
+    ("idx_pet_tags_pet", "pet_tags", "pet_id, tag_id"),
+    ("idx_pet_tags_tag", "pet_tags", "tag_id, pet_id"),
+    ("idx_tags_name", "tags", "name"),
+    ("idx_orders_pet", "orders", "pet_id"),
+    ("idx_orders_ship_date", "orders", "ship_date"),
+    ("idx_changes_entity", "changes", "entity, id"),
+    ("idx_changes_changed_at", "changes", "changed_at"),
+    ("idx_idempotency_keys_created_at", "idempotency_keys", "created_at"),
+]
+
+# MySQL has no CREATE INDEX IF NOT EXISTS; an existing index fails with ER_DUP_KEYNAME instead.
+_MYSQL_DUPLICATE_KEY_NAME = 1061
+
+TABLES = {
+    "mysql": MYSQL_TABLES,
+    "sqlite": SQLITE_TABLES,
+}
+
+
+def _table_names(backend_name):
+    return [re.search(r"CREATE TABLE IF NOT EXISTS (\w+)", statement).group(1) for statement in TABLES[backend_name]]
+
+
+def missing_tables():
+    """Names of the store's tables that do not exist on the configured backend."""
+    backend = get_backend()
+    connection = backend.connect()
+    cursor = connection.cursor()
+    missing = []
+    try:
+        for table in _table_names(backend.name):
+            try:
+                cursor.execute(f"SELECT 1 FROM {table} LIMIT 1")
+                cursor.fetchall()
+            except Error:
+                missing.append(table)
+    finally:
+        cursor.close()
+        connection.close()
+    return missing
+
+
+def prepare_schema():
+    """Startup step: bootstrap the schema if PETSTORE_DB_BOOTSTRAP is on, else refuse to start without it."""
+    if config.DB_BOOTSTRAP:
+        bootstrap_schema()
+        return
+    missing = missing_tables()
+    if missing:
+        raise RuntimeError(f"The database is missing tables {missing}; create them with "
+                           f"python -m app.schema or start with PETSTORE_DB_BOOTSTRAP=1")
+
+
+def bootstrap_schema():
+    """Create whichever of the store's tables and indexes do not exist yet."""
+    backend = get_backend()
+    connection = backend.connect()
+    cursor = connection.cursor()
+    try:
+        for statement in TABLES[backend.name]:
+            cursor.execute(statement)
+        for name, table, columns in INDEXES:
+            if backend.name == "sqlite":
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+                continue
+            try:
+                cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+            except Error as e:
+                if getattr(e, "errno", None) != _MYSQL_DUPLICATE_KEY_NAME:
+                    raise
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+
+
+if __name__ == "__main__":
+    bootstrap_schema()
+    print(f"Schema and indexes ready on the {get_backend().name} backend")
@@ -0,0 +1,169 @@
+"""Production entry point: N worker processes behind one listening socket.
+
+    python -m app.serve --workers 8 --port 8000
+
+The app is imported once in the parent before the workers are forked (preload), so they start quickly and
+share the imported modules copy-on-write. Nothing opens a database connection or starts a thread at import
+time; the pool, the hashing processes and the write-behind queue are all created per worker after the fork.
+A random auth secret made at import is shared by all workers the same way, so tokens from one are accepted
+by the others.
+
+With gunicorn installed (plus uvicorn's worker class) gunicorn supervises the workers; otherwise a small
+built-in pre-fork loop does: it shares the socket with uvicorn servers in the children, restarts workers
+that die, and on SIGTERM or SIGINT lets each finish its shutdown (write-behind drain included).
+
+Each worker keeps its own caches; broadcast.py passes invalidations between them over Unix sockets in
+PETSTORE_BROADCAST_DIR, a private temporary directory created here unless one is configured.
+"""
+import argparse
+import importlib
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+from . import config
+from .schema import prepare_schema
+
+logger = logging.getLogger(__name__)
+
+APP = f"{__package__}.main:app"
+_RESTART_DELAY = 1.0  # seconds to wait before replacing a worker that died right after starting
+
+
+def _load_app():
+    module, _, attribute = APP.partition(":")
+    return getattr(importlib.import_module(module), attribute)
+
+
+def _gunicorn_worker_class():
+    for worker_class in ("uvicorn_worker.UvicornWorker", "uvicorn.workers.UvicornWorker"):
+        try:
+            module, _, name = worker_class.rpartition(".")
+            getattr(importlib.import_module(module), name)
+            return worker_class
+        except ImportError:
+            continue
+    return None
+
+
+def _run_gunicorn(app, args, worker_class):
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            options = {"bind": f"{args.host}:{args.port}", "workers": args.workers, "worker_class": worker_class,
+                       "preload_app": True, "loglevel": args.log_level, "graceful_timeout": args.graceful_timeout}
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    Application().run()
+
+
+def _serve_worker(app, sock, args):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, log_level=args.log_level,
+                                           timeout_graceful_shutdown=args.graceful_timeout))
+    server.run(sockets=[sock])
+
+
+def _run_prefork(app, args):
+    sock = socket.socket(socket.AF_INET6 if ":" in args.host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    workers = {}  # pid -> start time
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                _serve_worker(app, sock, args)
+            except BaseException:
+                logger.exception("Worker %d failed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        workers[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        # Ctrl-C already reached the workers through the terminal's process group; a second signal would
+        # make uvicorn skip its graceful shutdown.
+        if signum != signal.SIGINT:
+            for pid in workers:
+                os.kill(pid, signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.warning("Serving on %s:%d with %d workers", args.host, args.port, args.workers)
+    for _ in range(args.workers):
+        spawn()
+
+    while workers:
+        pid, status = os.wait()
+        started = workers.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.error("Worker %d exited with status %d; starting a replacement", pid, os.waitstatus_to_exitcode(status))
+        if time.monotonic() - started < _RESTART_DELAY:
+            time.sleep(_RESTART_DELAY)
+        if not stopping:
+            spawn()
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=config.WORKERS)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--graceful-timeout", type=int, default=30, help="seconds a worker gets to finish on shutdown")
+    parser.add_argument("--no-gunicorn", action="store_true", help="use the built-in pre-fork loop even if gunicorn is installed")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s [%(process)d] %(levelname)s %(message)s")
+
+    if "PETSTORE_PASSWORD_HASH_WORKERS" not in os.environ:
+        # Each worker starts its own hashing processes; share the cores out instead of every worker taking all.
+        config.PASSWORD_HASH_WORKERS = max(1, (os.cpu_count() or 1) // args.workers)
+    try:
+        # Once here as well as in each worker, so the workers do not race to set up a fresh database and a
+        # missing table stops the server instead of every worker failing and being restarted in turn.
+        prepare_schema()
+    except RuntimeError as e:
+        sys.exit(str(e))
+    created_dir = None
+    if args.workers > 1 and not config.BROADCAST_DIR:
+        created_dir = config.BROADCAST_DIR = tempfile.mkdtemp(prefix="petstore-broadcast-")
+    try:
+        app = _load_app()  # preload: imported once here, inherited by every worker
+        worker_class = None if args.no_gunicorn else _gunicorn_worker_class()
+        if worker_class is not None:
+            _run_gunicorn(app, args, worker_class)
+        elif hasattr(os, "fork"):
+            _run_prefork(app, args)
+        else:
+            sys.exit("Multiple workers need os.fork or gunicorn; run app.main with uvicorn instead")
+    finally:
+        if created_dir is not None:
+            shutil.rmtree(created_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""In-process write hooks.
+
+Write paths announce what they changed once their transaction has committed: pets_changed() with pet ids,
+orders_changed() with order ids, users_changed() with usernames, lookups_changed() with lookup cache keys
+("tag:<name>", "category:<id>") and tokens_revoked() with login tokens ended by logout. Anything that keeps
+derived copies of that data (the response cache, the catalogue snapshot, the lookup cache, the auth cache)
+or waits for changes (the change feed stream) registers a handler instead of every writer having to know
+about it.
+
+Forwarders registered with forward_to() see every signal sent from this process; broadcast.py uses that to
+pass them on to the other workers, which run their handlers through deliver().
+"""
+PETS = "pets"
+ORDERS = "orders"
+USERS = "users"
+LOOKUPS = "lookups"
+TOKENS = "tokens"
+
+_handlers = {PETS: [], ORDERS: [], USERS: [], LOOKUPS: [], TOKENS: []}
+_forwarders = []
+
+
+def connect(signal, handler):
+    """Register handler(*keys) for signal. Returns handler, so it also works as a decorator."""
+    _handlers[signal].append(handler)
+    return handler
+
+
+def deliver(signal, keys):
+    """Run this process's handlers only."""
+    for handler in list(_handlers[signal]):
+        handler(*keys)
+
+
+def send(signal, *keys):
+    deliver(signal, keys)
+    for forward in list(_forwarders):
+        forward(signal, keys)
+
+
+def forward_to(forwarder):
+    _forwarders.append(forwarder)
+
+
+def stop_forwarding(forwarder):
+    if forwarder in _forwarders:
+        _forwarders.remove(forwarder)
+
+
+def on_pets_changed(handler):
+    return connect(PETS, handler)
+
+
+def pets_changed(*pet_ids):
+    send(PETS, *pet_ids)
+
+
+def on_orders_changed(handler):
+    return connect(ORDERS, handler)
+
+
+def orders_changed(*order_ids):
+    send(ORDERS, *order_ids)
+
+
+def on_users_changed(handler):
+    return connect(USERS, handler)
+
+
+def users_changed(*usernames):
+    send(USERS, *usernames)
+
+
+def on_lookups_changed(handler):
+    return connect(LOOKUPS, handler)
+
+
+def lookups_changed(*keys):
+    """No keys means every lookup entry."""
+    send(LOOKUPS, *keys)
+
+
+def on_tokens_revoked(handler):
+    return connect(TOKENS, handler)
+
+
+def tokens_revoked(*tokens):
+    send(TOKENS, *tokens)
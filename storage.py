@@ -0,0 +1,207 @@
+"""Storage backends.
+
+Everything in dependencies.py and the routers talks to the database through get_backend(): it opens raw
+connections for the pool and supplies the few SQL fragments that differ between engines. Queries are written
+once with %s placeholders and dictionary cursors, MySQL Connector style; the SQLite backend adapts both.
+"""
+import re
+import sqlite3
+import threading
+
+from . import config
+
+try:
+    import mysql.connector
+    from mysql.connector import Error as _MySQLError, IntegrityError as _MySQLIntegrityError
+except ImportError:  # MySQL Connector is only needed for the mysql backend
+    mysql = None
+    _MySQLError = _MySQLIntegrityError = ()
+
+# Catch these instead of a driver's own exception classes so handlers work with either backend.
+Error = (_MySQLError, sqlite3.Error)
+IntegrityError = (_MySQLIntegrityError, sqlite3.IntegrityError)
+
+
+class StorageBackend:
+    name = None
+
+    def connect(self):
+        """Open a new connection exposing cursor(dictionary=...), commit(), rollback(), close() and is_connected()."""
+        raise NotImplementedError
+
+    def json_array_agg(self, expression):
+        """Aggregate expression over a group into a JSON array."""
+        raise NotImplementedError
+
+    def json_array_append(self, column, value):
+        """Expression for the JSON array in column with value appended at the end."""
+        raise NotImplementedError
+
+    def insert_ids(self, cursor, row_count):
+        """Ids of the rows written by the multi-row INSERT that cursor just ran, in VALUES order."""
+        raise NotImplementedError
+
+
+class MySQLBackend(StorageBackend):
+    name = "mysql"
+
+    def connect(self):
+        if mysql is None:
+            raise RuntimeError("The mysql backend needs mysql-connector-python installed")
+        connection = mysql.connector.connect(
+            host=config.DB_HOST,
+            port=config.DB_PORT,
+            user=config.DB_USER,
+            password=config.DB_PASSWORD,
+            database=config.DB_NAME
+        )
+        if not connection.is_connected():
+            raise _MySQLError("Connection to the database was not established")
+        return connection
+
+    def json_array_agg(self, expression):
+        return f"JSON_ARRAYAGG({expression})"
+
+    def json_array_append(self, column, value):
+        return f"JSON_ARRAY_APPEND({column}, '$', {value})"
+
+    def insert_ids(self, cursor, row_count):
+        # LAST_INSERT_ID() reports the first row of a multi-row INSERT; the rest follow it
+        # auto_increment_increment apart (more than 1 on multi-primary setups such as Galera).
+        first_id = cursor.lastrowid
+        cursor.execute("SELECT @@auto_increment_increment AS step")
+        row = cursor.fetchone()
+        step = row["step"] if isinstance(row, dict) else row[0]
+        return list(range(first_id, first_id + row_count * step, step))
+
+
+_PLACEHOLDER = re.compile(r"%s")
+_READ_ONLY = re.compile(r"^\s*(SELECT|PRAGMA|EXPLAIN|WITH)\b", re.IGNORECASE)
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\s*$", re.IGNORECASE)
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SQLiteCursor:
+    def __init__(self, connection, dictionary=False):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+        if dictionary:
+            self._cursor.row_factory = _dict_row
+
+    def execute(self, query, params=()):
+        # SQLite has no row locks: SELECT ... FOR UPDATE takes the database write lock up front instead.
+        query, locking = _FOR_UPDATE.subn("", query)
+        self._connection.begin_for(query, locking=bool(locking))
+        self._cursor.execute(_PLACEHOLDER.sub("?", query), tuple(params or ()))
+
+    def executemany(self, query, seq_params):
+        self._connection.begin_for(query)
+        self._cursor.executemany(_PLACEHOLDER.sub("?", query), [tuple(params) for params in seq_params])
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """sqlite3 connection with MySQL Connector transaction semantics.
+
+    The driver runs in autocommit mode and this wrapper opens the transaction itself: the first statement
+    that writes (or a SELECT ... FOR UPDATE) starts BEGIN IMMEDIATE, so a transaction that reads and then
+    writes cannot hit a lock upgrade failure, while plain reads never take the write lock.
+    """
+
+    def __init__(self, path):
+        self.raw = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                   cached_statements=config.SQLITE_STATEMENT_CACHE_SIZE)
+        self.raw.execute(f"PRAGMA busy_timeout = {int(config.SQLITE_BUSY_TIMEOUT * 1000)}")
+        self.raw.execute("PRAGMA journal_mode = WAL")
+        self.raw.execute("PRAGMA synchronous = NORMAL")
+        self.raw.execute("PRAGMA foreign_keys = ON")
+
+    def begin_for(self, query, locking=False):
+        if not self.raw.in_transaction and (locking or not _READ_ONLY.match(query)):
+            self.raw.execute("BEGIN IMMEDIATE")
+
+    def cursor(self, dictionary=False, buffered=None):
+        # sqlite3 cursors always step lazily, so an unbuffered cursor needs nothing special.
+        return SQLiteCursor(self, dictionary)
+
+    def commit(self):
+        if self.raw.in_transaction:
+            self.raw.execute("COMMIT")
+
+    def rollback(self):
+        if self.raw.in_transaction:
+            self.raw.execute("ROLLBACK")
+
+    def is_connected(self):
+        try:
+            self.raw.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self.raw.close()
+
+
+class SQLiteBackend(StorageBackend):
+    name = "sqlite"
+
+    def connect(self):
+        return SQLiteConnection(config.SQLITE_PATH)
+
+    def json_array_agg(self, expression):
+        return f"json_group_array({expression})"
+
+    def json_array_append(self, column, value):
+        return f"json_insert({column}, '$[#]', {value})"
+
+    def insert_ids(self, cursor, row_count):
+        # sqlite3 reports the rowid of the last row a multi-row INSERT wrote; rowids are consecutive.
+        return list(range(cursor.lastrowid - row_count + 1, cursor.lastrowid + 1))
+
+
+BACKENDS = {
+    "mysql": MySQLBackend,
+    "sqlite": SQLiteBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> StorageBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                try:
+                    _backend = BACKENDS[config.DB_BACKEND]()
+                except KeyError:
+                    raise RuntimeError(f"Unknown PETSTORE_DB_BACKEND {config.DB_BACKEND!r}; expected one of {sorted(BACKENDS)}")
+    return _backend
@@ -0,0 +1,59 @@
+"""Tests run against a throwaway SQLite database; no MySQL server is needed.
+
+The settings are read once at import time, so the environment is set up here before anything from the
+package is imported. Run from the repository root with python -m pytest.
+"""
+import os
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix="petstore-tests-")
+os.environ["PETSTORE_DB_BACKEND"] = "sqlite"
+os.environ["PETSTORE_SQLITE_PATH"] = os.path.join(_workdir, "pet_store.db")
+os.environ["PETSTORE_DB_BOOTSTRAP"] = "1"
+os.environ["PETSTORE_PASSWORD_HASH_WORKERS"] = "1"
+os.chdir(_workdir)  # uploads go to ./uploaded_images
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ..dependencies import get_db_connection
+from ..main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def category(client):
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    cursor.execute("INSERT INTO categories (name) VALUES (%s)", ("dogs",))
+    category_id = cursor.lastrowid
+    connection.commit()
+    cursor.close()
+    connection.close()
+    return {"id": category_id, "name": "dogs"}
+
+
+@pytest.fixture
+def make_pet(client, category):
+    def make_pet(name="rex", status="available", tags=("cute",)):
+        pet = {"id": 0, "category": category, "name": name, "photoUrls": [], "status": status,
+               "tags": [{"id": 0, "name": tag} for tag in tags]}
+        response = client.post("/pet", json=pet)
+        assert response.status_code == 200, response.text
+        return response.json()
+    return make_pet
+
+
+def count(table, condition="1 = 1", params=()):
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {condition}", params)
+    (total,) = cursor.fetchone()
+    cursor.close()
+    connection.close()
+    return total
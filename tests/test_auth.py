@@ -0,0 +1,66 @@
+import base64
+
+import pytest
+
+from ..dependencies import get_pool_stats, get_user_password_from_db
+from ..passwords import hash_password, is_hashed
+from ..routers import users as users_router
+
+
+def new_user(username, password="secret"):
+    return {"id": 0, "username": username, "firstName": "F", "lastName": "L", "email": f"{username}@example.com",
+            "password": password, "phone": "555-0100", "userStatus": 1}
+
+
+def login(client, username, password="secret"):
+    return client.post("/user/login", json={"username": username, "password": password})
+
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def connections_during_hashing(monkeypatch):
+    in_use = []
+
+    def recording_hash(password):
+        in_use.append(get_pool_stats()["in_use"])
+        return hash_password(password)
+
+    monkeypatch.setattr(users_router, "hash_password", recording_hash)
+    return in_use
+
+
+def test_passwords_are_hashed_without_holding_a_connection(client, connections_during_hashing):
+    created = client.post("/user", json=new_user("auth-hashed"))
+    assert created.status_code == 200 and "password" not in created.json()
+    assert client.put("/user/auth-hashed", json=new_user("auth-hashed", "changed")).status_code == 200
+    assert connections_during_hashing == [0, 0]
+    assert is_hashed(get_user_password_from_db("auth-hashed"))
+
+
+def test_login_logout_and_bad_passwords(client):
+    client.post("/user", json=new_user("auth-login"))
+    assert login(client, "auth-login", "wrong").status_code == 401
+    assert login(client, "auth-nobody").status_code == 401
+    token = login(client, "auth-login").json()["token"]
+    assert client.get("/user/logout", headers=bearer(token)).status_code == 200
+    assert client.get("/user/logout", headers=bearer(token)).status_code == 401
+
+
+def test_basic_credentials(client):
+    client.post("/user", json=new_user("auth-basic"))
+    good = base64.b64encode(b"auth-basic:secret").decode()
+    bad = base64.b64encode(b"auth-basic:nope").decode()
+    assert client.get("/user/logout", headers={"Authorization": f"Basic {good}"}).status_code == 200
+    assert client.get("/user/logout", headers={"Authorization": f"Basic {bad}"}).status_code == 401
+
+
+def test_changing_the_password_retires_old_tokens(client):
+    client.post("/user", json=new_user("auth-rotate"))
+    token = login(client, "auth-rotate").json()["token"]
+    assert client.get("/user/logout", headers=bearer(login(client, "auth-rotate").json()["token"])).status_code == 200
+    assert client.put("/user/auth-rotate", json=new_user("auth-rotate", "rotated")).status_code == 200
+    assert client.get("/user/logout", headers=bearer(token)).status_code == 401
+    assert login(client, "auth-rotate", "rotated").status_code == 200
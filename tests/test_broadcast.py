@@ -0,0 +1,45 @@
+import asyncio
+import json
+import socket
+
+from .. import signals
+from ..broadcast import Broadcaster
+
+
+def test_signals_are_sent_to_and_received_from_other_workers(tmp_path):
+    delivered = []
+
+    def record(*keys):
+        delivered.append(keys)
+
+    async def run():
+        peer = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        peer.bind(str(tmp_path / "peer.sock"))
+        peer.settimeout(2)
+        dead = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        dead.bind(str(tmp_path / "dead.sock"))
+        dead.close()  # its file stays behind, like a worker that was killed
+
+        broadcaster = Broadcaster(str(tmp_path))
+        broadcaster.start()
+        signals.connect(signals.USERS, record)
+        try:
+            signals.users_changed("sent-by-this-worker")
+            outgoing = json.loads(await asyncio.to_thread(peer.recv, 65536))
+
+            peer.sendto(json.dumps({"signal": signals.USERS, "keys": ["sent-by-a-peer"]}).encode(), broadcaster.path)
+            for _ in range(100):
+                if ("sent-by-a-peer",) in delivered:
+                    break
+                await asyncio.sleep(0.01)
+            return outgoing, broadcaster.stats()
+        finally:
+            signals._handlers[signals.USERS].remove(record)
+            broadcaster.close()
+            peer.close()
+
+    outgoing, stats = asyncio.run(run())
+    assert outgoing["signal"] == signals.USERS and outgoing["keys"] == ["sent-by-this-worker"]
+    assert ("sent-by-a-peer",) in delivered
+    assert stats["received"] == 1
+    assert not (tmp_path / "dead.sock").exists()
@@ -0,0 +1,30 @@
+from .. import config
+from ..catalogue import get_catalogue
+from ..dependencies import get_pet_by_id_from_db, query_pets_from_db
+
+
+def test_queries_match_the_database(client, make_pet):
+    for n, status in enumerate(["available", "sold", "sold"]):
+        make_pet(name=f"replica-{n}", status=status, tags=("replica", f"replica-{n}"))
+    catalogue = get_catalogue()
+    for args in [(100, None, None, None, "replica"), (2, None, "sold", None, None), (50, 1, ["sold", "pending"], None, None)]:
+        assert catalogue.query(*args) == query_pets_from_db(*args)
+        assert catalogue.query(*args, as_dict=True) == query_pets_from_db(*args, as_dict=True)
+
+
+def test_writes_refresh_the_pets_they_touch(client, make_pet):
+    pet = make_pet(name="replica-write")
+    catalogue = get_catalogue()
+    assert catalogue.get(pet["id"]) == get_pet_by_id_from_db(pet["id"])
+
+    client.put("/pet", json={**pet, "name": "replica-renamed"})
+    assert catalogue.get(pet["id"]).name == "replica-renamed"
+    client.delete(f"/pet/{pet['id']}")
+    assert catalogue.get(pet["id"]) is None
+
+
+def test_the_endpoints_serve_from_the_catalogue(client, make_pet, monkeypatch):
+    monkeypatch.setattr(config, "PET_CATALOGUE", True)
+    pet = make_pet(name="replica-served", tags=("replica-served",))
+    assert client.get(f"/pets/{pet['id']}").json() == pet
+    assert client.get("/", params={"tag": "replica-served"}).json() == [pet]
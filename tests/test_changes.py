@@ -0,0 +1,57 @@
+import pytest
+
+from .. import config
+from ..schema import prepare_schema
+
+
+def feed(client, **params):
+    response = client.get("/changes", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_pages_follow_next_until_caught_up(client, make_pet):
+    since = feed(client, limit=5000)["next"]
+    pets = [make_pet(name=f"feed-{n}") for n in range(5)]
+
+    seen, after = [], since
+    while True:
+        page = feed(client, since=after, limit=2, entity="pet")
+        seen.extend(page["changes"])
+        after = page["next"]
+        if not page["more"]:
+            break
+    assert [change["id"] for change in seen] == [pet["id"] for pet in pets]
+    assert {change["op"] for change in seen} == {"upsert"}
+    assert [change["seq"] for change in seen] == sorted(change["seq"] for change in seen)
+    assert feed(client, since=after) == {"changes": [], "next": after, "more": False}
+
+
+def test_a_pet_delete_records_its_orders_too(client, make_pet):
+    pet = make_pet(name="feed-delete")
+    order = {"id": 0, "petId": pet["id"], "quantity": 1, "shipDate": "2030-01-01T00:00:00", "status": "placed",
+             "complete": False}
+    order_id = client.post("/store/order", json=order).json()["id"]
+    since = feed(client, limit=5000)["next"]
+
+    client.delete(f"/pet/{pet['id']}")
+    changes = feed(client, since=since)["changes"]
+    assert [(change["entity"], change["id"], change["op"]) for change in changes] == [
+        ("order", order_id, "delete"), ("pet", pet["id"], "delete")]
+
+
+def test_data_carries_the_current_entity(client, make_pet):
+    since = feed(client, limit=5000)["next"]
+    pet = make_pet(name="feed-data")
+    client.put("/pet", json={**pet, "name": "feed-data-renamed"})
+    changes = feed(client, since=since, data=True, entity="pet")["changes"]
+    assert [change["id"] for change in changes] == [pet["id"], pet["id"]]
+    # Both entries show the pet as it is now, not as it was when each change was made.
+    assert {change["data"]["name"] for change in changes} == {"feed-data-renamed"}
+
+
+def test_startup_refuses_a_database_without_the_feed_tables(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SQLITE_PATH", str(tmp_path / "empty.db"))
+    monkeypatch.setattr(config, "DB_BOOTSTRAP", False)
+    with pytest.raises(RuntimeError, match="changes"):
+        prepare_schema()
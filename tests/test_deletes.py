@@ -0,0 +1,59 @@
+import json
+import re
+
+from .conftest import count
+
+
+def progress(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def queries(response):
+    return int(re.search(r'desc="(\d+) queries"', response.headers["Server-Timing"]).group(1))
+
+
+def test_delete_removes_the_pets_orders_and_tags(client, make_pet):
+    pet = make_pet(tags=("doomed",))
+    order = {"id": 0, "petId": pet["id"], "quantity": 1, "shipDate": "2030-01-01T00:00:00", "status": "placed",
+             "complete": False}
+    assert client.post("/store/order", json=order).status_code == 200
+    response = client.delete(f"/pet/{pet['id']}")
+    assert response.status_code == 200
+    # The orders' and the pet's change feed entries, then one DELETE; tags and orders go by cascade.
+    assert queries(response) == 3
+    assert count("orders", "pet_id = %s", [pet["id"]]) == 0
+    assert count("pet_tags", "pet_id = %s", [pet["id"]]) == 0
+    assert client.get(f"/pets/{pet['id']}").status_code == 404
+    assert client.delete(f"/pet/{pet['id']}").status_code == 404
+
+
+def test_purge_by_status_in_chunks(client, make_pet):
+    doomed = [make_pet(name=f"purge-{n}", status="pending") for n in range(5)]
+    kept = make_pet(name="purge-kept", status="sold")
+    lines = progress(client.delete("/pet", params={"status": "pending", "chunk_size": 2}))
+    assert lines[-1] == {"done": True, "deleted_total": 5}
+    assert [line["deleted"] for line in lines[:-1]] == [2, 2, 1]
+    assert count("pets", "id IN (%s, %s, %s, %s, %s)", [pet["id"] for pet in doomed]) == 0
+    assert client.get(f"/pets/{kept['id']}").status_code == 200
+
+
+def test_purge_orders_by_ship_date(client, make_pet):
+    pet = make_pet()
+    for ship_date in ("2001-01-01T00:00:00", "2001-06-01T00:00:00", "2031-01-01T00:00:00"):
+        order = {"id": 0, "petId": pet["id"], "quantity": 1, "shipDate": ship_date, "status": "placed", "complete": False}
+        client.post("/store/order", json=order)
+    lines = progress(client.delete("/store/order", params={"before": "2002-01-01T00:00:00"}))
+    assert lines[-1]["deleted_total"] == 2
+    assert count("orders", "pet_id = %s", [pet["id"]]) == 1
+
+
+def test_order_delete_is_recorded_and_deleted_in_two_statements(client, make_pet):
+    pet = make_pet()
+    order = {"id": 0, "petId": pet["id"], "quantity": 1, "shipDate": "2030-01-01T00:00:00", "status": "placed",
+             "complete": False}
+    order_id = client.post("/store/order", json=order).json()["id"]
+    response = client.delete(f"/store/order/{order_id}")
+    assert response.status_code == 200
+    assert queries(response) == 2
+    assert count("changes", "entity = 'order' AND entity_id = %s AND op = 'delete'", [order_id]) == 1
+    assert client.delete(f"/store/order/{order_id}").status_code == 404
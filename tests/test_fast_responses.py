@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+from .. import config
+from ..http_cache import response_cache
+
+
+def fetch(client, monkeypatch, fast, url, params=None):
+    monkeypatch.setattr(config, "FAST_RESPONSES", fast)
+    for namespace in ("pet", "pets", "user"):
+        response_cache.invalidate_namespace(namespace)
+    response = client.get(url, params=params)
+    assert response.status_code == 200
+    return response
+
+
+@pytest.mark.parametrize("url, params", [
+    ("/pets/{id}", None),
+    ("/", {"tag": "fast"}),
+    ("/pet/findByStatus", {"status": "sold"}),
+    ("/pet/findByStatus", {"status": "sold", "fields": "id,tags"}),
+])
+def test_fast_path_returns_the_same_bytes(client, make_pet, monkeypatch, url, params):
+    pet = make_pet(name="fast ünïcode", status="sold", tags=("fast", "ταχύ"))
+    url = url.format(id=pet["id"])
+    slow = fetch(client, monkeypatch, False, url, params)
+    fast = fetch(client, monkeypatch, True, url, params)
+    assert fast.content == slow.content
+    assert fast.headers.get("ETag") == slow.headers.get("ETag")
+
+
+def test_fast_stream_returns_the_same_pets(client, make_pet, monkeypatch):
+    make_pet(name="fast-stream", tags=("fast-stream",))
+    params = {"tag": "fast-stream", "stream": True}
+    slow, fast = (fetch(client, monkeypatch, fast, "/", params) for fast in (False, True))
+    assert [json.loads(line) for line in fast.text.splitlines()] == [json.loads(line) for line in slow.text.splitlines()]
@@ -0,0 +1,27 @@
+def test_every_match_across_statuses_in_keyset_pages(client, make_pet):
+    wanted = [make_pet(name=f"found-{n}", status=status, tags=("found",))["id"]
+              for n, status in enumerate(["pending", "sold", "pending", "sold"])]
+    make_pet(name="not-found", status="available", tags=("found",))
+
+    seen, params = [], {"status": ["pending", "sold"], "limit": 3}
+    while True:
+        response = client.get("/pet/findByStatus", params=params)
+        assert all(pet["status"] in ("pending", "sold") for pet in response.json())
+        seen.extend(pet["id"] for pet in response.json())
+        if "X-Next-After-Id" not in response.headers:
+            break
+        params["after_id"] = response.headers["X-Next-After-Id"]
+    assert seen == sorted(seen)
+    assert set(wanted) <= set(seen)
+
+
+def test_fields_projects_the_response(client, make_pet):
+    pet = make_pet(name="projected", status="pending")
+    pets = client.get("/pet/findByStatus", params={"status": "pending", "fields": "id,name"}).json()
+    assert {"id": pet["id"], "name": "projected"} in pets
+    assert all(set(entry) == {"id", "name"} for entry in pets)
+
+
+def test_unknown_fields_are_rejected(client):
+    response = client.get("/pet/findByStatus", params={"status": "sold", "fields": "id,secret"})
+    assert response.status_code == 400
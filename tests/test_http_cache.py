@@ -0,0 +1,28 @@
+def test_etag_revalidation_and_invalidation(client, make_pet):
+    pet = make_pet(name="etag")
+    first = client.get(f"/pets/{pet['id']}")
+    etag = first.headers["ETag"]
+    assert client.get(f"/pets/{pet['id']}", headers={"If-None-Match": etag}).status_code == 304
+
+    listing = client.get("/", params={"limit": 500})
+    assert client.get("/", params={"limit": 500}, headers={"If-None-Match": listing.headers["ETag"]}).status_code == 304
+
+    assert client.put("/pet", json={**pet, "name": "etag-renamed"}).status_code == 200
+    changed = client.get(f"/pets/{pet['id']}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert changed.json()["name"] == "etag-renamed"
+    relisted = client.get("/", params={"limit": 500}, headers={"If-None-Match": listing.headers["ETag"]})
+    assert relisted.status_code == 200
+
+
+def test_user_etag_changes_when_the_user_is_updated(client):
+    user = {"id": 0, "username": "etag-user", "firstName": "Old", "lastName": "L", "email": "etag@example.com",
+            "password": "secret", "phone": "555-0100", "userStatus": 1}
+    assert client.post("/user", json=user).status_code == 200
+    etag = client.get("/user/etag-user").headers["ETag"]
+    assert client.get("/user/etag-user", headers={"If-None-Match": etag}).status_code == 304
+
+    update = {key: value for key, value in user.items() if key != "password"}
+    assert client.put("/user/etag-user", json={**update, "firstName": "New"}).status_code == 200
+    changed = client.get("/user/etag-user", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.json()["firstName"] == "New"
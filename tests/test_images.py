@@ -0,0 +1,46 @@
+import io
+
+from PIL import Image
+
+
+def png(width=64, height=48):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def upload_png(client, make_pet):
+    pet = make_pet(name="pictured")
+    response = client.post(f"/pet/{pet['id']}/uploadImage", files={"file": ("photo.png", png(), "image/png")})
+    return response.json()["image_url"]
+
+
+def test_thumbnail_revalidates_with_304(client, make_pet):
+    url = upload_png(client, make_pet)
+    first = client.get(url, params={"w": 32})
+    assert first.status_code == 200
+    assert Image.open(io.BytesIO(first.content)).size == (32, 24)
+    # Serving from the thumbnail cache must not change the validators.
+    second = client.get(url, params={"w": 32})
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert second.headers["Last-Modified"] == first.headers["Last-Modified"]
+
+    revalidated = client.get(url, params={"w": 32}, headers={"If-None-Match": first.headers["ETag"]})
+    assert revalidated.status_code == 304
+    by_date = client.get(url, params={"w": 32}, headers={"If-Modified-Since": first.headers["Last-Modified"]})
+    assert by_date.status_code == 304
+
+
+def test_thumbnail_widths_have_their_own_etag(client, make_pet):
+    url = upload_png(client, make_pet)
+    etags = {client.get(url, params=params).headers["ETag"] for params in ({}, {"w": 16}, {"w": 32})}
+    assert len(etags) == 3
+
+
+def test_range_request_on_an_original(client, make_pet):
+    url = upload_png(client, make_pet)
+    full = client.get(url).content
+    partial = client.get(url, headers={"Range": "bytes=0-9"})
+    assert partial.status_code == 206
+    assert partial.content == full[:10]
+    assert partial.headers["Content-Range"] == f"bytes 0-9/{len(full)}"
@@ -0,0 +1,17 @@
+import re
+
+
+def test_server_timing_reports_queries_and_phases(client, make_pet):
+    pet = make_pet(name="timed")
+    timing = client.get(f"/pets/{pet['id']}").headers["Server-Timing"]
+    assert re.match(r'db;dur=[\d.]+;desc="\d+ queries"', timing)
+    assert re.search(r"total;dur=[\d.]+$", timing)
+
+
+def test_metrics_are_labelled_by_route_template(client, make_pet):
+    pet = make_pet(name="measured")
+    client.get(f"/pets/{pet['id']}")
+    metrics = client.get("/metrics").text
+    assert 'petstore_request_duration_seconds_count{method="GET",route="/pets/{pet_id}",status="200"}' in metrics
+    assert f'route="/pets/{pet["id"]}"' not in metrics
+    assert "petstore_request_db_queries_bucket" in metrics
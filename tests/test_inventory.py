@@ -0,0 +1,29 @@
+from ..dependencies import inventory_cache
+
+
+def order(pet_id, quantity, status="placed"):
+    return {"id": 0, "petId": pet_id, "quantity": quantity, "shipDate": "2030-01-01T00:00:00", "status": status,
+            "complete": False}
+
+
+def test_inventory_counts_every_status(client, make_pet):
+    before = client.get("/store/inventory").json()
+    assert set(before["pets"]) == {"available", "pending", "sold"}
+    assert set(before["orders"]) == set(before["quantities"]) == {"placed", "approved", "delivered"}
+
+    pet = make_pet(name="counted", status="pending")
+    client.post("/store/order", json=order(pet["id"], 3))
+    client.post("/store/order", json=order(pet["id"], 4, status="approved"))
+    after = client.get("/store/inventory").json()
+    assert after["pets"]["pending"] == before["pets"]["pending"] + 1
+    assert after["orders"]["placed"] == before["orders"]["placed"] + 1
+    assert after["quantities"]["placed"] == before["quantities"]["placed"] + 3
+    assert after["quantities"]["approved"] == before["quantities"]["approved"] + 4
+
+
+def test_cached_inventory_serves_the_snapshot(client, make_pet):
+    inventory_cache.invalidate()
+    snapshot = client.get("/store/inventory", params={"cached": True}).json()
+    make_pet(name="not-yet-counted", status="sold")
+    assert client.get("/store/inventory", params={"cached": True}).json() == snapshot
+    assert client.get("/store/inventory").json()["pets"]["sold"] == snapshot["pets"]["sold"] + 1
@@ -0,0 +1,28 @@
+import json
+
+
+def test_keyset_pages_follow_the_next_after_id_header(client, make_pet):
+    created = [make_pet(name=f"page-{n}", tags=("paged",))["id"] for n in range(5)]
+    seen, params = [], {"tag": "paged", "limit": 2}
+    while True:
+        response = client.get("/", params=params)
+        seen.extend(pet["id"] for pet in response.json())
+        if "X-Next-After-Id" not in response.headers:
+            break
+        params["after_id"] = response.headers["X-Next-After-Id"]
+    assert seen == created
+
+
+def test_filters_combine(client, make_pet):
+    sold = make_pet(name="filter-sold", status="sold", tags=("filtered",))
+    make_pet(name="filter-available", status="available", tags=("filtered",))
+    make_pet(name="filter-other-tag", status="sold", tags=("unfiltered",))
+    pets = client.get("/", params={"tag": "filtered", "status": "sold"}).json()
+    assert [pet["id"] for pet in pets] == [sold["id"]]
+
+
+def test_stream_returns_every_match_as_ndjson(client, make_pet):
+    created = [make_pet(name=f"stream-{n}", tags=("streamed",)) for n in range(3)]
+    response = client.get("/", params={"tag": "streamed", "stream": True})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == created
@@ -0,0 +1,40 @@
+import re
+
+from ..dependencies import lookup_cache
+from ..signals import lookups_changed
+
+
+def queries(response):
+    return int(re.search(r'desc="(\d+) queries"', response.headers["Server-Timing"]).group(1))
+
+
+def new_pet(category, name, tags):
+    return {"id": 0, "category": category, "name": name, "photoUrls": [], "status": "available",
+            "tags": [{"id": 0, "name": tag} for tag in tags]}
+
+
+def test_known_tags_and_categories_are_resolved_from_the_cache(client, category):
+    lookup_cache.invalidate()
+    first = client.post("/pet", json=new_pet(category, "lookup-1", ["lookup"]))
+    tag_id = first.json()["tags"][0]["id"]
+    assert lookup_cache.get("tag:lookup") == tag_id
+    assert lookup_cache.get(f"category:{category['id']}") == category["name"]
+
+    second = client.post("/pet", json=new_pet(category, "lookup-2", ["lookup"]))
+    assert second.json()["tags"] == [{"id": tag_id, "name": "lookup"}]
+    # The tag SELECT, INSERT and re-SELECT and the category SELECT are all skipped.
+    assert queries(second) == queries(first) - 4
+
+
+def test_lookups_changed_drops_the_entry(client, category):
+    client.post("/pet", json=new_pet(category, "lookup-3", ["dropped"]))
+    assert lookup_cache.get("tag:dropped") is not None
+    lookups_changed("tag:dropped")
+    assert lookup_cache.get("tag:dropped") is None
+
+
+def test_tags_from_a_rolled_back_batch_are_not_cached(client, category):
+    broken = {**category, "id": 999999}  # the foreign key fails after the tag was inserted
+    response = client.post("/pet/batch", json=[new_pet(broken, "lookup-4", ["never-committed"])])
+    assert response.status_code == 500
+    assert lookup_cache.get("tag:never-committed") is None
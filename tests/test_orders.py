@@ -0,0 +1,97 @@
+import hashlib
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import pytest
+
+from .. import idempotency
+from ..dependencies import get_db_connection
+from ..hydration import encode_json
+from ..models import Order
+from .conftest import count
+
+
+def order_for(pet, **fields):
+    return {"id": 0, "petId": pet["id"], "quantity": 1, "shipDate": "2030-01-01T00:00:00", "status": "placed",
+            "complete": False, **fields}
+
+
+def queries(response):
+    return int(re.search(r'desc="(\d+) queries"', response.headers["Server-Timing"]).group(1))
+
+
+@pytest.fixture(autouse=True)
+def no_sweep(monkeypatch):
+    # Keeps the once-a-minute purge of expired keys out of the statement counts.
+    monkeypatch.setattr(idempotency, "_next_sweep", float("inf"))
+
+
+def test_retry_with_same_key_is_replayed(client, make_pet):
+    order = order_for(make_pet())
+    headers = {"Idempotency-Key": "replay-1"}
+    first = client.post("/store/order", json=order, headers=headers)
+    retry = client.post("/store/order", json=order, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert count("orders", "pet_id = %s", [order["petId"]]) == 1
+    # Key INSERT, order INSERT, change feed INSERT and the stored body, all in one transaction.
+    assert queries(first) == 4
+    # The failed key INSERT and the read of the stored body.
+    assert queries(retry) == 2
+
+
+def test_key_reused_with_different_payload_is_422(client, make_pet):
+    order = order_for(make_pet())
+    headers = {"Idempotency-Key": "mismatch-1"}
+    assert client.post("/store/order", json=order, headers=headers).status_code == 200
+    response = client.post("/store/order", json={**order, "quantity": 2}, headers=headers)
+    assert response.status_code == 422
+    assert count("orders", "pet_id = %s", [order["petId"]]) == 1
+
+
+def test_retry_while_first_request_runs_waits_and_is_replayed(client, make_pet):
+    order = order_for(make_pet())
+    stored = {**order, "id": 424242}
+    fingerprint = hashlib.sha256(encode_json(Order(**order))).hexdigest()
+    # The first request, in another worker, has inserted its key but not committed yet.
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    cursor.execute("INSERT INTO idempotency_keys (scope, idem_key, fingerprint, body, created_at) "
+                   "VALUES (%s, %s, %s, %s, %s)", ("order", "in-flight-1", fingerprint, encode_json(stored),
+                                                   datetime.now(timezone.utc).replace(tzinfo=None)))
+    with ThreadPoolExecutor(1) as pool:
+        retry = pool.submit(client.post, "/store/order", json=order, headers={"Idempotency-Key": "in-flight-1"})
+        time.sleep(0.3)
+        assert not retry.done()
+        connection.commit()
+        response = retry.result()
+    cursor.close()
+    connection.close()
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert response.json() == stored
+    assert count("orders", "pet_id = %s", [order["petId"]]) == 0
+
+
+def test_failed_request_leaves_no_key(client, make_pet):
+    pet = make_pet()
+    headers = {"Idempotency-Key": "release-1"}
+    assert client.post("/store/order", json=order_for({"id": 999999}), headers=headers).status_code == 404
+    assert count("idempotency_keys", "idem_key = %s", ["release-1"]) == 0
+    assert client.post("/store/order", json=order_for(pet), headers=headers).status_code == 200
+
+
+def test_batch_rejects_sold_pets_atomically(client, make_pet):
+    available, sold = make_pet(), make_pet(status="sold")
+    response = client.post("/store/order/batch", json=[order_for(available), order_for(sold)])
+    assert response.status_code == 409
+    assert count("orders", "pet_id IN (%s, %s)", [available["id"], sold["id"]]) == 0
+
+    headers = {"Idempotency-Key": "batch-1"}
+    placed = client.post("/store/order/batch", json=[order_for(available), order_for(available)], headers=headers)
+    assert len({order["id"] for order in placed.json()}) == 2
+    replayed = client.post("/store/order/batch", json=[order_for(available), order_for(available)], headers=headers)
+    assert replayed.json() == placed.json()
+    assert count("orders", "pet_id = %s", [available["id"]]) == 2
@@ -0,0 +1,31 @@
+def new_pet(category, name, status="available", tags=()):
+    return {"id": 0, "category": category, "name": name, "photoUrls": [f"/img/{name}.jpg"], "status": status,
+            "tags": [{"id": 0, "name": tag} for tag in tags]}
+
+
+def test_batch_create_returns_every_pet_with_its_id(client, category):
+    pets = [new_pet(category, f"batch-{n}", tags=["batch", f"tag-{n % 2}"]) for n in range(5)]
+    created = client.post("/pet/batch", json=pets).json()
+    assert [pet["name"] for pet in created] == [pet["name"] for pet in pets]
+    assert len({pet["id"] for pet in created}) == 5
+    for pet in created:
+        assert client.get(f"/pets/{pet['id']}").json() == pet
+    assert sorted(tag["name"] for tag in created[1]["tags"]) == ["batch", "tag-1"]
+
+
+def test_batch_update_replaces_names_statuses_and_tags(client, category):
+    created = client.post("/pet/batch", json=[new_pet(category, f"update-{n}", tags=["old"]) for n in range(3)]).json()
+    changes = [{**pet, "name": pet["name"] + "-renamed", "status": "sold", "photoUrls": [], "tags": [{"id": 0, "name": "new"}]}
+               for pet in created]
+    updated = client.put("/pet/batch", json=changes).json()
+    for before, after in zip(created, updated):
+        assert after["name"] == before["name"] + "-renamed" and after["status"] == "sold"
+        assert after["photoUrls"] == before["photoUrls"]  # an empty list leaves the stored URLs alone
+        assert [tag["name"] for tag in after["tags"]] == ["new"]
+
+
+def test_batch_update_with_unknown_id_writes_nothing(client, category):
+    (pet,) = client.post("/pet/batch", json=[new_pet(category, "all-or-nothing")]).json()
+    response = client.put("/pet/batch", json=[{**pet, "name": "changed"}, {**pet, "id": 999999}])
+    assert response.status_code == 404
+    assert client.get(f"/pets/{pet['id']}").json()["name"] == "all-or-nothing"
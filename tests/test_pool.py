@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+from ..pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.rolled_back = 0
+        self.closed = False
+
+    def rollback(self):
+        self.rolled_back += 1
+
+    def close(self):
+        self.closed = True
+
+    def is_connected(self):
+        return not self.closed
+
+
+def test_checkout_reuses_released_connections():
+    pool = ConnectionPool(FakeConnection, size=2, timeout=0.1)
+    first = pool.acquire()
+    raw = first._raw
+    first.close()
+    second = pool.acquire()
+    assert second._raw is raw
+    assert raw.rolled_back == 1  # released connections never carry an open transaction
+    second.close()
+    stats = pool.stats()
+    assert (stats["created"], stats["idle"], stats["in_use"], stats["checkouts"]) == (1, 1, 0, 2)
+
+
+def test_checkout_times_out_when_exhausted():
+    pool = ConnectionPool(FakeConnection, size=1, timeout=0.05)
+    held = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+    held.close()
+
+
+def test_release_wakes_a_waiting_checkout():
+    pool = ConnectionPool(FakeConnection, size=1, timeout=5)
+    held = pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    threading.Timer(0.05, held.close).start()
+    waiter.join(2)
+    assert len(acquired) == 1
+    acquired[0].close()
+    assert pool.stats()["in_use"] == 0
+
+
+def test_unhealthy_idle_connection_is_replaced():
+    pool = ConnectionPool(FakeConnection, size=1, timeout=0.1)
+    conn = pool.acquire()
+    raw = conn._raw
+    conn.close()
+    raw.closed = True
+    conn = pool.acquire()
+    assert conn._raw is not raw
+    assert pool.stats()["discarded"] == 1
+    conn.close()
+
+
+def test_closed_pool_refuses_checkouts():
+    pool = ConnectionPool(FakeConnection, size=1)
+    pool.acquire().close()
+    pool.close()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
@@ -0,0 +1,55 @@
+import pytest
+
+from .. import config
+from ..query_log import normalize_sql, query_log
+
+
+@pytest.fixture(scope="module")
+def tokens(client):
+    tokens = {}
+    for username in ("log-admin", "log-user"):
+        user = {"id": 0, "username": username, "firstName": "F", "lastName": "L", "email": f"{username}@example.com",
+                "password": "secret", "phone": "555-0100", "userStatus": 1}
+        client.post("/user", json=user)
+        tokens[username] = client.post("/user/login", json={"username": username, "password": "secret"}).json()["token"]
+    return tokens
+
+
+@pytest.fixture
+def admin(tokens, monkeypatch):
+    monkeypatch.setattr(config, "ADMIN_USERS", {"log-admin"})
+    return {"Authorization": f"Bearer {tokens['log-admin']}"}
+
+
+def test_normalize_sql_collapses_arguments():
+    assert normalize_sql("SELECT * FROM pets WHERE id IN (%s, %s,  %s) AND name = 'rex'") == \
+        "SELECT * FROM pets WHERE id IN (?, ...) AND name = ?"
+    assert normalize_sql("INSERT INTO tags (name) VALUES (%s), (%s), (%s)") == "INSERT INTO tags (name) VALUES (?), ..."
+
+
+def test_admin_endpoints_need_an_admin(client, tokens, admin):
+    assert client.get("/admin/queries").status_code == 401
+    user = {"Authorization": f"Bearer {tokens['log-user']}"}
+    assert client.get("/admin/queries", headers=user).status_code == 403
+    assert client.delete("/admin/queries", headers=user).status_code == 403
+    assert client.get("/admin/queries", headers=admin).status_code == 200
+
+
+def test_development_mode_redacts_user_and_idempotency_params(client, admin, make_pet, monkeypatch):
+    monkeypatch.setattr(config, "QUERY_LOG_MODE", "development")
+    query_log.clear()
+    make_pet(name="logged-pet")
+    client.get("/user/log-user")
+    entries = client.get("/admin/queries", params={"kind": "statement"}, headers=admin).json()["entries"]
+    users = [entry for entry in entries if "FROM users" in entry["statement"]]
+    pets = [entry for entry in entries if entry["statement"].startswith("INSERT INTO pets")]
+    assert users and all(entry["params"] == "[redacted]" for entry in users)
+    assert pets and "logged-pet" in pets[0]["params"]
+
+
+def test_repeated_statements_are_flagged_as_n_plus_one(client, admin, make_pet, monkeypatch):
+    monkeypatch.setattr(config, "N_PLUS_ONE_THRESHOLD", 1)
+    query_log.clear()
+    make_pet(name="repeated", tags=("a", "b", "c"))
+    entries = client.get("/admin/queries", params={"kind": "n_plus_one"}, headers=admin).json()["entries"]
+    assert any(entry["route"] == "/pet" and "pet_tags" in entry["statement"] for entry in entries)
@@ -0,0 +1,52 @@
+import pytest
+
+from ..schema import missing_tables
+from ..storage import IntegrityError, get_backend
+
+
+@pytest.fixture
+def connection(client):
+    connection = get_backend().connect()
+    yield connection
+    connection.rollback()
+    connection.close()
+
+
+def test_bootstrap_created_every_table(client):
+    assert get_backend().name == "sqlite"
+    assert missing_tables() == []
+
+
+def test_only_writes_open_a_transaction(connection):
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute("SELECT COUNT(*) AS n FROM tags")
+    before = cursor.fetchone()["n"]
+    assert not connection.raw.in_transaction
+    cursor.execute("INSERT INTO tags (name) VALUES (%s)", ("storage-rolled-back",))
+    assert connection.raw.in_transaction
+    connection.rollback()
+    cursor.execute("SELECT COUNT(*) AS n FROM tags")
+    assert cursor.fetchone()["n"] == before
+
+
+def test_select_for_update_takes_the_write_lock(connection):
+    cursor = connection.cursor()
+    cursor.execute("SELECT id FROM tags FOR UPDATE")
+    cursor.fetchall()
+    assert connection.raw.in_transaction
+
+
+def test_insert_ids_follow_values_order(connection):
+    cursor = connection.cursor(dictionary=True)
+    names = ["storage-a", "storage-b", "storage-c"]
+    cursor.execute("INSERT INTO tags (name) VALUES (%s), (%s), (%s)", names)
+    ids = get_backend().insert_ids(cursor, len(names))
+    cursor.execute("SELECT id, name FROM tags WHERE name IN (%s, %s, %s)", names)
+    assert {row["name"]: row["id"] for row in cursor.fetchall()} == dict(zip(names, ids))
+
+
+def test_foreign_keys_are_enforced(connection):
+    cursor = connection.cursor()
+    with pytest.raises(IntegrityError):
+        cursor.execute("INSERT INTO pets (category_id, name, photoUrls, status) VALUES (%s, %s, %s, %s)",
+                       (999999, "orphan", "[]", "available"))
@@ -0,0 +1,12 @@
+import anyio
+
+from .. import config
+
+
+def _default_limit():
+    return anyio.to_thread.current_default_thread_limiter().total_tokens
+
+
+def test_sync_handlers_share_the_db_thread_limit(client):
+    # Sync route handlers run on anyio's default limiter, which startup sizes to DB_THREADS.
+    assert client.portal.call(_default_limit) == config.DB_THREADS
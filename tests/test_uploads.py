@@ -0,0 +1,46 @@
+import os
+
+from .. import config
+from ..dependencies import UPLOAD_DIRECTORY, image_url_in_use
+
+
+def upload(client, pet_id, content, name="photo.png"):
+    return client.post(f"/pet/{pet_id}/uploadImage", files={"file": (name, content, "image/png")})
+
+
+def stored_files():
+    return sorted(os.listdir(UPLOAD_DIRECTORY))
+
+
+def test_same_image_is_stored_once_under_its_hash(client, make_pet):
+    pet = make_pet(name="upload")
+    first = upload(client, pet["id"], b"same bytes").json()["image_url"]
+    second = upload(client, pet["id"], b"same bytes").json()["image_url"]
+    assert first == second and first.endswith(".png")
+    assert client.get(f"/pets/{pet['id']}").json()["photoUrls"][-1] == first
+
+
+def test_unknown_pet_stores_nothing(client):
+    before = stored_files()
+    assert upload(client, 999999, b"orphan").status_code == 404
+    assert stored_files() == before
+
+
+def test_oversized_upload_is_refused_before_parsing(client, make_pet, monkeypatch):
+    pet = make_pet(name="too-big")
+    monkeypatch.setattr(config, "MAX_UPLOAD_BYTES", 10)
+    before = stored_files()
+    # Over the limit plus multipart framing: refused from Content-Length alone.
+    assert upload(client, pet["id"], b"x" * 100_000).status_code == 413
+    # Within the framing allowance, so the body is parsed; save_upload still counts the file itself.
+    assert upload(client, pet["id"], b"x" * 100).status_code == 413
+    assert stored_files() == before
+    assert client.get(f"/pets/{pet['id']}").json()["photoUrls"] == []
+
+
+def test_image_url_in_use_treats_like_wildcards_literally(client, make_pet):
+    pet = make_pet(name="wildcards")
+    url = upload(client, pet["id"], b"wildcards").json()["image_url"]
+    assert image_url_in_use(url)
+    assert not image_url_in_use(url[:-5] + "_.png")
+    assert not image_url_in_use(url[:-6] + "%")
@@ -0,0 +1,26 @@
+from .. import config
+from ..dependencies import get_user_password_from_db
+from ..passwords import is_hashed
+from .conftest import count
+
+
+def new_user(username, password="secret"):
+    return {"id": 0, "username": username, "firstName": "F", "lastName": "L", "email": f"{username}@example.com",
+            "password": password, "phone": "555-0100", "userStatus": 1}
+
+
+def test_create_with_list_hashes_passwords_and_reports_conflicts(client):
+    client.post("/user/createWithList", json=[new_user("list-taken")])
+    body = client.post("/user/createWithList",
+                       json=[new_user("list-a"), new_user("list-a"), new_user("list-taken"), new_user("list-b")]).json()
+    assert sorted(user["username"] for user in body["created"]) == ["list-a", "list-b"]
+    assert sorted(conflict["username"] for conflict in body["conflicts"]) == ["list-a", "list-taken"]
+    assert all("password" not in user for user in body["created"])
+    assert is_hashed(get_user_password_from_db("list-b"))
+
+
+def test_create_with_list_rejects_oversized_lists(client, monkeypatch):
+    monkeypatch.setattr(config, "USER_IMPORT_MAX_USERS", 2)
+    response = client.post("/user/createWithList", json=[new_user(f"too-many-{n}") for n in range(3)])
+    assert response.status_code == 413
+    assert count("users", "username LIKE %s", ["too-many-%"]) == 0
@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from .. import write_behind
+from ..write_behind import PetStatusWriteBehind
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """Stands in for update_pet_names_and_statuses: records each batch; pets in `poison` fail their batch."""
+    db = {"batches": [], "written": {}, "existing": set(range(1, 100)), "poison": set()}
+
+    def update(updates, chunk_size=None):
+        if db["poison"] & set(updates):
+            raise RuntimeError("poisoned update")
+        db["batches"].append(dict(updates))
+        db["written"].update(updates)
+        return set(updates) & db["existing"]
+
+    monkeypatch.setattr(write_behind, "update_pet_names_and_statuses", update)
+    monkeypatch.setattr(write_behind, "pets_changed", lambda *pet_ids: None)
+    return db
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_updates_to_one_pet_coalesce(database):
+    async def scenario():
+        writer = PetStatusWriteBehind(interval=60)
+        await writer.start()
+        await writer.submit(1, "a", "available")
+        await writer.submit(1, "b", "pending")
+        await writer.submit(2, "c", "sold")
+        await writer.flush()
+        await writer.close()
+        return writer.stats()
+
+    stats = run(scenario())
+    assert database["batches"] == [{1: ("b", "pending"), 2: ("c", "sold")}]
+    assert (stats["submitted"], stats["coalesced"], stats["flushed"], stats["batches"]) == (3, 1, 2, 1)
+
+
+def test_durable_submit_waits_for_the_write(database):
+    async def scenario():
+        writer = PetStatusWriteBehind(interval=0.01)
+        await writer.start()
+        found = await writer.submit(1, "a", "sold", wait=True)
+        missing = await writer.submit(500, "b", "sold", wait=True)
+        await writer.close()
+        return found, missing
+
+    assert run(scenario()) == (True, False)
+    assert database["written"][1] == ("a", "sold")
+
+
+def test_failing_pet_does_not_block_the_rest(database):
+    database["poison"].add(13)
+
+    async def scenario():
+        writer = PetStatusWriteBehind(interval=60, max_attempts=2)
+        await writer.start()
+        await writer.submit(13, "bad", "sold")
+        durable = asyncio.create_task(writer.submit(13, "worse", "sold", wait=True))
+        other = asyncio.create_task(writer.submit(1, "a", "sold", wait=True))
+        await asyncio.sleep(0)
+        await writer.flush()
+        assert await other is True
+        with pytest.raises(HTTPException) as error:
+            await durable
+        assert error.value.status_code == 500
+
+        await writer.submit(13, "async", "sold")
+        await writer.flush()  # first failure: put back
+        assert writer.stats()["pending"] == 1
+        await writer.flush()  # second failure: dropped
+        await writer.close()
+        return writer.stats()
+
+    stats = run(scenario())
+    assert 13 not in database["written"] and database["written"][1] == ("a", "sold")
+    assert (stats["pending"], stats["dropped"]) == (0, 1)
+
+
+def test_close_drains_and_refuses_new_updates(database):
+    async def scenario():
+        writer = PetStatusWriteBehind(interval=60)
+        await writer.start()
+        for pet_id in range(1, 6):
+            await writer.submit(pet_id, f"pet-{pet_id}", "pending")
+        await writer.close()
+        with pytest.raises(HTTPException) as error:
+            await writer.submit(1, "late", "sold")
+        return error.value.status_code
+
+    assert run(scenario()) == 503
+    assert sorted(database["written"]) == [1, 2, 3, 4, 5]
+
+
+def test_full_queue_rejects_with_503(database):
+    async def scenario():
+        writer = PetStatusWriteBehind(interval=60, batch_size=100, max_pending=2, enqueue_timeout=0.05)
+        writer_flush = writer.flush
+        writer.flush = lambda: asyncio.sleep(0)  # nothing makes room
+        await writer.start()
+        await writer.submit(1, "a", "sold")
+        await writer.submit(2, "b", "sold")
+        await writer.submit(1, "a2", "sold")  # same pet: replaces, needs no room
+        with pytest.raises(HTTPException) as error:
+            await writer.submit(3, "c", "sold")
+        writer.flush = writer_flush
+        await writer.close()
+        return error.value
+
+    error = run(scenario())
+    assert error.status_code == 503 and error.headers["Retry-After"] == "1"
+    assert database["written"] == {1: ("a2", "sold"), 2: ("b", "sold")}
@@ -0,0 +1,108 @@
+import hashlib
+import os
+import re
+import uuid
+from pathlib import Path
+
+import anyio
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+
+from . import config
+from .dependencies import UPLOAD_DIRECTORY
+
+_SUFFIX = re.compile(r"^\.[a-z0-9]{1,10}$")
+_MULTIPART_OVERHEAD = 64 * 1024  # boundaries, part headers and form fields around the file itself
+
+
+def _write_chunk(f, hasher, chunk):
+    # Runs on a worker thread; hashlib and file writes both release the GIL for large buffers.
+    hasher.update(chunk)
+    f.write(chunk)
+
+
+def _commit_file(temp_path: Path, final_path: Path):
+    if final_path.exists():
+        # Same bytes are already stored under this name.
+        temp_path.unlink()
+    else:
+        os.replace(temp_path, final_path)
+
+
+async def save_upload(file: UploadFile) -> str:
+    """Stream an upload to UPLOAD_DIRECTORY in chunks and return the stored file name.
+
+    Files are named after the SHA-256 of their content, so identical images are kept once. Uploads larger than
+    MAX_UPLOAD_BYTES are rejected with 413 without ever being held in memory.
+    """
+    suffix = Path(file.filename or "").suffix.lower()
+    if not _SUFFIX.match(suffix):
+        suffix = ""
+
+    temp_path = UPLOAD_DIRECTORY / f".upload-{uuid.uuid4().hex}.part"
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        f = await anyio.to_thread.run_sync(open, temp_path, "wb")
+        try:
+            while chunk := await file.read(config.UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > config.MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Image is larger than {config.MAX_UPLOAD_BYTES} bytes.")
+                await anyio.to_thread.run_sync(_write_chunk, f, hasher, chunk)
+        finally:
+            await anyio.to_thread.run_sync(f.close)
+
+        filename = hasher.hexdigest() + suffix
+        await anyio.to_thread.run_sync(_commit_file, temp_path, UPLOAD_DIRECTORY / filename)
+        return filename
+    finally:
+        if temp_path.exists():
+            await anyio.to_thread.run_sync(temp_path.unlink)
+
+
+async def discard_upload(filename: str):
+    """Remove a stored upload that nothing ended up referencing."""
+    path = UPLOAD_DIRECTORY / filename
+    try:
+        await anyio.to_thread.run_sync(path.unlink)
+    except FileNotFoundError:
+        pass
+
+
+class UploadSizeLimitMiddleware:
+    """Refuse image uploads over MAX_UPLOAD_BYTES before their multipart body is parsed.
+
+    The form is read (and spooled to disk) before the handler runs, so save_upload's own check comes too
+    late to spare that work. A declared Content-Length over the limit gets 413 straight away; bodies sent
+    without one are counted as they arrive and cut off at the limit.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].endswith("/uploadImage"):
+            await self.app(scope, receive, send)
+            return
+
+        limit = config.MAX_UPLOAD_BYTES + _MULTIPART_OVERHEAD
+        detail = f"Image is larger than {config.MAX_UPLOAD_BYTES} bytes."
+        length = Headers(scope=scope).get("content-length", "")
+        if length.isdigit() and int(length) > limit:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
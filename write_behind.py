@@ -0,0 +1,191 @@
+"""Write-behind queue for PUT /pet/{petId}, enabled with PETSTORE_PET_WRITE_BEHIND.
+
+Updates are held per pet, so a later update replaces an earlier one that has not been written yet (last
+write wins), and a background task flushes everything pending as one batched UPDATE transaction every
+PET_WRITE_BEHIND_INTERVAL seconds, or sooner once PET_WRITE_BEHIND_BATCH_SIZE pets are waiting.
+
+    async    the caller gets 202 as soon as the update is queued
+    durable  the caller waits for the flush that writes its update, then gets 200 (or 404)
+
+The queue holds at most PET_WRITE_BEHIND_MAX_PENDING pets. Past that, submit() waits for a flush to make
+room and gives up with a 503 after PET_WRITE_BEHIND_ENQUEUE_TIMEOUT seconds. If a batch fails, it is
+retried pet by pet, so one bad update cannot hold back the others. Pets whose own write fails hand the
+error to their durable callers; async updates are put back for the next flush, unless a newer update for
+the same pet has arrived meanwhile, and dropped with an error logged after PET_WRITE_BEHIND_MAX_ATTEMPTS
+failed flushes. close() stops intake and drains whatever is queued; main.py calls it on shutdown before the
+pool closes.
+"""
+import asyncio
+import logging
+
+from fastapi import HTTPException
+
+from . import config
+from .dependencies import run_db, update_pet_names_and_statuses
+from .signals import pets_changed
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "async", "durable")
+
+
+class _Pending:
+    __slots__ = ("name", "status", "waiters", "attempts")
+
+    def __init__(self, name, status):
+        self.name = name
+        self.status = status
+        self.waiters = []
+        self.attempts = 0  # failed flushes of this name and status
+
+
+class PetStatusWriteBehind:
+    def __init__(self, interval=0.1, batch_size=500, max_pending=10000, enqueue_timeout=5.0, max_attempts=3):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.enqueue_timeout = enqueue_timeout
+        self.max_attempts = max_attempts
+        self._pending = {}  # pet id -> _Pending
+        self._task = None
+        self._closed = False
+        self.submitted = 0
+        self.coalesced = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+
+    async def start(self):
+        # The asyncio primitives belong to the running loop, so they are made here rather than in __init__.
+        self._space = asyncio.Condition()
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._closed = False
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, pet_id, name, status, wait=False):
+        """Queue an update. With wait=True, return whether the pet existed once the update is written."""
+        if self._task is None or self._closed:
+            raise HTTPException(status_code=503, detail="Pet update queue is not accepting writes")
+        async with self._space:
+            if pet_id not in self._pending and len(self._pending) >= self.max_pending:
+                self._wake.set()
+                try:
+                    await asyncio.wait_for(
+                        self._space.wait_for(lambda: len(self._pending) < self.max_pending or self._closed),
+                        self.enqueue_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    raise HTTPException(status_code=503, detail="Pet update queue is full", headers={"Retry-After": "1"})
+                if self._closed:
+                    raise HTTPException(status_code=503, detail="Pet update queue is not accepting writes")
+
+            self.submitted += 1
+            entry = self._pending.get(pet_id)
+            if entry is None:
+                entry = self._pending[pet_id] = _Pending(name, status)
+            else:
+                entry.name, entry.status, entry.attempts = name, status, 0
+                self.coalesced += 1
+            waiter = asyncio.get_running_loop().create_future() if wait else None
+            if waiter is not None:
+                entry.waiters.append(waiter)
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+        if waiter is not None:
+            return await waiter
+        return None
+
+    async def flush(self):
+        """Write everything queued so far in one transaction."""
+        async with self._flush_lock:
+            async with self._space:
+                batch, self._pending = self._pending, {}
+                self._space.notify_all()
+            if not batch:
+                return
+            try:
+                await self._write(batch)
+            except Exception as e:
+                self.failures += 1
+                if len(batch) == 1:
+                    logger.exception("Flushing a queued update for pet %d failed", next(iter(batch)))
+                    await self._requeue(batch, e)
+                    return
+                logger.exception("Flushing %d queued pet updates failed; retrying them one by one", len(batch))
+                for pet_id, entry in batch.items():
+                    try:
+                        await self._write({pet_id: entry})
+                    except Exception as error:
+                        logger.error("Writing the queued update for pet %d failed: %s", pet_id, error)
+                        await self._requeue({pet_id: entry}, error)
+
+    async def _write(self, batch):
+        found = await run_db(update_pet_names_and_statuses,
+                             {pet_id: (entry.name, entry.status) for pet_id, entry in batch.items()})
+        self.flushed += len(batch)
+        self.batches += 1
+        if found:
+            pets_changed(*found)
+        for pet_id, entry in batch.items():
+            for waiter in entry.waiters:
+                if not waiter.done():
+                    waiter.set_result(pet_id in found)
+
+    async def _requeue(self, batch, error):
+        async with self._space:
+            for pet_id, entry in batch.items():
+                entry.attempts += 1
+                if entry.waiters:
+                    for waiter in entry.waiters:
+                        if not waiter.done():
+                            waiter.set_exception(HTTPException(status_code=500, detail=f"Database update error: {error}"))
+                elif pet_id in self._pending:
+                    pass  # superseded by a newer update
+                elif entry.attempts >= self.max_attempts:
+                    self.dropped += 1
+                    logger.error("Dropping the queued update for pet %d after %d failed attempts", pet_id, entry.attempts)
+                else:
+                    self._pending[pet_id] = entry
+
+    async def _run(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def close(self):
+        """Stop taking updates and write out what is queued."""
+        if self._task is None:
+            return
+        self._closed = True
+        async with self._space:
+            self._space.notify_all()  # release submitters waiting for room
+        # Not cancelled: a flush in progress finishes and resolves its waiters, then the loop exits.
+        self._wake.set()
+        await self._task
+        self._task = None
+        await self.flush()  # anything put back by a failed final flush gets one more try
+        if self._pending:
+            logger.error("Dropping %d queued pet updates that could not be written on shutdown", len(self._pending))
+
+    def stats(self):
+        return {"pending": len(self._pending), "submitted": self.submitted, "coalesced": self.coalesced,
+                "flushed": self.flushed, "batches": self.batches, "failures": self.failures,
+                "dropped": self.dropped}
+
+
+if config.PET_WRITE_BEHIND not in MODES:
+    raise RuntimeError(f"Unknown PETSTORE_PET_WRITE_BEHIND {config.PET_WRITE_BEHIND!r}; expected one of {list(MODES)}")
+
+pet_status_writer = PetStatusWriteBehind(
+    interval=config.PET_WRITE_BEHIND_INTERVAL,
+    batch_size=config.PET_WRITE_BEHIND_BATCH_SIZE,
+    max_pending=config.PET_WRITE_BEHIND_MAX_PENDING,
+    enqueue_timeout=config.PET_WRITE_BEHIND_ENQUEUE_TIMEOUT,
+    max_attempts=config.PET_WRITE_BEHIND_MAX_ATTEMPTS,
+)